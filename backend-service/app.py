@@ -1,103 +1,518 @@
-from flask import Flask, jsonify, request, Response
+from flask import Flask, g, jsonify, make_response, request, Response
 from flask_cors import CORS
 import json
 import os
+import signal
+import sys
 import datetime
-from threading import Lock
+import functools
+import hashlib
+import hmac
 import time
 
+# --- Shared pipeline modules (todi_engine, ...) live in the repository root ---
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from data_registry import registry_from_env
+from grid_store import risk_payload, climatology_payload
+from histogram_builder import DEFAULT_BINS
+from live_cache import cache_from_env, normalize_key
+from live_nasa_processor import granule_cache
+from merra2_grid import snap
+from live_batch import parse_batch
+from live_window import window_dates
+from live_jobs import (
+    QueueFull,
+    run_batch_job,
+    run_point_job,
+    run_window_job,
+    runner_from_env,
+)
+from recommender import recommend
+from selection import (
+    Selection,
+    parse_doys,
+    select_climatology,
+    select_daily_summary,
+)
+
 # --- Initialize Flask app ---
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# --- Thread-safe in-memory cache for live data ---
-live_data_cache = {}
-cache_lock = Lock()
 
-# --- Pre-load mock data files ---
-risk_data = {}
-climatology_data = {}
-graph_data = {}
+# --- Endpoint latency, exported on /metrics ---
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    started = g.get("request_started")
+    if started is not None:
+        metrics.record(
+            "http_request_duration_seconds",
+            time.perf_counter() - started,
+            method=request.method,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            status=response.status_code,
+        )
+    return response
+
+# --- Bounded LRU/TTL cache for live data, keyed by MERRA-2 grid cell ---
+live_data_cache = cache_from_env()
+
+# --- Data files (mock JSON, gridded stores, histogram counts), hot-reloaded ---
+# Each request takes registry.current once; a reload swaps in a complete new
+# version, so nightly reprocessing is served without a restart.
+registry = registry_from_env(os.path.dirname(os.path.abspath(__file__)))
+# Bearer token for POST /api/admin/reload; the endpoint is off without one
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+if hasattr(signal, "SIGHUP"):
+    try:  # kill -HUP <pid> reloads too (only possible from the main thread)
+        signal.signal(signal.SIGHUP, lambda *_: registry.reload_in_background())
+    except ValueError:
+        pass
+
+
+def versioned(view):
+    """
+    Weak ETag from the data version and the full request URL: while the data
+    has not changed, a revalidation is answered 304 without running the view.
+    Responses with their own ETag (the prepared payloads) keep theirs.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        url_hash = hashlib.sha1(request.full_path.encode()).hexdigest()[:16]
+        etag = f'W/"{registry.current.tag}-{url_hash}"'
+        if etag in (request.headers.get("If-None-Match") or ""):
+            return Response(status=304, headers={"ETag": etag})
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and "ETag" not in response.headers:
+            response.headers["ETag"] = etag
+        return response
 
-try:
-    with open("processed_data.json", "r") as f:
-        risk_data = json.load(f)
-    with open("climatology_full_1991-2020.json", "r") as f:
-        climatology_data = json.load(f)
-    with open("graph_data_daily_histogram.json", "r") as f:
-        graph_data = json.load(f)
-    print("✅ Mock data files loaded successfully")
-except Exception as e:
-    print("❌ Error loading mock data files:", e)
+    return wrapper
+
+
+def grid_query():
+    """Parses optional lat/lon/interp query args; returns None when no point was given."""
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    if lat is None or lon is None:
+        return None
+    method = request.args.get("interp", "nearest")
+    if method not in ("nearest", "bilinear"):
+        raise ValueError("interp must be 'nearest' or 'bilinear'")
+    return lat, lon, method
+
+
+def data_response(data, store, payload_builder, name, select_mock):
+    """
+    Serves a point from a gridded store when lat/lon are given, else the mock
+    data: the prepared full payload, or only the start/end/doy/fields slice.
+    """
+    try:
+        query = grid_query()
+        selection = Selection.from_args(request.args)
+        if query is None:
+            if selection.empty:
+                return data.prepared[name].respond(request)
+            return jsonify(select_mock(selection))
+        if store is None:
+            return jsonify({"error": "No gridded data available on this server"}), 404
+        return jsonify(payload_builder(store, *query, selection))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError as e:
+        return jsonify({"error": str(e.args[0])}), 404
 
 
 # --- API Endpoints for mock data ---
 @app.route("/api/real/risk")
+@versioned
 def api_risk():
-    return jsonify(risk_data)
+    data = registry.current
+    return data_response(
+        data,
+        data.risk_grid,
+        risk_payload,
+        "risk",
+        lambda selection: select_daily_summary(data.risk_data, data.risk_index, selection),
+    )
 
 
 @app.route("/api/climatology")
+@versioned
 def api_climatology():
-    return jsonify(climatology_data)
+    data = registry.current
+    return data_response(
+        data,
+        data.climatology_grid,
+        climatology_payload,
+        "climatology",
+        lambda selection: select_climatology(data.climatology_data, selection),
+    )
 
 
 @app.route("/api/graph-data")
+@versioned
 def api_graph():
-    return jsonify(graph_data)
+    data = registry.current
+    doy = request.args.get("doy")
+    bins = request.args.get("bins")
+    if not doy and not bins:
+        return data.prepared["graph"].respond(request)
+    if data.temperature_histogram is None:
+        return jsonify({"error": "No histogram counts available on this server"}), 404
+    try:
+        doys = parse_doys(doy) if doy else None
+        bins = int(bins) if bins else DEFAULT_BINS
+        if not 1 <= bins <= 200:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "doy must be days of year and bins a number from 1 to 200"}), 400
+    return jsonify(data.temperature_histogram.payload(doys, bins))
 
 
-# --- Live NASA data endpoint using SSE ---
-@app.route("/api/live-risk")
-def api_live_risk():
-    lat = request.args.get("lat")
-    lon = request.args.get("lon")
+# --- "Best day" recommendations from the precomputed per-day-of-year TODI index ---
+@app.route("/api/recommendation")
+@versioned
+def api_recommendation():
     date = request.args.get("date")
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    try:
+        datetime.date.fromisoformat(date or "")
+        window = request.args.get("window", type=int)
+        limit = request.args.get("limit", 3, type=int)
+        if window is not None and not 1 <= window <= 60:
+            raise ValueError
+        if not 1 <= limit <= 20:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD, window 1-60 days and limit 1-20"}), 400
+
+    data = registry.current
+    index = data.todi_index if lat is None or lon is None else data.location_todi_index(lat, lon)
+    if index.empty:
+        return jsonify({"error": "No TODI history available for this location"}), 404
+    current = request.args.get("todi", type=int)
+    return jsonify(recommend(index, date, current, window, limit))
+
+
+# --- Live NASA analyses run in a persistent, bounded process pool ---
+def build_live_response(live_result, lat, lon, date):
+    todi = (live_result.get("daily_summary", {}).get("todi_score") or [None])[0]
+    index = registry.current.location_todi_index(lat, lon)
+    if todi is None or index.empty:
+        recommendation = {
+            "date": date,
+            "todi": todi,
+            "improvement": 0,
+            "notes": f"Based on live NASA data for {date}.",
+        }
+    else:
+        recommendation = recommend(index, date, todi)
+    return {"liveData": live_result, "recommendation": recommendation}
+
+
+def cache_live_result(cache_key, live_result):
+    if cache_key.startswith("window_"):
+        live_data_cache.set(cache_key, {"liveData": live_result})
+        return
+    if cache_key.startswith("batch_"):
+        # Each point of a batch is cached under its own single-point key
+        for lat, lon, date, point_result in live_result["points"]:
+            if point_result is not None and "error" not in point_result:
+                cache_live_result(normalize_key(lat, lon, date), point_result)
+        return
+    lat, lon, date = cache_key.split("_")
+    live_data_cache.set(
+        cache_key, build_live_response(live_result, float(lat), float(lon), date)
+    )
+
+
+live_runner = runner_from_env(on_result=cache_live_result)
+
+# --- Gauges read on each /metrics scrape ---
+def result_cache_lookups():
+    stats = live_data_cache.snapshot()
+    return {
+        ("memory_hit",): stats["hits"],
+        ("disk_hit",): stats["disk_hits"],
+        ("miss",): stats["misses"],
+    }
+
+
+def live_job_states():
+    depth = live_runner.depth()
+    return {("running",): depth["running"], ("queued",): depth["queued"]}
+
+
+metrics.REGISTRY.gauge(
+    "live_result_cache_lookups_total",
+    "Lookups of finished live results, by where they were found.",
+    result_cache_lookups,
+    labels=("result",),
+    kind="counter",
+)
+metrics.REGISTRY.gauge(
+    "live_result_cache_entries",
+    "Live results held in memory.",
+    lambda: live_data_cache.snapshot()["entries"],
+)
+metrics.REGISTRY.gauge(
+    "live_granule_cache_bytes",
+    "Size of the on-disk granule cache.",
+    lambda: granule_cache.usage()["bytes"],
+)
+metrics.REGISTRY.gauge(
+    "live_jobs",
+    "Live analyses running in the pool or waiting for a worker.",
+    live_job_states,
+    labels=("state",),
+)
+metrics.REGISTRY.gauge(
+    "live_job_subscribers",
+    "Clients streaming the progress of a live analysis.",
+    lambda: live_runner.depth()["subscribers"],
+)
+metrics.REGISTRY.gauge(
+    "data_version", "Version of the data files in service.", lambda: registry.current.version
+)
+
+
+# --- Live endpoints: validated and started here, streamed by Flask or async_app.py ---
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class LiveRequestError(Exception):
+    """A live request that is answered with a JSON error instead of a stream."""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class LiveStream:
+    """
+    What a live endpoint sends: chunks known up front (cached results), then
+    format_event(kind, payload) for every event of a shared live job. Iterated
+    by the Flask views, or with events() by the async server, which waits for
+    the job without holding a thread.
+    """
+
+    def __init__(self, mimetype, head=(), job=None, format_event=None):
+        self.mimetype = mimetype
+        self.head = list(head)
+        self.job = job
+        self.format_event = format_event
 
+    def __iter__(self):
+        yield from self.head
+        if self.job is not None:
+            for kind, payload in self.job.subscribe():
+                chunk = self.format_event(kind, payload)
+                if chunk:
+                    yield chunk
+
+    async def events(self, heartbeat=15.0):
+        for chunk in self.head:
+            yield chunk
+        if self.job is not None:
+            async for kind, payload in self.job.subscribe_async(heartbeat):
+                chunk = self.format_event(kind, payload)
+                if chunk:
+                    yield chunk
+
+
+def submit_live_job(key, job_function, *args):
+    try:
+        return live_runner.submit(key, job_function, *args)
+    except QueueFull as e:
+        raise LiveRequestError(503, str(e), {"Retry-After": "5"})
+
+
+def point_stream(args):
+    """SSE for one point: progress messages, then an 'event: result'."""
+    lat, lon, date = args.get("lat"), args.get("lon"), args.get("date")
     if not lat or not lon or not date:
-        return jsonify({"error": "Parameters lat, lon, and date are required"}), 400
-
-    cache_key = f"{lat}_{lon}_{date}"
-    with cache_lock:
-        if cache_key in live_data_cache:
-            cached_result = live_data_cache[cache_key]
-            return Response(
-                f"event: result\ndata: {json.dumps(cached_result)}\n\n",
-                mimetype="text/event-stream",
+        raise LiveRequestError(400, "Parameters lat, lon, and date are required")
+    try:
+        lat, lon = float(lat), float(lon)
+        datetime.date.fromisoformat(date)
+    except ValueError:
+        raise LiveRequestError(400, "lat/lon must be numbers and date YYYY-MM-DD")
+
+    # Every point in a MERRA-2 cell has the same data, so they share one entry
+    cache_key = normalize_key(lat, lon, date)
+    cell_lat, cell_lon = snap(lat, lon)
+    cached_result = live_data_cache.get(cache_key)
+    if cached_result is not None:
+        return LiveStream(
+            "text/event-stream", [f"event: result\ndata: {json.dumps(cached_result)}\n\n"]
+        )
+
+    def format_event(kind, payload):
+        if kind == "progress":
+            return f"data: {payload}\n\n"
+        if kind == "heartbeat":
+            return ": keep-alive\n\n"
+        if "error" in payload:
+            return f"data: {json.dumps({'error': payload['error']})}\n\n"
+        live_result = build_live_response(payload, cell_lat, cell_lon, date)
+        return f"event: result\ndata: {json.dumps(live_result)}\n\n"
+
+    # Identical in-flight requests share one job instead of fetching again
+    job = submit_live_job(cache_key, run_point_job, cell_lat, cell_lon, date)
+    return LiveStream("text/event-stream", job=job, format_event=format_event)
+
+
+def window_stream(args):
+    """SSE for a date window: progress, an 'event: day' per finished day, then the result."""
+    start, end = args.get("start"), args.get("end")
+    try:
+        lat, lon = float(args.get("lat")), float(args.get("lon"))
+    except (TypeError, ValueError):
+        lat = lon = None
+    if lat is None or lon is None or not start or not end:
+        raise LiveRequestError(400, "Parameters lat, lon, start and end are required")
+    try:
+        window_dates(start, end)
+    except ValueError as e:
+        raise LiveRequestError(400, str(e))
+
+    cache_key = f"window_{normalize_key(lat, lon, start)}_{end}"
+    cell_lat, cell_lon = snap(lat, lon)
+    cached_result = live_data_cache.get(cache_key)
+    if cached_result is not None:
+        return LiveStream(
+            "text/event-stream", [f"event: result\ndata: {json.dumps(cached_result)}\n\n"]
+        )
+
+    def format_event(kind, payload):
+        if kind == "progress":
+            return f"data: {payload}\n\n"
+        if kind == "day":
+            return f"event: day\ndata: {json.dumps(payload)}\n\n"
+        if kind == "heartbeat":
+            return ": keep-alive\n\n"
+        if "error" in payload and "daily_summary" not in payload:
+            return f"data: {json.dumps({'error': payload['error']})}\n\n"
+        return f"event: result\ndata: {json.dumps({'liveData': payload})}\n\n"
+
+    job = submit_live_job(cache_key, run_window_job, cell_lat, cell_lon, start, end)
+    return LiveStream("text/event-stream", job=job, format_event=format_event)
+
+
+def batch_stream(payload):
+    """NDJSON for many points/dates: one line per point, then {"done": true}."""
+    try:
+        items = parse_batch(payload)
+    except ValueError as e:
+        raise LiveRequestError(400, str(e))
+
+    # Cached points are answered at once; the rest are deduplicated by cell and date
+    cached_lines = []
+    pending = {}
+    for index, (lat, lon, date) in enumerate(items):
+        line = {"index": index, "lat": lat, "lon": lon, "date": date}
+        cached_result = live_data_cache.get(normalize_key(lat, lon, date))
+        if cached_result is not None:
+            cached_lines.append(json.dumps({**line, **cached_result}) + "\n")
+        else:
+            pending.setdefault((*snap(lat, lon), date), []).append(line)
+    done_line = json.dumps({"done": True, "points": len(items)}) + "\n"
+    if not pending:
+        return LiveStream("application/x-ndjson", [*cached_lines, done_line])
+
+    cells = list(pending)
+
+    def format_event(kind, payload):
+        if kind == "heartbeat":
+            return json.dumps({"heartbeat": True}) + "\n"
+        if kind == "item":
+            position, point_result = payload
+            cell_lat, cell_lon, date = cells[position]
+            if "error" in point_result:
+                body = {"error": point_result["error"]}
+            else:
+                body = build_live_response(point_result, cell_lat, cell_lon, date)
+            return "".join(
+                json.dumps({**line, **body}) + "\n" for line in pending[cells[position]]
             )
+        if kind == "result":
+            error = json.dumps({"error": payload["error"]}) + "\n" if "error" in payload else ""
+            return error + done_line
+        return None
+
+    batch_key = hashlib.sha1(json.dumps(sorted(cells)).encode()).hexdigest()
+    job = submit_live_job(f"batch_{batch_key}", run_batch_job, cells)
+    return LiveStream("application/x-ndjson", cached_lines, job, format_event)
+
+
+def stream_response(build, *args):
+    try:
+        stream = build(*args)
+    except LiveRequestError as e:
+        return jsonify({"error": e.message}), e.status, e.headers
+    return Response(iter(stream), mimetype=stream.mimetype, headers=STREAM_HEADERS)
+
+
+# --- Live NASA data endpoint using SSE ---
+@app.route("/api/live-risk")
+def api_live_risk():
+    return stream_response(point_stream, request.args)
+
+
+# --- Live analysis of a date window, one SSE "day" event per finished day ---
+@app.route("/api/live-risk/window")
+def api_live_risk_window():
+    return stream_response(window_stream, request.args)
+
+
+# --- Many points/dates in one request, streamed back as NDJSON ---
+@app.route("/api/live-risk/batch", methods=["POST"])
+def api_live_risk_batch():
+    return stream_response(batch_stream, request.get_json(silent=True))
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/cache-stats")
+def api_cache_stats():
+    return jsonify({"live_data_cache": live_data_cache.snapshot()})
+
+
+# --- Data version in service, and an authenticated reload trigger ---
+@app.route("/api/data-version")
+def api_data_version():
+    return jsonify(registry.status())
+
 
-    def generate_live_data():
-        try:
-            # Here you would normally spawn your Python process
-            # For demonstration, we simulate processing time
-            for i in range(1, 6):
-                yield f"data: Processing step {i}/5...\n\n"
-                time.sleep(0.5)
-
-            # Fake live data result
-            live_result = {
-                "daily_summary": {
-                    "todi_score": [42],
-                    "max_temp_celsius": [30],
-                    "max_wind_speed_ms": [5],
-                },
-                "recommendation": {
-                    "date": date,
-                    "todi": 42,
-                    "improvement": 0,
-                    "notes": f"Simulated live analysis for {lat}, {lon} on {date}",
-                },
-            }
-
-            with cache_lock:
-                live_data_cache[cache_key] = live_result
-
-            yield f"event: result\ndata: {json.dumps(live_result)}\n\n"
-
-        except Exception as e:
-            yield f"data: {{'error': 'Live data processing failed: {str(e)}'}}\n\n"
-
-    return Response(generate_live_data(), mimetype="text/event-stream")
+@app.route("/api/admin/reload", methods=["POST"])
+def api_admin_reload():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Reloading is disabled (no ADMIN_TOKEN set)"}), 404
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Invalid admin token"}), 403
+    if request.args.get("wait") in ("1", "true"):
+        registry.reload(force=request.args.get("force") in ("1", "true"))
+        return jsonify(registry.status())
+    if not registry.reload_in_background():
+        return jsonify({"error": "A reload is already running", **registry.status()}), 409
+    return jsonify(registry.status()), 202
 
 
 # --- Start Flask app ---
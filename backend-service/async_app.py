@@ -0,0 +1,125 @@
+import asyncio
+import contextlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+import app as service
+import metrics
+
+# --- Async serving mode: the live streams run as coroutines on one event loop ---
+# A waiting SSE client costs a coroutine instead of a server thread, so thousands
+# can wait on live jobs at once. Every other route is the Flask app, run on a
+# small thread pool. When a client disconnects its handler is cancelled, and a
+# live job nobody is waiting for any more is cancelled with it.
+
+# Seconds without an event before a keep-alive is sent
+HEARTBEAT_SECONDS = float(os.environ.get("LIVE_HEARTBEAT_SECONDS", 15))
+# Threads running the (non-streaming) Flask routes
+WSGI_THREADS = int(os.environ.get("ASYNC_WSGI_THREADS", 16))
+CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+# Set by the transport for the bridged response, never copied from it
+HOP_HEADERS = {"content-length", "transfer-encoding", "connection"}
+
+wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+def record_latency(request, started, status):
+    # Same histogram as the Flask routes (which record their own)
+    metrics.record(
+        "http_request_duration_seconds",
+        time.perf_counter() - started,
+        method=request.method,
+        route=request.match_info.route.resource.canonical,
+        status=status,
+    )
+
+
+async def stream(request, build, *args):
+    """Sends a LiveStream chunk by chunk, or its LiveRequestError as JSON."""
+    started = time.perf_counter()
+    try:
+        live = build(*args)
+    except service.LiveRequestError as e:
+        record_latency(request, started, e.status)
+        return web.json_response(
+            {"error": e.message}, status=e.status, headers={**e.headers, **CORS_HEADERS}
+        )
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": f"{live.mimetype}; charset=utf-8",
+            **service.STREAM_HEADERS,
+            **CORS_HEADERS,
+        }
+    )
+    await response.prepare(request)
+    record_latency(request, started, response.status)
+    # Closing the generator on disconnect unsubscribes from the job
+    async with contextlib.aclosing(live.events(HEARTBEAT_SECONDS)) as events:
+        async for chunk in events:
+            await response.write(chunk.encode())
+    await response.write_eof()
+    return response
+
+
+async def live_risk(request):
+    return await stream(request, service.point_stream, request.query)
+
+
+async def live_risk_window(request):
+    return await stream(request, service.window_stream, request.query)
+
+
+async def live_risk_batch(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    return await stream(request, service.batch_stream, payload)
+
+
+def call_flask(environ):
+    app_iter, status, headers = run_wsgi_app(service.app, environ, buffered=True)
+    return int(status.split(" ", 1)[0]), headers, b"".join(app_iter)
+
+
+async def flask_fallback(request):
+    """Any other route, answered by the Flask app on the thread pool."""
+    environ = EnvironBuilder(
+        path=request.path,
+        method=request.method,
+        query_string=request.query_string,
+        headers=list(request.headers.items()),
+        data=await request.read(),
+    ).get_environ()
+    if request.remote:
+        environ["REMOTE_ADDR"] = request.remote
+    status, headers, body = await asyncio.get_running_loop().run_in_executor(
+        wsgi_executor, call_flask, environ
+    )
+    response = web.Response(status=status, body=body)
+    for name, value in headers.items():
+        if name.lower() not in HOP_HEADERS:
+            response.headers.add(name, value)
+    return response
+
+
+def create_app():
+    application = web.Application()
+    application.router.add_get("/api/live-risk", live_risk)
+    application.router.add_get("/api/live-risk/window", live_risk_window)
+    application.router.add_post("/api/live-risk/batch", live_risk_batch)
+    # Registered last: also takes CORS preflights for the routes above
+    application.router.add_route("*", "/{tail:.*}", flask_fallback)
+    return application
+
+
+# --- Start the async server ---
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 10000))
+    print(f"✅ Your service is live on port {port} (async mode)")
+    # handler_cancellation: a client disconnect cancels its streaming handler
+    web.run_app(create_app(), host="0.0.0.0", port=port, handler_cancellation=True, print=None)
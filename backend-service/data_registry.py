@@ -0,0 +1,318 @@
+import datetime
+import functools
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from columnar_store import store_segments
+from grid_store import GridStore
+from histogram_builder import DoyHistogram
+from prepared_response import PreparedJSON
+from recommender import (
+    BASIS_CELL_CLIMATOLOGY,
+    BASIS_REFERENCE_LOCATION,
+    CLIMATOLOGY_TODI_FIELDS,
+    TodiIndex,
+)
+from selection import DateIndex
+
+# Seconds a replaced version's gridded stores stay open for requests still using them
+RETIRE_AFTER_SECONDS = 120
+
+
+def _load_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _check_risk(data):
+    summary = data.get("daily_summary") if isinstance(data, dict) else None
+    if not isinstance(summary, dict) or not isinstance(summary.get("timestamps"), list):
+        raise ValueError("no daily_summary.timestamps")
+    for name, column in summary.items():
+        if not isinstance(column, list) or len(column) != len(summary["timestamps"]):
+            raise ValueError(f"daily_summary.{name} does not match the timestamps")
+    DateIndex(summary["timestamps"])
+
+
+def _check_climatology(data):
+    table = data.get("daily_climatology") if isinstance(data, dict) else None
+    if not isinstance(table, dict) or not table:
+        raise ValueError("no daily_climatology table")
+
+
+def _check_graph(data):
+    if not isinstance(data, dict) or not data:
+        raise ValueError("no day-of-year histograms")
+
+
+def _load_grid(path):
+    store = GridStore(path)
+    if not store.variables:
+        store.close()
+        raise ValueError("no data variables")
+    return store
+
+
+# name -> (file name, loader, validator); every file is optional
+DATA_FILES = {
+    "risk": ("processed_data.json", _load_json, _check_risk),
+    "climatology": ("climatology_full_1991-2020.json", _load_json, _check_climatology),
+    "graph": ("graph_data_daily_histogram.json", _load_json, _check_graph),
+    "risk_grid": ("processed_grid.nc", _load_grid, None),
+    "climatology_grid": ("climatology_grid_1991-2020.nc", _load_grid, None),
+    "histogram": ("graph_data_daily_histogram.npz", DoyHistogram.load, None),
+}
+EMPTY = {"risk": {}, "climatology": {}, "graph": {}}
+
+
+class DataSnapshot:
+    """
+    One version of every data file the service serves, with everything derived
+    from them (prepared responses, date and TODI indexes, histogram counts).
+    A request reads the registry's current snapshot once and uses only that,
+    so it never mixes two versions of the data.
+    """
+
+    def __init__(self, version, files, fingerprints):
+        self.version = version
+        self.files = files
+        self.fingerprints = fingerprints
+        self.loaded_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        # Stable across restarts: the same files give the same tag
+        self.tag = hashlib.sha1(
+            json.dumps(sorted(fingerprints.items())).encode()
+        ).hexdigest()[:12]
+
+        self.risk_data = files.get("risk", EMPTY["risk"])
+        self.climatology_data = files.get("climatology", EMPTY["climatology"])
+        self.graph_data = files.get("graph", EMPTY["graph"])
+        self.risk_grid = files.get("risk_grid")
+        self.climatology_grid = files.get("climatology_grid")
+
+        # /api/graph-data answers plain and rebinned requests from one set of
+        # counts: the shipped .npz when there is one (the JSON is derived from
+        # it), else the counts of the JSON histograms themselves
+        self.temperature_histogram = files.get("histogram")
+        if self.temperature_histogram is not None:
+            self.graph_data = self.temperature_histogram.payload()
+        elif self.graph_data:
+            self.temperature_histogram = DoyHistogram.from_payload(self.graph_data)
+
+        self.prepared = {
+            "risk": PreparedJSON(self.risk_data),
+            "climatology": PreparedJSON(self.climatology_data),
+            "graph": PreparedJSON(self.graph_data),
+        }
+        summary = self.risk_data.get("daily_summary", {})
+        self.risk_index = DateIndex(summary.get("timestamps", []))
+        self.todi_index = TodiIndex(
+            summary.get("timestamps", []),
+            summary.get("todi_score", []),
+            self.climatology_data.get("daily_climatology"),
+            basis=BASIS_REFERENCE_LOCATION,
+        )
+        # Per-cell TODI indexes, built on first use and dropped with the snapshot
+        self.grid_todi_index = functools.lru_cache(maxsize=64)(self._grid_todi_index)
+        self.climatology_todi_index = functools.lru_cache(maxsize=64)(
+            self._climatology_todi_index
+        )
+
+    def _grid_todi_index(self, cell_lat, cell_lon):
+        values = self.risk_grid.point(cell_lat, cell_lon, variables=["todi_score"])
+        return TodiIndex(self.risk_grid.timestamps, values["todi_score"])
+
+    def _climatology_todi_index(self, cell_lat, cell_lon):
+        grid = self.climatology_grid
+        values = grid.point(cell_lat, cell_lon, variables=CLIMATOLOGY_TODI_FIELDS)
+        table = {
+            str(doy): {name: float(values[name][k]) for name in CLIMATOLOGY_TODI_FIELDS}
+            for k, doy in enumerate(grid.doys)
+        }
+        return TodiIndex([], [], table, basis=BASIS_CELL_CLIMATOLOGY)
+
+    def location_todi_index(self, lat, lon):
+        """
+        The TODI index of the point's cell: its gridded history, else the
+        estimate from its gridded climatology, else (the point is outside the
+        processed region, or there is no gridded data) the reference location's
+        history from processed_data.json. Its basis tells which one it is.
+        """
+        grid = self.risk_grid
+        if grid is not None and "todi_score" in grid.variables and grid.contains(lat, lon):
+            return self.grid_todi_index(*grid.cell_center(lat, lon))
+        grid = self.climatology_grid
+        if (
+            grid is not None
+            and set(CLIMATOLOGY_TODI_FIELDS) <= set(grid.variables)
+            and grid.contains(lat, lon)
+        ):
+            return self.climatology_todi_index(*grid.cell_center(lat, lon))
+        return self.todi_index
+
+
+class DataRegistry:
+    """
+    Holds the current DataSnapshot of data_dir and replaces it when the files
+    change. A reload stats the files, loads and validates only the changed
+    ones off the request path, and swaps the new snapshot in with a single
+    assignment. A file that fails to load or validate keeps its previous
+    version (the error is reported in status()), so requests never see empty
+    or half-written data.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.lock = threading.Lock()
+        self.errors = {}
+        # Fingerprints of the last load attempt, including files that failed
+        self.checked = {}
+        self.current = None
+        self.reload()
+
+    def fingerprint(self):
+        """
+        {name: (size, mtime_ns)} of the data files present; a gridded store
+        with segments (days added by append_store) adds theirs.
+        """
+        out = {}
+        for name, (filename, loader, _) in DATA_FILES.items():
+            path = os.path.join(self.data_dir, filename)
+            try:
+                stat = os.stat(path)
+                segments = store_segments(path) if loader is _load_grid else []
+                segment_stats = [os.stat(segment) for segment in segments]
+            except OSError:
+                continue
+            out[name] = (stat.st_size, stat.st_mtime_ns) + tuple(
+                (os.path.basename(segment), segment_stat.st_size, segment_stat.st_mtime_ns)
+                for segment, segment_stat in zip(segments, segment_stats)
+            )
+        return out
+
+    def reload(self, force=False, fingerprints=None):
+        """
+        Loads changed files and swaps in a new snapshot. Returns True when a
+        new version went live, False when nothing changed (or nothing loaded).
+        Concurrent calls wait for the running reload instead of repeating it.
+        """
+        with self.lock:
+            fingerprints = fingerprints or self.fingerprint()
+            old = self.current
+            if old is not None and not force and fingerprints == self.checked:
+                return False
+
+            files, used, errors = {}, {}, {}
+            for name, (filename, loader, validate) in DATA_FILES.items():
+                previous = None if old is None else old.files.get(name)
+                if name not in fingerprints:
+                    # Gone, perhaps only while it is being replaced: keep serving the
+                    # previous version unless a forced reload asks to drop it
+                    if previous is not None and not force:
+                        files[name], used[name] = previous, old.fingerprints[name]
+                    continue
+                if not force and self.checked.get(name) == fingerprints[name]:
+                    # Unchanged since the last attempt: keep what that attempt gave
+                    if previous is not None:
+                        files[name], used[name] = previous, old.fingerprints[name]
+                    if name in self.errors:
+                        errors[name] = self.errors[name]
+                    continue
+                try:
+                    value = loader(os.path.join(self.data_dir, filename))
+                    if validate is not None:
+                        validate(value)
+                except Exception as e:
+                    errors[name] = f"{filename}: {e}"
+                    print(f"❌ Keeping the previous {filename}: {e}", file=sys.stderr)
+                    if previous is not None:
+                        files[name] = previous
+                        used[name] = old.fingerprints[name]
+                    continue
+                files[name], used[name] = value, fingerprints[name]
+
+            self.errors, self.checked = errors, fingerprints
+            if old is not None and not force and used == old.fingerprints:
+                return False  # every change failed to load
+            version = 1 if old is None else old.version + 1
+            self.current = DataSnapshot(version, files, used)
+            print(
+                f"✅ Data version {version} live ({', '.join(sorted(files)) or 'no files'})",
+                file=sys.stderr,
+            )
+            if old is not None:
+                self._retire(old, files)
+            return True
+
+    def _retire(self, old, files):
+        """Closes the replaced stores once in-flight requests are done with them."""
+        kept = {id(value) for value in files.values()}
+        stores = [
+            value
+            for value in (old.risk_grid, old.climatology_grid)
+            if value is not None and id(value) not in kept
+        ]
+        if stores:
+            timer = threading.Timer(
+                RETIRE_AFTER_SECONDS, lambda: [store.close() for store in stores]
+            )
+            timer.daemon = True
+            timer.start()
+
+    def reload_in_background(self):
+        """Starts a reload on its own thread; returns False if one is already running."""
+        if self.lock.locked():
+            return False
+        threading.Thread(target=self._reload_logged, daemon=True).start()
+        return True
+
+    def _reload_logged(self, fingerprints=None):
+        try:
+            self.reload(fingerprints=fingerprints)
+        except Exception as e:
+            print(f"❌ Data reload failed: {e}", file=sys.stderr)
+
+    def watch(self, interval):
+        """
+        Polls the data files every `interval` seconds and reloads once a change
+        has settled: the files must look the same on two polls in a row, so a
+        file still being written is not picked up half-way.
+        """
+
+        def poll():
+            seen = self.checked
+            while True:
+                time.sleep(interval)
+                fingerprints = self.fingerprint()
+                if fingerprints == seen and fingerprints != self.checked:
+                    self._reload_logged(fingerprints)
+                seen = fingerprints
+
+        threading.Thread(target=poll, daemon=True).start()
+
+    def status(self):
+        snapshot = self.current
+        return {
+            "version": snapshot.version,
+            "tag": snapshot.tag,
+            "loaded_at": snapshot.loaded_at,
+            "data_dir": self.data_dir,
+            "files": {
+                name: {"size": size, "mtime_ns": mtime}
+                for name, (size, mtime, *_segments) in snapshot.fingerprints.items()
+            },
+            "errors": self.errors,
+            "reloading": self.lock.locked(),
+        }
+
+
+def registry_from_env(default_dir):
+    """DATA_DIR (default: default_dir); DATA_WATCH_INTERVAL seconds, 0 to disable watching."""
+    registry = DataRegistry(os.environ.get("DATA_DIR", default_dir))
+    interval = float(os.environ.get("DATA_WATCH_INTERVAL", 30))
+    if interval > 0:
+        registry.watch(interval)
+    return registry
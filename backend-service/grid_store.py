@@ -0,0 +1,233 @@
+import numpy as np
+import xarray as xr
+
+from columnar_store import store_segments
+from selection import DateIndex, Selection, check_fields, take
+
+
+class GridStore:
+    """
+    Gridded (lat x lon) daily summaries or climatology written by the processors.
+    Point queries are answered by index arithmetic on the regular MERRA-2 grid,
+    so a lookup costs the same no matter how large the region is. Days added
+    by append_store are read from the store's segment files, a day in a later
+    file replacing the same day in an earlier one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Opened lazily: only the coordinates are read here. Data variables stay
+        # on disk and each query reads just the chunks holding the cells it needs.
+        self.ds = xr.open_dataset(path, cache=False)
+        self.lats = self.ds["lat"].values
+        self.lons = self.ds["lon"].values
+        self.lat_axis = _RegularAxis(self.lats)
+        # Longitudes wrap around the dateline, so 179.9 and -180.1 find their cells
+        self.lon_axis = _RegularAxis(self.lons, period=360.0)
+        self.variables = list(self.ds.data_vars)
+        self.attrs = dict(self.ds.attrs)
+        # Leading (time or day-of-year) dimension shared by all variables
+        self.row_dim = self.ds[self.variables[0]].dims[0]
+        self.segments = []
+        if self.row_dim == "time":
+            times = self.ds["time"].values
+            self.segments = [xr.open_dataset(p, cache=False) for p in store_segments(path)]
+            if self.segments:
+                times = self._combine_timelines(times)
+            self.timestamps = [str(t) for t in times.astype("datetime64[s]")]
+            self.index = DateIndex(self.timestamps)
+        else:
+            self.doys = self.ds[self.row_dim].values.tolist()
+            self.doy_rows = {doy: i for i, doy in enumerate(self.doys)}
+
+    def _combine_timelines(self, base_times):
+        """
+        Sorted days of the store and its segments; row_file[k] is the file
+        (0: the store, then its segments) that day k is read from, and
+        file_row[k] its row in that file.
+        """
+        times = [base_times] + [segment["time"].values for segment in self.segments]
+        stamps = np.concatenate(times)
+        files = np.concatenate([np.full(t.size, k) for k, t in enumerate(times)])
+        rows = np.concatenate([np.arange(t.size) for t in times])
+        order = np.lexsort((files, stamps))
+        stamps, files, rows = stamps[order], files[order], rows[order]
+        # Of a day stored more than once, the last file's copy
+        last = np.append(stamps[1:] != stamps[:-1], True)
+        self.row_file, self.file_row = files[last], rows[last]
+        return stamps[last]
+
+    def close(self):
+        self.ds.close()
+        for segment in self.segments:
+            segment.close()
+
+    def _take(self, name, rows, cells):
+        """Values of variable `name` for the rows (a slice or list) and cells (lat/lon indices)."""
+        if not self.segments:
+            return self.ds[name].isel({self.row_dim: rows, **cells}).values
+        rows = np.arange(self.row_file.size)[rows]
+        files, local_rows = self.row_file[rows], self.file_row[rows]
+        out = None
+        for k, source in enumerate([self.ds] + self.segments):
+            picked = np.flatnonzero(files == k)
+            if not picked.size:
+                continue
+            values = source[name].isel({"time": local_rows[picked], **cells}).values
+            if out is None:
+                out = np.empty((rows.size,) + values.shape[1:], dtype=values.dtype)
+            out[picked] = values
+        if out is None:
+            return self.ds[name].isel({"time": [], **cells}).values
+        return out
+
+    def contains(self, lat, lon):
+        return self.lat_axis.contains(lat) and self.lon_axis.contains(lon)
+
+    def nearest_cell(self, lat, lon):
+        return self.lat_axis.nearest(lat), self.lon_axis.nearest(lon)
+
+    def point(self, lat, lon, method="nearest", rows=slice(None), variables=None):
+        """
+        Returns {variable: 1-D numpy array} for a location, reading only the
+        requested rows (a slice or list along time/day-of-year) and variables.
+        """
+        variables = variables or self.variables
+        if not self.contains(lat, lon):
+            raise KeyError(f"({lat}, {lon}) is outside the gridded store")
+
+        if method == "bilinear":
+            (i0, i1, wy), (j0, j1, wx) = (
+                self.lat_axis.bracket(lat),
+                self.lon_axis.bracket(lon),
+            )
+            weights = np.array(
+                [[(1 - wy) * (1 - wx), (1 - wy) * wx], [wy * (1 - wx), wy * wx]]
+            )
+            out = {}
+            for name in variables:
+                corners = self._take(name, rows, {"lat": [i0, i1], "lon": [j0, j1]})
+                out[name] = (corners * weights).sum(axis=(-2, -1))
+            return out
+
+        i, j = self.nearest_cell(lat, lon)
+        return {
+            name: self._take(name, rows, {"lat": i, "lon": j})
+            for name in variables
+        }
+
+    def cell_center(self, lat, lon):
+        i, j = self.nearest_cell(lat, lon)
+        return float(self.lats[i]), float(self.lons[j])
+
+
+class _RegularAxis:
+    """
+    1-D coordinate axis; O(1) index lookups when the spacing is uniform.
+    With a period (longitude), values are first wrapped into the axis' range.
+    """
+
+    def __init__(self, values, period=None):
+        self.values = np.asarray(values, dtype=float)
+        self.period = period
+        self.start = self.values[0]
+        self.size = self.values.size
+        steps = np.diff(self.values)
+        self.step = steps[0] if steps.size else 1.0
+        self.regular = bool(steps.size == 0 or np.allclose(steps, self.step))
+        # Points up to half a cell outside the outermost centers still map to a cell
+        self.low = self.values[0] - abs(self.step) / 2
+        self.high = self.values[-1] + abs(self.step) / 2
+
+    def _wrap(self, value):
+        if self.period is None:
+            return value
+        return (value - self.low) % self.period + self.low
+
+    def contains(self, value):
+        return self.low <= self._wrap(value) <= self.high
+
+    def _position(self, value):
+        value = self._wrap(value)
+        if self.regular:
+            return (value - self.start) / self.step
+        return np.interp(value, self.values, np.arange(self.size))
+
+    def nearest(self, value):
+        return int(np.clip(np.rint(self._position(value)), 0, self.size - 1))
+
+    def bracket(self, value):
+        """Neighbouring indices and the weight of the upper one."""
+        position = float(np.clip(self._position(value), 0, self.size - 1))
+        lower = min(int(np.floor(position)), max(self.size - 2, 0))
+        upper = min(lower + 1, self.size - 1)
+        return lower, upper, position - lower if upper != lower else 0.0
+
+
+def _to_list(values, digits=None):
+    out = []
+    for v in np.asarray(values, dtype=float).tolist():
+        if np.isnan(v):
+            out.append(None)
+        else:
+            out.append(round(v, digits) if digits is not None else v)
+    return out
+
+
+def _selected_variables(store, selection):
+    if not selection.fields:
+        return store.variables
+    check_fields(selection.fields, store.variables)
+    return [name for name in store.variables if name in selection.fields]
+
+
+def _location_label(store, lat, lon, method):
+    cell_lat, cell_lon = store.cell_center(lat, lon)
+    return (
+        f"{store.attrs.get('location', 'Gridded data')} "
+        f"(cell {cell_lat}, {cell_lon}, {method})"
+    )
+
+
+def risk_payload(store, lat, lon, method="nearest", selection=None):
+    """Daily summary for one location, in the processed_data.json schema."""
+    selection = selection or Selection()
+    variables = _selected_variables(store, selection)
+    rows = store.index.rows(selection)
+    if isinstance(rows, list) and not rows:
+        values = {name: [] for name in variables}
+    else:
+        values = store.point(lat, lon, method, rows, variables)
+
+    daily_summary = {"timestamps": take(store.timestamps, rows)}
+    for name in variables:
+        column = _to_list(values[name])
+        if name == "todi_score":
+            column = [None if s is None else int(s) for s in column]
+        daily_summary[name] = column
+    return {
+        "location": _location_label(store, lat, lon, method),
+        "daily_summary": daily_summary,
+    }
+
+
+def climatology_payload(store, lat, lon, method="nearest", selection=None):
+    """Climatology for one location, in the climatology_full_1991-2020.json schema."""
+    selection = selection or Selection()
+    variables = _selected_variables(store, selection)
+    doys = selection.climatology_doys()
+    if doys is None:
+        doys, rows = store.doys, slice(None)
+    else:
+        doys = [doy for doy in doys if doy in store.doy_rows]
+        rows = [store.doy_rows[doy] for doy in doys]
+
+    values = store.point(lat, lon, method, rows, variables) if doys else {}
+    columns = {name: _to_list(values[name], 2) for name in values}
+    return {
+        "location": _location_label(store, lat, lon, method),
+        "daily_climatology": {
+            str(day): {name: columns[name][k] for name in variables}
+            for k, day in enumerate(doys)
+        },
+    }
@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from merra2_grid import cell_key
+
+
+def normalize_key(lat, lon, date):
+    """Cache key for a live request: points in the same MERRA-2 cell share results."""
+    return f"{cell_key(lat, lon)}_{date}"
+
+
+class LiveResultCache:
+    """
+    Bounded LRU cache with a TTL for live analysis results.
+    An optional SQLite file acts as a second tier shared by every worker process
+    on the host, so a result computed by one gunicorn worker serves all of them.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=6 * 3600, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        if disk_path:
+            with self._disk() as db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS live_results ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+
+    def _disk(self):
+        # sqlite connections can't be shared across threads; keep one per thread
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.disk_path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            self.local.db = db
+        return db
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self.entries[key]
+                self.stats["expirations"] += 1
+
+        value = self._disk_get(key, now) if self.disk_path else None
+        with self.lock:
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._store(key, value, now)
+        return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self.lock:
+            self._store(key, value, now)
+        if self.disk_path:
+            with self._disk() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO live_results VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now + self.ttl_seconds),
+                )
+
+    def _store(self, key, value, now):
+        self.entries[key] = (now + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _disk_get(self, key, now):
+        try:
+            row = (
+                self._disk()
+                .execute(
+                    "SELECT value FROM live_results WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def purge_disk(self):
+        """Drops expired rows from the shared tier."""
+        if self.disk_path:
+            with self._disk() as db:
+                db.execute("DELETE FROM live_results WHERE expires_at <= ?", (time.time(),))
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (
+            round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else None
+        )
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["disk_tier"] = bool(self.disk_path)
+        return stats
+
+
+def cache_from_env():
+    return LiveResultCache(
+        max_entries=int(os.environ.get("LIVE_CACHE_SIZE", 512)),
+        ttl_seconds=float(os.environ.get("LIVE_CACHE_TTL", 6 * 3600)),
+        disk_path=os.environ.get("LIVE_CACHE_DB") or None,
+    )
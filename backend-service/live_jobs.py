@@ -0,0 +1,346 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+# Sentinel put on the progress queue after a job's last progress message
+_DONE = "__done__"
+
+
+class QueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job at its next progress event once nobody is waiting for it."""
+
+
+class _CancellableQueue:
+    """A job's view of the progress queue: stops the job once it has been cancelled."""
+
+    def __init__(self, queue, cancelled, job_id):
+        self.queue = queue
+        self.cancelled = cancelled
+        self.job_id = job_id
+
+    def put(self, item):
+        if self.job_id in self.cancelled:
+            raise JobCancelled("Live analysis cancelled: every client disconnected")
+        self.queue.put(item)
+
+
+def _run_job(job_function, job_id, progress_queue, cancelled, *args):
+    queue = _CancellableQueue(progress_queue, cancelled, job_id)
+    # Stage timings and cache lookups go to the web process's metrics
+    with metrics.forwarding(lambda sample: queue.put((job_id, ("metric", sample)))):
+        return job_function(job_id, queue, *args)
+
+
+# Job functions run in pool processes, so the heavy imports happen once per
+# worker, not per request. Events go back to the web process over the queue.
+def run_point_job(key, progress_queue, lat, lon, date):
+    from live_nasa_processor import process_live_data
+
+    return process_live_data(
+        lat,
+        lon,
+        date,
+        date,
+        progress=lambda message: progress_queue.put((key, ("progress", message))),
+    )
+
+
+def run_window_job(key, progress_queue, lat, lon, start_date, end_date):
+    from live_window import process_live_window
+
+    return process_live_window(
+        lat,
+        lon,
+        start_date,
+        end_date,
+        on_day=lambda day: progress_queue.put((key, ("day", day))),
+        progress=lambda message: progress_queue.put((key, ("progress", message))),
+    )
+
+
+def run_batch_job(key, progress_queue, items):
+    from live_batch import process_live_batch
+
+    results = [None] * len(items)
+
+    def on_result(position, result):
+        results[position] = result
+        progress_queue.put((key, ("item", (position, result))))
+
+    process_live_batch(
+        items,
+        on_result,
+        progress=lambda message: progress_queue.put((key, ("progress", message))),
+    )
+    return {"points": [[*item, result] for item, result in zip(items, results)]}
+
+
+class LiveJob:
+    """
+    One in-flight live analysis. Every client asking for the same key shares it:
+    each subscriber gets the full progress history, then new events as they come.
+    When the last subscriber goes away before the result, on_abandoned(job) is
+    called so the runner can cancel the work nobody is waiting for.
+    """
+
+    def __init__(self, key, job_id=None, on_abandoned=None):
+        self.key = key
+        self.id = job_id or key
+        self.on_abandoned = on_abandoned
+        self.events = []
+        self.result = None
+        self.done = False
+        self.subscribers = 0
+        self.condition = threading.Condition()
+        # (loop, asyncio.Event) of every async subscriber, woken on each event
+        self.async_waiters = []
+
+    def publish(self, event):
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+            self._wake_async()
+
+    def finish(self, result):
+        with self.condition:
+            self.result = result
+            self.done = True
+            self.condition.notify_all()
+            self._wake_async()
+
+    def _wake_async(self):
+        for loop, event in self.async_waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _attach(self):
+        with self.condition:
+            self.subscribers += 1
+
+    def _detach(self):
+        with self.condition:
+            self.subscribers -= 1
+            abandoned = self.subscribers == 0 and not self.done
+        if abandoned and self.on_abandoned is not None:
+            self.on_abandoned(self)
+
+    def subscribe(self, heartbeat=15.0):
+        """
+        Yields the job's (kind, payload) events - ("progress", message),
+        ("day", day_result) or ("item", (position, result)) - then ("heartbeat", None) when nothing happened
+        for `heartbeat` seconds, and finally ("result", result).
+        """
+        self._attach()
+        try:
+            seen = 0
+            while True:
+                with self.condition:
+                    if seen == len(self.events) and not self.done:
+                        self.condition.wait(timeout=heartbeat)
+                    new_events = self.events[seen:]
+                    seen = len(self.events)
+                    done = self.done and not new_events
+                yield from new_events
+                if done:
+                    yield "result", self.result
+                    return
+                if not new_events:
+                    yield "heartbeat", None
+        finally:
+            self._detach()
+
+    async def subscribe_async(self, heartbeat=15.0):
+        """
+        subscribe() for asyncio: the same events, awaited without holding a
+        thread, so one event loop can serve any number of waiting clients.
+        """
+        wakeup = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wakeup)
+        with self.condition:
+            self.async_waiters.append(waiter)
+        self._attach()
+        try:
+            seen = 0
+            while True:
+                with self.condition:
+                    new_events = self.events[seen:]
+                    seen = len(self.events)
+                    done = self.done and not new_events
+                    if not new_events and not done:
+                        wakeup.clear()
+                for event in new_events:
+                    yield event
+                if done:
+                    yield "result", self.result
+                    return
+                if not new_events:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        yield "heartbeat", None
+        finally:
+            with self.condition:
+                self.async_waiters.remove(waiter)
+            self._detach()
+
+
+class LiveJobRunner:
+    """
+    Runs live analyses in a persistent process pool with a concurrency limit
+    and a bounded wait queue, coalescing identical in-flight requests.
+    """
+
+    def __init__(self, max_workers=2, max_queued=8, on_result=None):
+        self.max_workers = max_workers
+        self.slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self.on_result = on_result
+        # key -> the job new requests for that key join; job id -> every job still running
+        self.jobs = {}
+        self.routes = {}
+        self.futures = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.progress_queue = None
+
+    def _start(self):
+        # Started on first use so importing the app never forks processes
+        if self.executor is None:
+            self.manager = multiprocessing.Manager()
+            self.progress_queue = self.manager.Queue()
+            # Ids of cancelled jobs, checked by the job at each progress event
+            self.cancelled = self.manager.dict()
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            threading.Thread(target=self._dispatch_progress, daemon=True).start()
+
+    def _dispatch_progress(self):
+        while True:
+            try:
+                job_id, event = self.progress_queue.get()
+            except (EOFError, OSError):
+                return  # manager process went away (interpreter shutdown)
+            if event[0] == "metric":
+                metrics.apply(event[1])
+                continue
+            with self.lock:
+                job = self.routes.get(job_id)
+            if job is None:
+                continue
+            if event == _DONE:
+                with self.lock:
+                    self.routes.pop(job_id, None)
+                    self.futures.pop(job_id, None)
+                    if self.jobs.get(job.key) is job:
+                        del self.jobs[job.key]
+                job.finish(job.result)
+            else:
+                job.publish(event)
+
+    def submit(self, key, job_function, *args):
+        """
+        Returns the job for key, starting job_function(key, queue, *args) in the
+        pool only if no job with that key is already running.
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None:
+                return job
+            if not self.slots.acquire(blocking=False):
+                raise QueueFull("Too many live analyses in progress, try again shortly.")
+            self._start()
+            job = LiveJob(key, f"{key}#{next(self.ids)}", self.cancel)
+            self.jobs[key] = job
+            self.routes[job.id] = job
+
+        try:
+            future = self._submit_job(job, job_function, *args)
+        except BaseException:
+            # Not started: give back the slot, and don't let requests join a dead job
+            self.slots.release()
+            with self.lock:
+                self.routes.pop(job.id, None)
+                if self.jobs.get(job.key) is job:
+                    del self.jobs[job.key]
+            raise
+        with self.lock:
+            self.futures[job.id] = future
+        future.add_done_callback(lambda f: self._complete(job, f))
+        return job
+
+    def _submit_job(self, job, job_function, *args):
+        executor = self.executor
+        try:
+            return executor.submit(
+                _run_job, job_function, job.id, self.progress_queue, self.cancelled, *args
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory): the pool refuses all work from
+            # then on, so replace it and try once more on the new one
+            print("❌ Live worker pool broken, starting a new one", file=sys.stderr)
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            executor.shutdown(wait=False, cancel_futures=True)
+            return self.executor.submit(
+                _run_job, job_function, job.id, self.progress_queue, self.cancelled, *args
+            )
+
+    def cancel(self, job):
+        """
+        Stops a job nobody is waiting for any more: a queued job never starts,
+        a running one stops at its next progress event. New requests for the
+        same key start a fresh job instead of joining the cancelled one.
+        """
+        with self.lock:
+            if self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+            future = self.futures.get(job.id)
+        if future is not None and not future.done() and not future.cancel():
+            self.cancelled[job.id] = True
+
+    def _complete(self, job, future):
+        self.slots.release()
+        try:
+            job.result = future.result()
+        except Exception as e:
+            job.result = {"error": f"Live data processing failed: {e}"}
+        self.cancelled.pop(job.id, None)
+        if self.on_result is not None and "error" not in job.result:
+            self.on_result(job.key, job.result)
+        # Queued behind the job's own progress messages, so none are lost
+        self.progress_queue.put((job.id, _DONE))
+
+    @property
+    def in_flight(self):
+        with self.lock:
+            return len(self.jobs)
+
+    def depth(self):
+        """Jobs running in the pool, jobs waiting for a worker, and clients subscribed to them."""
+        with self.lock:
+            futures = list(self.futures.values())
+            jobs = list(self.routes.values())
+        running = sum(future.running() for future in futures)
+        return {
+            "running": running,
+            "queued": sum(not future.done() for future in futures) - running,
+            "subscribers": sum(job.subscribers for job in jobs),
+        }
+
+
+def runner_from_env(on_result=None):
+    return LiveJobRunner(
+        max_workers=int(os.environ.get("LIVE_WORKERS", 2)),
+        max_queued=int(os.environ.get("LIVE_QUEUE_SIZE", 8)),
+        on_result=on_result,
+    )
@@ -4,106 +4,252 @@ import xarray as xr
 import numpy as np
 import earthaccess
 import requests
-import todi_engine
+import todi_pipeline
 import os
-import hashlib
+import metrics
 from datetime import datetime, timezone
+from dataset_pool import DatasetPool
+from granule_cache import GranuleCache, granule_key
+from granule_catalog import CATALOG_NAME, GranuleCatalog
+from merra2_grid import granule_filename, hyperslab, opendap_constraint, slab_label, snap
 
 # --- NEW: Directory to cache downloaded files ---
 CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
-os.makedirs(CACHE_DIR, exist_ok=True)
+CACHE_MAX_BYTES = int(os.environ.get("LIVE_NC_CACHE_MAX_MB", 2048)) * 1024 * 1024
+REQUIRED_VARS = ["T2M", "U10M", "V10M", "T2MDEW"]
+granule_cache = GranuleCache(CACHE_DIR, CACHE_MAX_BYTES)
+# Cached files kept open (subsets decoded in memory) for the next request on the same date
+dataset_pool = DatasetPool(int(os.environ.get("LIVE_OPEN_DATASETS", 16)))
+# Grid cells fetched on each side of the requested cell
+SUBSET_HALO = int(os.environ.get("LIVE_SUBSET_HALO", 1))
+# Responses meaning the server won't honour an index-constrained request
+CONSTRAINT_REJECTED = {400, 403, 404, 413, 500, 501}
+# OPeNDAP URL pattern ({year}, {month}, {granule}) used instead of searching CMR,
+# e.g. to run the live path against mock_opendap_server.py
+OPENDAP_URL_TEMPLATE = os.environ.get("LIVE_OPENDAP_URL_TEMPLATE")
 
 
-def get_cache_filename(lat, lon, date):
-    """Generate a unique filename for caching based on lat/lon/date."""
-    key = f"{lat}_{lon}_{date}"
-    hashed = hashlib.md5(key.encode()).hexdigest()
-    return os.path.join(CACHE_DIR, f"{hashed}.nc")
+def merra2_granule_id(date):
+    """M2T1NXSLV has exactly one (global) granule per day."""
+    return f"M2T1NXSLV.{date}"
+
+
+def find_opendap_url(granule):
+    """The granule's OPeNDAP endpoint (the one that accepts constraints)."""
+    related_urls = granule["umm"]["RelatedUrls"]
+    for url_info in related_urls:
+        if "OPENDAP" in url_info.get("Description", "").upper():
+            return url_info["URL"]
+    return related_urls[0]["URL"]
+
+
+def templated_opendap_url(date):
+    day = datetime.strptime(str(date)[:10], "%Y-%m-%d")
+    return OPENDAP_URL_TEMPLATE.format(
+        year=f"{day:%Y}", month=f"{day:%m}", granule=granule_filename(day)
+    )
+
+
+def search_granules(start_date, end_date):
+    """One CMR search: {date: OPeNDAP URL} of the M2T1NXSLV granules in the range."""
+    with metrics.stage("cmr_search"):
+        # Every granule is global, so no bounding box
+        results = earthaccess.search_data(
+            short_name="M2T1NXSLV",
+            version="5.12.4",
+            temporal=(start_date, end_date),
+        )
+    urls = {}
+    for granule in results:
+        begin = granule["umm"]["TemporalExtent"]["RangeDateTime"]["BeginningDateTime"]
+        urls[begin[:10]] = find_opendap_url(granule)
+    return urls
+
+
+# date -> OPeNDAP URL, consulted before any CMR search and shared by all locations
+granule_catalog = GranuleCatalog(os.path.join(CACHE_DIR, CATALOG_NAME), search_granules)
+
+
+def search_opendap_url(day):
+    """OPeNDAP URL of the M2T1NXSLV granule for day, or None.
+
+    Granules are global and daily, so the day alone picks one.
+    """
+    if OPENDAP_URL_TEMPLATE:
+        return templated_opendap_url(day)
+    return granule_catalog.url(day)
+
+
+def open_granule(path):
+    """The pooled dataset of a cached file; give it back with dataset_pool.release(ds)."""
+    return dataset_pool.acquire(path)
+
+
+def open_cached(cache_key):
+    cache_file = granule_cache.lookup(cache_key)
+    ds = None
+    if cache_file is not None:
+        try:
+            ds = open_granule(cache_file)
+        except (OSError, ValueError):
+            # Index entry whose file was removed or damaged: fetch it again
+            granule_cache.discard(cache_key)
+    metrics.record("live_granule_cache_lookups_total", result="miss" if ds is None else "hit")
+    return ds
+
+
+def download_to_cache(download_url, cache_key):
+    with metrics.stage("download"):
+        with requests.get(download_url, stream=True, timeout=120) as response:
+            response.raise_for_status()
+            # Streamed into the cache under a temp name, renamed when complete
+            path = granule_cache.store(
+                cache_key, response.iter_content(chunk_size=1024 * 1024)
+            )
+    metrics.record("live_download_bytes_total", os.path.getsize(path))
+    return path
+
+
+def day_cache_keys(date, lat, lon):
+    """(slab, subset_key, full_key) of the granule data for a point on a date."""
+    granule_id = merra2_granule_id(date)
+    slab = hyperslab(lat, lon, SUBSET_HALO)
+    subset_key = granule_key(granule_id, REQUIRED_VARS, slab_label(slab))
+    return slab, subset_key, granule_key(granule_id, REQUIRED_VARS)
+
+
+def open_cached_day(date, lat, lon):
+    """
+    Cached data covering the point on date, or None. A full granule (left by a
+    fallback download) serves any location on its date, not just its own slab.
+    The dataset is pooled: release it with dataset_pool.release(ds).
+    """
+    _, subset_key, full_key = day_cache_keys(date, lat, lon)
+    ds = open_cached(subset_key)
+    if ds is None:
+        ds = open_cached(full_key)
+    return ds
+
+
+def summarize_cells(ds, lats, lons):
+    """
+    Daily metrics of the grid cells nearest each (lat, lon) pair, all scored
+    together: the points become one 'point' dimension of a single cube.
+    """
+    # (a max over the whole downloaded field would mix in other locations).
+    # Snapped first: lon 179.9 is in the -180 cell, which a nearest match on
+    # the raw value would miss (-179.375 is nearer than -180)
+    lats, lons = zip(*(snap(lat, lon) for lat, lon in zip(lats, lons)))
+    with metrics.stage("extract"):
+        cells = ds.sel(
+            lat=xr.DataArray(np.asarray(lats, dtype=float), dims="point"),
+            lon=xr.DataArray(np.asarray(lons, dtype=float), dims="point"),
+            method="nearest",
+        ).load()
+    # Wind, humidity and TODI are computed per hour, then aggregated over the day
+    with metrics.stage("todi_score"):
+        hourly = todi_pipeline.hourly_todi(cells)
+    with metrics.stage("reduce"):
+        day = todi_pipeline.daily_todi(hourly).isel(time=0)
+        columns = {name: day[name].values.tolist() for name in day.data_vars}
+        dewpoints = (cells["T2MDEW"].mean("time") - 273.15).values.tolist()
+
+    return [
+        {
+            "max_temp_celsius": safe_round(columns["max_temp_celsius"][k]),
+            "dewpoint_celsius": safe_round(dewpoints[k]),
+            "min_relative_humidity_percent": safe_round(
+                columns["min_relative_humidity_percent"][k]
+            ),
+            "max_wind_speed_ms": safe_round(columns["max_wind_speed_ms"][k]),
+            "todi_score": (
+                None if np.isnan(columns["todi_score"][k]) else int(columns["todi_score"][k])
+            ),
+            "todi_mean": safe_round(columns["todi_mean"][k]),
+            "todi_p95": safe_round(columns["todi_p95"][k]),
+        }
+        for k in range(len(dewpoints))
+    ]
+
+
+def summarize_cell(ds, lat, lon):
+    """Daily metrics of the grid cell nearest the requested point."""
+    return summarize_cells(ds, [lat], [lon])[0]
 
 
 def safe_round(value, digits=2):
     return None if value is None or np.isnan(value) else round(value, digits)
 
 
-def process_live_data(lat, lon, start_date, end_date):
+def process_live_data(lat, lon, start_date, end_date, progress=None):
     """
     Fetches and processes live MERRA-2 data for a specific location and date.
     Implements disk caching to avoid repeated downloads.
     Returns extended metrics for live card.
+    Each pipeline stage is reported on stderr and, if given, to progress(message);
+    stage timings go to metrics.
     """
+
+    def report(message):
+        print(message, file=sys.stderr)
+        if progress is not None:
+            progress(message)
+
+    # The MERRA-2 cell's centre, with lon wrapped into -180..180 like the grid
+    lat, lon = snap(lat, lon)
     try:
-        print("--- Live NASA Analysis Started ---", file=sys.stderr)
-        print(
-            f"1. Searching for MERRA-2 data for Lat: {lat}, Lon: {lon}...",
-            file=sys.stderr,
-        )
+        report("--- Live NASA Analysis Started ---")
+        report(f"1. Searching for MERRA-2 data for Lat: {lat}, Lon: {lon}...")
 
-        cache_file = get_cache_filename(lat, lon, start_date)
-        if os.path.exists(cache_file):
-            print(f"2. Using cached data at {cache_file}", file=sys.stderr)
-            ds = xr.open_dataset(cache_file)
+        # Only the cells around the point are fetched; a cached full granule
+        # for the date (from a fallback download) serves any location too
+        slab, subset_key, full_key = day_cache_keys(start_date, lat, lon)
+        ds = open_cached_day(start_date, lat, lon)
+        if ds is not None:
+            report("2. Found data in local cache, skipping download.")
         else:
-            bounding_box = (
-                float(lon),
-                float(lat),
-                float(lon) + 0.625,
-                float(lat) + 0.5,
-            )
-            results = earthaccess.search_data(
-                short_name="M2T1NXSLV",
-                version="5.12.4",
-                temporal=(start_date, end_date),
-                bounding_box=bounding_box,
-            )
-            if not results:
+            opendap_url = search_opendap_url(start_date)
+            if opendap_url is None:
                 return {"error": "No live data found for this location/date."}
 
-            print(
-                "2. Found data granule. Constructing download URL...", file=sys.stderr
-            )
-            opendap_url = results[0]["umm"]["RelatedUrls"][0]["URL"]
-            required_vars = "T2M,U10M,V10M,T2MDEW"
-            download_url = f"{opendap_url}?{required_vars}"
+            report("2. Found data granule. Constructing download URL...")
+            subset_url = f"{opendap_url}.nc?{opendap_constraint(REQUIRED_VARS, slab)}"
 
-            print("3. Starting download from NASA server...", file=sys.stderr)
-            response = requests.get(download_url, timeout=120)
-            response.raise_for_status()
+            report("3. Downloading the grid cells around the point from NASA server...")
+            try:
+                ds = open_granule(download_to_cache(subset_url, subset_key))
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code not in CONSTRAINT_REJECTED:
+                    raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                raise
+            except (OSError, ValueError):
+                # Server answered, but not with NetCDF for the constrained request
+                granule_cache.discard(subset_key)
 
-            # Save downloaded NetCDF content to cache
-            with open(cache_file, "wb") as f:
-                f.write(response.content)
-            print("2. Found data in local cache, skipping download.", file=sys.stderr)
-
-            ds = xr.open_dataset(cache_file)
-
-        # --- Compute metrics ---
-        temp_k = ds["T2M"].max().item()  # ✅ Changed from .mean() to .max()
-        daily_max_temp_c = safe_round(temp_k - 273.15)
-        u10 = ds["U10M"].max().item()  # ✅ Changed from .mean() to .max()
-        v10 = ds["V10M"].max().item()  # ✅ Changed from .mean() to .max()
-        wind_speed = np.sqrt(u10**2 + v10**2)
-        daily_max_wind_ms = safe_round(wind_speed)
-        dewpoint_k = ds["T2MDEW"].mean().item()
-        daily_dewpoint_c = safe_round(dewpoint_k - 273.15)
-        todi_score = todi_engine.calculate_todi_score(
-            daily_max_temp_c, 65.0, daily_max_wind_ms
-        )
+            if ds is None:
+                report("3. Subset request rejected, downloading the full granule instead...")
+                full_url = f"{opendap_url}.nc?{','.join(REQUIRED_VARS)}"
+                ds = open_granule(download_to_cache(full_url, full_key))
+            report("3. Download complete, saved to local cache.")
+
+        report("4. Computing TODI metrics for the nearest grid cell...")
 
-        # --- Safety checks ---
-        todi_score = None if todi_score is None or np.isnan(todi_score) else todi_score
+        # --- Compute metrics for the grid cell nearest the requested point ---
+        try:
+            cell_metrics = summarize_cell(ds, lat, lon)
+        finally:
+            dataset_pool.release(ds)
 
-        print("5. Processing complete. Generating final JSON output.", file=sys.stderr)
-        print("--- Live NASA Analysis Finished ---", file=sys.stderr)
+        report("5. Processing complete. Generating final JSON output.")
+        report("--- Live NASA Analysis Finished ---")
 
         return {
             "location": f"Live Data for {lat}, {lon}",
             "fetched_at": datetime.now(timezone.utc).isoformat(),
             "daily_summary": {
                 "timestamps": [start_date],
-                "max_temp_celsius": [daily_max_temp_c],
-                "dewpoint_celsius": [daily_dewpoint_c],
-                "max_wind_speed_ms": [daily_max_wind_ms],
-                "todi_score": [todi_score],
+                **{name: [value] for name, value in cell_metrics.items()},
             },
         }
 
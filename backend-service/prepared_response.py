@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+import json
+
+from flask import Response
+
+try:  # Optional: brotli is smaller than gzip but not a hard dependency
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_CACHE_CONTROL = "public, max-age=300, must-revalidate"
+
+
+class PreparedJSON:
+    """
+    A JSON payload serialized and compressed once, at load time.
+    Requests are then answered from the stored bytes: with 304 when the client's
+    If-None-Match still matches, otherwise with the best encoding it accepts.
+    """
+
+    def __init__(self, payload, cache_control=DEFAULT_CACHE_CONTROL):
+        # Same output as jsonify() with its default sort_keys/compact settings
+        self.body = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode(
+            "utf-8"
+        )
+        self.digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.cache_control = cache_control
+        self.encoded = {"identity": self.body, "gzip": gzip.compress(self.body, 6)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(self.body)
+
+    def etag(self, encoding):
+        # Strong validators must differ per representation (RFC 9110 8.8.3)
+        tag = self.digest if encoding == "identity" else f"{self.digest}-{encoding}"
+        return f'"{tag}"'
+
+    def matches(self, if_none_match):
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"').split("-")[0] == self.digest:
+                return True
+        return False
+
+    def negotiate(self, accept_encoding):
+        accepted = set()
+        for part in (accept_encoding or "").split(","):
+            name, _, params = part.partition(";")
+            params = params.replace(" ", "")
+            if params.startswith("q="):
+                try:
+                    if float(params[2:]) == 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(name.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.encoded:
+                return encoding
+        return "identity"
+
+    def respond(self, request):
+        encoding = self.negotiate(request.headers.get("Accept-Encoding"))
+        headers = {
+            "ETag": self.etag(encoding),
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if self.matches(request.headers.get("If-None-Match")):
+            return Response(status=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(
+            self.encoded[encoding],
+            status=200,
+            mimetype="application/json",
+            headers=headers,
+        )
@@ -0,0 +1,200 @@
+import datetime
+from collections import deque
+
+import numpy as np
+
+from selection import DAYS_IN_CLIMATOLOGY
+from todi_engine import calculate_todi_score_array
+
+# Days either side of the target date searched for a better day by default
+DEFAULT_HALF_WINDOW = 7
+# Humidity assumed when a day's TODI has to come from the climatology
+CLIMATOLOGY_HUMIDITY = 65.0
+# Climatology fields (per day of year) that TODI is then estimated from
+CLIMATOLOGY_TODI_FIELDS = ("p75_temp_celsius", "p95_wind_speed_ms")
+# What an index's scores describe, sent as a recommendation's "basis"
+BASIS_CELL_HISTORY = "cell_history"
+BASIS_CELL_CLIMATOLOGY = "cell_climatology"
+BASIS_REFERENCE_LOCATION = "reference_location"
+
+
+def _doy(date):
+    return datetime.date.fromisoformat(str(date)[:10]).timetuple().tm_yday
+
+
+def _sliding_argmin(values, half_window):
+    """
+    For every day of year d, the day with the lowest value in the circular
+    window [d - half_window, d + half_window], via a monotonic deque (O(n)).
+    """
+    n = values.size
+    width = 2 * half_window + 1
+    # Unroll the circle so every window is a contiguous run
+    extended = np.concatenate([values[-half_window:], values, values[:half_window]])
+    best = np.empty(n, dtype=int)
+    window = deque()
+    for k, value in enumerate(extended):
+        while window and extended[window[-1]] > value:
+            window.pop()
+        window.append(k)
+        if window[0] <= k - width:
+            window.popleft()
+        if k >= width - 1:
+            best[k - width + 1] = (window[0] - half_window) % n
+    return best
+
+
+class TodiIndex:
+    """
+    Per-day-of-year TODI statistics for one location, precomputed once so a
+    recommendation is a handful of array lookups. Each day of year keeps its
+    historical scores sorted (for medians and percentile ranks), and the
+    lowest-risk day within +/- half_window days is precomputed for all of them.
+    basis (one of the BASIS_* values) says whose scores these are.
+    """
+
+    def __init__(
+        self,
+        timestamps,
+        scores,
+        climatology=None,
+        half_window=DEFAULT_HALF_WINDOW,
+        basis=BASIS_CELL_HISTORY,
+    ):
+        self.half_window = half_window
+        self.basis = basis
+        by_doy = {}
+        for date, score in zip(timestamps, scores):
+            if score is not None and not np.isnan(score):
+                by_doy.setdefault(_doy(date), []).append(float(score))
+        self.sorted_scores = {doy: np.sort(values) for doy, values in by_doy.items()}
+
+        # expected[doy - 1]: median historical TODI, else the climatology's
+        self.expected = np.full(DAYS_IN_CLIMATOLOGY, np.nan)
+        for doy, values in self.sorted_scores.items():
+            self.expected[doy - 1] = np.median(values)
+        if climatology:
+            self._fill_from_climatology(climatology)
+
+        self.best_nearby = _sliding_argmin(
+            np.where(np.isnan(self.expected), np.inf, self.expected), half_window
+        )
+
+    def _fill_from_climatology(self, table):
+        """Days of year with no history get the TODI of a typical hot, windy day."""
+        missing = [
+            doy
+            for doy in range(1, DAYS_IN_CLIMATOLOGY + 1)
+            if np.isnan(self.expected[doy - 1]) and str(doy) in table
+        ]
+        if not missing:
+            return
+        temps = np.array([table[str(d)]["p75_temp_celsius"] for d in missing], dtype=float)
+        winds = np.array([table[str(d)]["p95_wind_speed_ms"] for d in missing], dtype=float)
+        scores = calculate_todi_score_array(temps, CLIMATOLOGY_HUMIDITY, winds)
+        self.expected[np.array(missing) - 1] = np.trunc(scores)
+
+    @property
+    def empty(self):
+        return bool(np.isnan(self.expected).all())
+
+    def expected_score(self, date):
+        value = self.expected[_doy(date) - 1]
+        return None if np.isnan(value) else int(value)
+
+    def percentile_rank(self, date, score):
+        """Share (0-100) of past years whose TODI on this day of year was below score."""
+        values = self.sorted_scores.get(_doy(date))
+        if values is None:
+            return None
+        return round(100 * int(np.searchsorted(values, score)) / values.size, 1)
+
+    def alternatives(self, date, current=None, half_window=None, limit=3):
+        """
+        Other days within +/- half_window of date that are expected to be
+        lower-risk than `current` (the date's own expected TODI when not
+        given; any day when that is unknown too), lowest expected TODI first
+        (ties go to the earlier day), with each one's delta against it.
+        """
+        half_window = self.half_window if half_window is None else half_window
+        target = datetime.date.fromisoformat(str(date)[:10])
+        if current is None:
+            current = self.expected_score(target)
+
+        offsets = [k for k in range(-half_window, half_window + 1) if k != 0]
+        dates = [target + datetime.timedelta(days=k) for k in offsets]
+        scores = self.expected[[d.timetuple().tm_yday - 1 for d in dates]]
+        ranked = sorted(
+            (
+                k
+                for k in range(len(dates))
+                if not np.isnan(scores[k]) and (current is None or scores[k] < current)
+            ),
+            key=lambda k: (scores[k], offsets[k]),
+        )
+        return [
+            self._alternative(dates[k], int(scores[k]), current)
+            for k in ranked[:limit]
+        ]
+
+    def best_day(self, date, current=None):
+        """
+        Lowest-risk other day within the precomputed window, in O(1); None if
+        it does not beat current or the target date is itself the minimum.
+        """
+        target = datetime.date.fromisoformat(str(date)[:10])
+        if current is None:
+            current = self.expected_score(target)
+        target_doy = target.timetuple().tm_yday
+        best_doy = int(self.best_nearby[target_doy - 1]) + 1
+        score = self.expected[best_doy - 1]
+        if best_doy == target_doy or np.isnan(score) or current is None or score >= current:
+            return None
+        # Calendar date in the window with that day of year (years differ in length)
+        for offset in range(-self.half_window, self.half_window + 1):
+            day = target + datetime.timedelta(days=offset)
+            if day.timetuple().tm_yday == best_doy:
+                return self._alternative(day, int(score), current)
+        return None
+
+    @staticmethod
+    def _alternative(date, score, current):
+        delta = None if current is None else current - score
+        return {
+            "date": date.isoformat(),
+            "todi": score,
+            "delta": delta,
+            "improvement": round(100 * delta / current) if current and delta > 0 else 0,
+        }
+
+
+def recommend(index, date, current=None, half_window=None, limit=3):
+    """The frontend's recommendation object, with ranked alternatives."""
+    if current is None:
+        current = index.expected_score(date)
+    alternatives = index.alternatives(date, current, half_window, limit)
+    best = index.best_day(date, current) if half_window in (None, index.half_window) else None
+    if best is None and current is not None:
+        best = next((a for a in alternatives if a["todi"] < current), None)
+
+    percentile = None if current is None else index.percentile_rank(date, current)
+    if best is None:
+        return {
+            "date": str(date)[:10],
+            "todi": current,
+            "improvement": 0,
+            "notes": "No lower-risk day found nearby in the historical record.",
+            "percentile": percentile,
+            "alternatives": alternatives,
+            "basis": index.basis,
+        }
+    return {
+        **best,
+        "notes": (
+            f"{best['date']} has historically been {best['delta']} TODI points "
+            f"lower than your date ({current})."
+        ),
+        "percentile": percentile,
+        "alternatives": alternatives,
+        "basis": index.basis,
+    }
@@ -0,0 +1,162 @@
+import bisect
+import datetime
+
+DAYS_IN_CLIMATOLOGY = 366
+
+
+class Selection:
+    """Optional start/end/doy/fields query arguments shared by the data endpoints."""
+
+    def __init__(self, start=None, end=None, doys=None, fields=None):
+        self.start = start
+        self.end = end
+        self.doys = doys
+        self.fields = fields
+
+    @classmethod
+    def from_args(cls, args):
+        """Parses request.args; raises ValueError with a client-facing message."""
+        start = _parse_date(args.get("start"), "start")
+        end = _parse_date(args.get("end"), "end")
+        if start and end and start > end:
+            raise ValueError("start must not be after end")
+        doys = parse_doys(args["doy"]) if args.get("doy") else None
+        fields = None
+        if args.get("fields"):
+            fields = [f.strip() for f in args["fields"].split(",") if f.strip()]
+        return cls(start, end, doys, fields)
+
+    @property
+    def empty(self):
+        return not (self.start or self.end or self.doys or self.fields)
+
+    def climatology_doys(self):
+        """Days of year asked for, from doy= and/or the start/end dates."""
+        doys = set(self.doys) if self.doys else None
+        if self.start or self.end:
+            start = datetime.date.fromisoformat(self.start or self.end)
+            end = datetime.date.fromisoformat(self.end or self.start)
+            span = min((end - start).days + 1, DAYS_IN_CLIMATOLOGY)
+            dated = {
+                (start + datetime.timedelta(days=k)).timetuple().tm_yday
+                for k in range(span)
+            }
+            doys = dated if doys is None else doys & dated
+        return sorted(doys) if doys is not None else None
+
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value[:10]).isoformat()
+    except ValueError:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date")
+
+
+def parse_doys(text):
+    """
+    '152' -> [152]; '150-160' -> 150..160; '360-5' wraps the year end;
+    comma-separated lists of both are allowed.
+    """
+    doys = set()
+    for part in text.split(","):
+        part = part.strip()
+        try:
+            if "-" in part:
+                first, last = (int(p) for p in part.split("-", 1))
+                if not (1 <= first <= DAYS_IN_CLIMATOLOGY and 1 <= last <= DAYS_IN_CLIMATOLOGY):
+                    raise ValueError
+                if first <= last:
+                    doys.update(range(first, last + 1))
+                else:
+                    doys.update(range(first, DAYS_IN_CLIMATOLOGY + 1))
+                    doys.update(range(1, last + 1))
+            else:
+                day = int(part)
+                if not 1 <= day <= DAYS_IN_CLIMATOLOGY:
+                    raise ValueError
+                doys.add(day)
+        except ValueError:
+            raise ValueError("doy must be day-of-year numbers (1-366), ranges or lists")
+    return sorted(doys)
+
+
+class DateIndex:
+    """
+    Precomputed date -> row and day-of-year -> rows maps over an ascending
+    daily series, so a selection costs O(rows returned) instead of a scan.
+    """
+
+    def __init__(self, timestamps):
+        self.dates = [str(t)[:10] for t in timestamps]
+        self.position = {date: i for i, date in enumerate(self.dates)}
+        self.by_doy = {}
+        for i, date in enumerate(self.dates):
+            doy = datetime.date.fromisoformat(date).timetuple().tm_yday
+            self.by_doy.setdefault(doy, []).append(i)
+
+    def rows(self, selection):
+        """A slice (contiguous range) or a sorted list of row numbers."""
+        first, last = 0, len(self.dates)
+        if selection.start:
+            first = self.position.get(selection.start)
+            if first is None:
+                first = bisect.bisect_left(self.dates, selection.start)
+        if selection.end:
+            last = self.position.get(selection.end)
+            last = bisect.bisect_right(self.dates, selection.end) if last is None else last + 1
+        if not selection.doys:
+            return slice(first, max(first, last))
+        return sorted(
+            i
+            for doy in selection.doys
+            for i in self.by_doy.get(doy, ())
+            if first <= i < last
+        )
+
+
+def take(values, rows):
+    if isinstance(rows, slice):
+        return values[rows]
+    return [values[i] for i in rows]
+
+
+def check_fields(fields, available):
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}"
+        )
+
+
+def select_daily_summary(payload, index, selection):
+    """Slices a processed_data.json-style payload by rows and columns."""
+    summary = payload.get("daily_summary", {})
+    columns = [name for name in summary if name != "timestamps"]
+    if selection.fields:
+        check_fields(selection.fields, columns)
+        columns = [name for name in columns if name in selection.fields]
+    rows = index.rows(selection)
+    selected = {"timestamps": take(summary.get("timestamps", []), rows)}
+    for name in columns:
+        selected[name] = take(summary[name], rows)
+    return {"location": payload.get("location"), "daily_summary": selected}
+
+
+def select_climatology(payload, selection):
+    """Picks days of year and fields out of a climatology_full-style payload."""
+    table = payload.get("daily_climatology", {})
+    doys = selection.climatology_doys()
+    keys = [str(d) for d in doys] if doys is not None else list(table)
+    fields = selection.fields
+    if fields:
+        available = list(next(iter(table.values()), {}))
+        check_fields(fields, available)
+    selected = {}
+    for key in keys:
+        day = table.get(key)
+        if day is None:
+            continue
+        selected[key] = {f: day[f] for f in fields} if fields else day
+    return {"location": payload.get("location"), "daily_climatology": selected}
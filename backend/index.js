@@ -22,13 +22,120 @@ try {
   process.exit(1);
 }
 
+// --- Per-day-of-year TODI index for "best day" recommendations (see backend-service/recommender.py) ---
+const DAYS_IN_YEAR = 366;
+const HALF_WINDOW = 7;
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+const dayOfYear = (date) => {
+  const d = new Date(date);
+  return Math.round((Date.UTC(d.getUTCFullYear(), d.getUTCMonth(), d.getUTCDate()) - Date.UTC(d.getUTCFullYear(), 0, 1)) / DAY_MS) + 1;
+};
+
+const buildTodiIndex = (summary) => {
+  const byDoy = new Map();
+  (summary.timestamps || []).forEach((t, i) => {
+    const score = summary.todi_score[i];
+    if (score === null || score === undefined) return;
+    const doy = dayOfYear(t.slice(0, 10));
+    if (!byDoy.has(doy)) byDoy.set(doy, []);
+    byDoy.get(doy).push(score);
+  });
+  // expected[doy - 1]: median historical TODI for that day of year (Infinity when unknown)
+  const expected = new Array(DAYS_IN_YEAR).fill(Infinity);
+  byDoy.forEach((scores, doy) => {
+    scores.sort((a, b) => a - b);
+    const mid = scores.length >> 1;
+    expected[doy - 1] = scores.length % 2 ? scores[mid] : (scores[mid - 1] + scores[mid]) / 2;
+  });
+  return { expected: expected.map((v) => (Number.isFinite(v) ? Math.trunc(v) : v)) };
+};
+
+const todiIndex = buildTodiIndex(riskData.daily_summary || {});
+
+// Ranked lower-risk alternatives within +/- HALF_WINDOW days, lowest expected TODI first (ties: earlier day).
+// The index is the mock reference location's history, flagged as such through "basis" like the Python backend.
+const RECOMMENDATION_BASIS = 'reference_location';
+const recommendDay = (date, currentTODI) => {
+  const target = new Date(`${date}T00:00:00Z`);
+  const candidates = [];
+  for (let k = -HALF_WINDOW; k <= HALF_WINDOW; k += 1) {
+    if (k === 0) continue;
+    const day = new Date(target.getTime() + k * DAY_MS).toISOString().split('T')[0];
+    const todi = todiIndex.expected[dayOfYear(day) - 1];
+    if (!Number.isFinite(todi) || (Number.isFinite(currentTODI) && todi >= currentTODI)) continue;
+    const delta = currentTODI - todi;
+    const improvement = currentTODI && delta > 0 ? Math.round((100 * delta) / currentTODI) : 0;
+    candidates.push({ date: day, todi, delta, improvement, offset: k });
+  }
+  candidates.sort((a, b) => a.todi - b.todi || a.offset - b.offset);
+  const alternatives = candidates.slice(0, 3).map(({ offset, ...rest }) => rest);
+  const best = alternatives.find((a) => a.todi < currentTODI);
+  if (!best) {
+    return {
+      date,
+      todi: currentTODI,
+      improvement: 0,
+      notes: 'No lower-risk day found nearby in the historical record.',
+      alternatives,
+      basis: RECOMMENDATION_BASIS,
+    };
+  }
+  return {
+    ...best,
+    notes: `${best.date} has historically been ${best.delta} TODI points lower than your date (${currentTODI}).`,
+    alternatives,
+    basis: RECOMMENDATION_BASIS,
+  };
+};
+
 // --- API Endpoints (mock data endpoints are unchanged) ---
 app.get('/api/real/risk', (req, res) => res.json(riskData));
 app.get('/api/climatology', (req, res) => res.json(climatologyData));
 app.get('/api/graph-data', (req, res) => res.json(graphData));
 
-// --- NEW: Simple in-memory cache ---
-const liveDataCache = new Map(); // key: `${lat}_${lon}_${date}`, value: JSON result
+// --- Bounded LRU/TTL cache, keyed by MERRA-2 grid cell (0.5° x 0.625°) ---
+const LIVE_CACHE_SIZE = parseInt(process.env.LIVE_CACHE_SIZE, 10) || 512;
+const LIVE_CACHE_TTL_MS = (parseFloat(process.env.LIVE_CACHE_TTL) || 6 * 3600) * 1000;
+const liveDataCache = new Map(); // key: `${cellLat}_${cellLon}_${date}`, value: { expiresAt, value }
+const cacheStats = { hits: 0, misses: 0, evictions: 0, expirations: 0 };
+
+// Same snapping as merra2_grid.py: points in one cell share a cache entry
+const snapToGrid = (lat, lon) => {
+  const latIndex = Math.min(Math.max(Math.floor((Number(lat) + 90) / 0.5 + 0.5), 0), 360);
+  const lonIndex = ((Math.floor((Number(lon) + 180) / 0.625 + 0.5) % 576) + 576) % 576;
+  return [-90 + latIndex * 0.5, -180 + lonIndex * 0.625];
+};
+
+const cacheGet = (key) => {
+  const entry = liveDataCache.get(key);
+  if (!entry) {
+    cacheStats.misses += 1;
+    return undefined;
+  }
+  liveDataCache.delete(key);
+  if (entry.expiresAt <= Date.now()) {
+    cacheStats.expirations += 1;
+    cacheStats.misses += 1;
+    return undefined;
+  }
+  liveDataCache.set(key, entry); // re-insert: Map order is our LRU order
+  cacheStats.hits += 1;
+  return entry.value;
+};
+
+const cacheSet = (key, value) => {
+  liveDataCache.delete(key);
+  liveDataCache.set(key, { expiresAt: Date.now() + LIVE_CACHE_TTL_MS, value });
+  while (liveDataCache.size > LIVE_CACHE_SIZE) {
+    liveDataCache.delete(liveDataCache.keys().next().value);
+    cacheStats.evictions += 1;
+  }
+};
+
+app.get('/api/cache-stats', (req, res) =>
+  res.json({ liveDataCache: { ...cacheStats, entries: liveDataCache.size, maxEntries: LIVE_CACHE_SIZE } })
+);
 
 app.get('/api/live-risk', (req, res) => {
   const { lat, lon, date } = req.query;
@@ -36,9 +143,14 @@ app.get('/api/live-risk', (req, res) => {
     return res.status(400).json({ error: 'Parameters are required.' });
   }
 
-  const cacheKey = `${lat}_${lon}_${date}`;
-  if (liveDataCache.has(cacheKey)) {
-    const cached = liveDataCache.get(cacheKey);
+  if (Number.isNaN(Number(lat)) || Number.isNaN(Number(lon))) {
+    return res.status(400).json({ error: 'lat and lon must be numbers.' });
+  }
+
+  const [cellLat, cellLon] = snapToGrid(lat, lon);
+  const cacheKey = `${cellLat}_${cellLon}_${date}`;
+  const cached = cacheGet(cacheKey);
+  if (cached) {
     res.setHeader('Content-Type', 'text/event-stream');
     res.setHeader('Cache-Control', 'no-cache');
     res.setHeader('Connection', 'keep-alive');
@@ -56,7 +168,7 @@ app.get('/api/live-risk', (req, res) => {
   const pythonExecutable = process.env.PYTHON_PATH || 'python3';
   const scriptPath = path.join(__dirname, 'live_nasa_processor.py'); // now relative to backend
 
-  const pythonProcess = spawn(pythonExecutable, [scriptPath, lat, lon, date]);
+  const pythonProcess = spawn(pythonExecutable, [scriptPath, String(cellLat), String(cellLon), date]);
 
   // Stream Python logs to client
   pythonProcess.stderr.on('data', (data) => {
@@ -75,20 +187,12 @@ app.get('/api/live-risk', (req, res) => {
       try {
         const liveData = JSON.parse(finalJson);
 
-        // --- Smart Recommendation ---
+        // --- Smart Recommendation: lowest historical TODI near the date ---
         const currentTODI = liveData.daily_summary.todi_score[0] || 0;
-        const currentDate = new Date(date);
-        const recommendedDate = new Date(currentDate.getTime() + 24 * 60 * 60 * 1000);
-        const improvedTODI = Math.max(currentTODI - 1, 0);
-        const recommendation = {
-          date: recommendedDate.toISOString().split('T')[0],
-          todi: improvedTODI,
-          improvement: Math.round(((currentTODI - improvedTODI) / currentTODI) * 100) || 0,
-          notes: `Based on live NASA data, ${recommendedDate.toLocaleDateString()} is predicted to be safer.`,
-        };
+        const recommendation = recommendDay(date, currentTODI);
 
         const result = { liveData, recommendation };
-        liveDataCache.set(cacheKey, result);
+        cacheSet(cacheKey, result);
         res.write(`event: result\ndata: ${JSON.stringify(result)}\n\n`);
       } catch (err) {
         res.write(`data: {"error": "Failed to parse Python output."}\n\n`);
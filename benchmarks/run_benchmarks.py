@@ -0,0 +1,410 @@
+"""
+Benchmarks for the processing and serving hot paths, on synthetic data only
+(no network, no Earthdata login). Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --days 30 --lat-cells 24 --lon-cells 24
+
+Results are written as JSON (--output) so runs can be compared over time.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_DIR = os.path.join(ROOT, "backend-service")
+# The service's own modules (and its copy of the live processor) come first
+sys.path[:0] = [SERVICE_DIR, ROOT]
+
+import todi_engine  # noqa: E402
+from merra2_grid import lat_index, lon_index  # noqa: E402
+from mock_merra2_generator import generate_archive  # noqa: E402
+
+SUITES = ["engine", "processor", "loading", "endpoints"]
+START_DATE = "2023-01-01"
+# Benchmarked cells are centered on the processors' default point
+CENTER = (17.6868, 83.2185)
+
+
+def timed(function, repeat=5):
+    """Runs function `repeat` times; timing stats in seconds and the last return value."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = function()
+        durations.append(time.perf_counter() - started)
+    return {
+        "runs": repeat,
+        "min_s": min(durations),
+        "median_s": statistics.median(durations),
+        "mean_s": statistics.fmean(durations),
+    }, value
+
+
+def latency_stats(latencies, elapsed, errors):
+    latencies = np.sort(np.asarray(latencies))
+    return {
+        "requests": int(latencies.size),
+        "errors": errors,
+        "throughput_rps": latencies.size / elapsed if elapsed else None,
+        "mean_ms": 1000 * float(latencies.mean()),
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "p99_ms": 1000 * float(np.percentile(latencies, 99)),
+        "max_ms": 1000 * float(latencies[-1]),
+    }
+
+
+class Workspace:
+    """Synthetic granules and the stores built from them, shared by the suites."""
+
+    def __init__(self, args):
+        self.args = args
+        self.root = tempfile.mkdtemp(prefix="climarisk-bench-")
+        self.region = (
+            (
+                lat_index(CENTER[0]) - args.lat_cells // 2,
+                lon_index(CENTER[1]) - args.lon_cells // 2,
+            ),
+            args.lat_cells,
+            args.lon_cells,
+        )
+        self.granules = None
+        self.store = None
+
+    def granule_files(self):
+        if self.granules is None:
+            self.granules = generate_archive(
+                os.path.join(self.root, "granules"),
+                START_DATE,
+                self.day(self.args.days - 1),
+                self.region,
+                self.args.seed,
+            )
+        return self.granules
+
+    def day(self, offset):
+        return (date.fromisoformat(START_DATE) + timedelta(days=offset)).isoformat()
+
+    def store_path(self):
+        if self.store is None:
+            import nasa_data_processor
+
+            self.store = os.path.join(self.root, "processed_grid.nc")
+            with contextlib.redirect_stdout(io.StringIO()):
+                nasa_data_processor.rebuild(self.granule_files(), self.store)
+        return self.store
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def bench_engine(workspace):
+    """Scalar (per-value Python) vs. array (vectorized) TODI scoring."""
+    args = workspace.args
+    rng = np.random.default_rng(args.seed)
+    temps = rng.uniform(-20, 45, args.values)
+    humidity = rng.uniform(10, 100, args.values)
+    winds = rng.uniform(0, 20, args.values)
+
+    scalar_values = min(args.scalar_values, args.values)
+    scalar, _ = timed(
+        lambda: [
+            todi_engine.calculate_todi_score(t, h, w)
+            for t, h, w in zip(
+                temps[:scalar_values].tolist(),
+                humidity[:scalar_values].tolist(),
+                winds[:scalar_values].tolist(),
+            )
+        ],
+        args.repeat,
+    )
+    array, _ = timed(
+        lambda: todi_engine.calculate_todi_score_array(temps, humidity, winds), args.repeat
+    )
+    scalar["values"], array["values"] = scalar_values, args.values
+    for stats in (scalar, array):
+        stats["values_per_s"] = stats["values"] / stats["median_s"]
+    return {
+        "todi_score_scalar": scalar,
+        "todi_score_array": array,
+        "array_speedup": array["values_per_s"] / scalar["values_per_s"],
+    }
+
+
+def bench_processor(workspace):
+    """nasa_data_processor over the synthetic archive: daily grid, full rebuild, append."""
+    import xarray as xr
+
+    import nasa_data_processor
+
+    args = workspace.args
+    generate, files = timed(workspace.granule_files, 1)
+    daily_grid, _ = timed(
+        lambda: nasa_data_processor.compute_daily_grid(
+            xr.open_mfdataset(files, combine="by_coords")
+        ),
+        args.repeat,
+    )
+
+    store = os.path.join(workspace.root, "processor_grid.nc")
+    with contextlib.redirect_stdout(io.StringIO()):
+        rebuild, _ = timed(lambda: nasa_data_processor.rebuild(files, store), args.repeat)
+        # One more day written into the existing store, as --incremental does
+        next_day = generate_archive(
+            os.path.join(workspace.root, "next_day"),
+            workspace.day(args.days),
+            workspace.day(args.days),
+            workspace.region,
+            args.seed,
+        )
+        append, _ = timed(lambda: nasa_data_processor.update(next_day, store), args.repeat)
+
+    cell_days = args.days * args.lat_cells * args.lon_cells
+    for stats in (daily_grid, rebuild):
+        stats["cell_days_per_s"] = cell_days / stats["median_s"]
+    return {
+        "generate_granules": generate,
+        "compute_daily_grid": daily_grid,
+        "rebuild_store": rebuild,
+        "append_one_day": append,
+        "store_bytes": os.path.getsize(store),
+    }
+
+
+def bench_loading(workspace):
+    """
+    The service's two data paths: the whole grid as JSON (as the mock files are
+    served) against the columnar store opened lazily and queried per point.
+    """
+    import xarray as xr
+
+    import nasa_data_processor
+    from grid_store import GridStore, risk_payload
+    from prepared_response import PreparedJSON
+
+    args = workspace.args
+    store = workspace.store_path()
+    with xr.open_dataset(store) as daily:
+        daily = daily.load()
+    grid_json = os.path.join(workspace.root, "processed_grid.json")
+    with open(grid_json, "w") as f:
+        json.dump(
+            {
+                f"{float(lat):g}_{float(lon):g}": nasa_data_processor.point_summary(
+                    daily, lat, lon
+                )
+                for lat in daily["lat"].values
+                for lon in daily["lon"].values
+            },
+            f,
+        )
+
+    def load_json():
+        with open(grid_json, "r") as f:
+            return json.load(f)
+
+    json_load, payload = timed(load_json, args.repeat)
+    json_prepare, _ = timed(lambda: PreparedJSON(next(iter(payload.values()))), args.repeat)
+
+    store_open, grid = timed(lambda: GridStore(store), args.repeat)
+    rng = np.random.default_rng(args.seed)
+    points = list(
+        zip(
+            rng.uniform(daily["lat"].values[0], daily["lat"].values[-1], args.queries),
+            rng.uniform(daily["lon"].values[0], daily["lon"].values[-1], args.queries),
+        )
+    )
+    nearest, _ = timed(lambda: [risk_payload(grid, lat, lon) for lat, lon in points], 1)
+    bilinear, _ = timed(
+        lambda: [risk_payload(grid, lat, lon, "bilinear") for lat, lon in points], 1
+    )
+    for stats in (nearest, bilinear):
+        stats["queries"] = args.queries
+        stats["per_query_ms"] = 1000 * stats["median_s"] / args.queries
+    grid.close()
+    return {
+        "json_grid_load": {**json_load, "bytes": os.path.getsize(grid_json)},
+        "json_prepare_point": json_prepare,
+        "store_open": {**store_open, "bytes": os.path.getsize(store)},
+        "store_point_query_nearest": nearest,
+        "store_point_query_bilinear": bilinear,
+    }
+
+
+def load_test(url, count, concurrency, check=None):
+    """`count` GETs of url(k) from `concurrency` client threads; latency percentiles."""
+    import requests
+
+    session_local = threading.local()
+
+    def fetch(k):
+        session = getattr(session_local, "session", None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        started = time.perf_counter()
+        response = session.get(url(k), timeout=300)
+        latency = time.perf_counter() - started
+        ok = response.status_code == 200 and (check is None or check(response.text))
+        return latency, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, range(count)))
+    elapsed = time.perf_counter() - started
+    return latency_stats(
+        [latency for latency, _ in results], elapsed, sum(not ok for _, ok in results)
+    )
+
+
+def bench_endpoints(workspace):
+    """
+    Latency and throughput of the Flask service under concurrent clients, served
+    by werkzeug's threaded server. Live requests reach mock_opendap_server.py
+    through the real process pool and granule cache.
+    """
+    from werkzeug.serving import make_server
+
+    from mock_opendap_server import MockOpendapServer, url_template
+
+    args = workspace.args
+    store = workspace.store_path()
+    opendap = MockOpendapServer(seed=args.seed)
+    opendap_server = opendap.serve()
+    # Generated up front, so cold requests time the fetch and scoring alone
+    opendap.granule("20230601")
+    # Set before the live modules load and the pool forks, so the workers inherit them
+    os.environ["LIVE_OPENDAP_URL_TEMPLATE"] = url_template(opendap_server)
+    import live_nasa_processor
+    from granule_cache import GranuleCache
+
+    live_nasa_processor.granule_cache = GranuleCache(os.path.join(workspace.root, "cache"))
+
+    # The service's mock files next to the benchmark's gridded store
+    data_dir = os.path.join(workspace.root, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    for name in os.listdir(SERVICE_DIR):
+        if name.endswith(".json"):
+            shutil.copy(os.path.join(SERVICE_DIR, name), data_dir)
+    shutil.copy(store, os.path.join(data_dir, "processed_grid.nc"))
+    os.environ.update({"DATA_DIR": data_dir, "DATA_WATCH_INTERVAL": "0"})
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app as service
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = make_server("127.0.0.1", 0, service.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+
+        lat, lon = CENTER
+        n, c = args.requests, args.concurrency
+        results = {
+            "risk_prepared": load_test(lambda k: f"{base}/api/real/risk", n, c),
+            "risk_range": load_test(
+                lambda k: f"{base}/api/real/risk?start=2023-01-01&end=2023-01-31", n, c
+            ),
+            "risk_grid_point": load_test(
+                lambda k: f"{base}/api/real/risk?lat={lat + 0.01 * (k % 50)}&lon={lon}", n, c
+            ),
+            "climatology_prepared": load_test(lambda k: f"{base}/api/climatology", n, c),
+            "graph_rebinned": load_test(
+                lambda k: f"{base}/api/graph-data?doy={1 + k % 366}&bins=12", n, c
+            ),
+            "recommendation_grid": load_test(
+                lambda k: (
+                    f"{base}/api/recommendation?date=2023-01-{1 + k % 28:02d}"
+                    f"&lat={lat}&lon={lon}"
+                ),
+                n,
+                c,
+            ),
+        }
+
+        # Cold: every request is a different cell, so each one is a live job
+        # (fetch from the stand-in, cache, score); warm: the same cells again
+        live_cells = args.live_requests
+        live_url = lambda k: (
+            f"{base}/api/live-risk?lat={lat + 0.5 * k}&lon={lon}&date=2023-06-01"
+        )
+        has_result = lambda body: "event: result" in body
+        live_concurrency = min(c, service.live_runner.max_workers)
+        results["live_risk_cold"] = load_test(live_url, live_cells, live_concurrency, has_result)
+        results["live_risk_cached"] = load_test(live_url, live_cells, c, has_result)
+        results["live_risk_cold"]["opendap"] = dict(opendap.stats)
+        server.shutdown()
+    finally:
+        opendap_server.shutdown()
+    return results
+
+
+BENCHMARKS = {
+    "engine": bench_engine,
+    "processor": bench_processor,
+    "loading": bench_loading,
+    "endpoints": bench_endpoints,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the processing and serving hot paths on synthetic data."
+    )
+    parser.add_argument("--only", default=",".join(SUITES), help="comma-separated suites")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--days", type=int, default=30, help="days in the synthetic archive")
+    parser.add_argument("--lat-cells", type=int, default=24)
+    parser.add_argument("--lon-cells", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timed step")
+    parser.add_argument("--values", type=int, default=1_000_000, help="values for array scoring")
+    parser.add_argument("--scalar-values", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200, help="point queries on the store")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--live-requests", type=int, default=8)
+    args = parser.parse_args()
+
+    suites = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": vars(args),
+        "results": {},
+    }
+    workspace = Workspace(args)
+    try:
+        for name in suites:
+            print(f"--- Running '{name}' benchmarks ---", file=sys.stderr)
+            report["results"][name] = BENCHMARKS[name](workspace)
+    finally:
+        workspace.close()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Saved benchmark results to '{args.output}'", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import contextlib
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Cells per spatial chunk edge; a point query reads one chunk column
+SPATIAL_CHUNK = 16
+# Days (or days of year) per chunk along the leading axis
+TIME_CHUNK = 366
+COMPRESSION = {"zlib": True, "complevel": 4, "shuffle": True}
+# Month of a segment file: days added to a store after it was written go to
+# one file per month next to it, e.g. processed_grid.2024-06.nc
+SEGMENT_MONTH = "[0-9][0-9][0-9][0-9]-[0-9][0-9]"
+
+
+def store_encoding(ds):
+    """
+    Chunked, compressed NetCDF4 encoding for every data variable.
+    Chunks span a long run of days for a small block of cells, which matches
+    the service's access pattern: one location, a range of dates.
+    """
+    encoding = {}
+    for name, var in ds.data_vars.items():
+        chunks = []
+        for dim in var.dims:
+            limit = SPATIAL_CHUNK if dim in ("lat", "lon") else TIME_CHUNK
+            chunks.append(max(1, min(ds.sizes[dim], limit)))
+        encoding[name] = {**COMPRESSION, "chunksizes": tuple(chunks)}
+        if np.issubdtype(var.dtype, np.floating):
+            encoding[name]["_FillValue"] = np.nan
+    return encoding
+
+
+def write_store(ds, path):
+    """
+    Writes a processed Dataset as a chunked, compressed NetCDF4 store.
+    The file is written next to the target and renamed into place, so readers
+    never open a half-written store. 'time' is unlimited so new days can be
+    appended later without rewriting the file.
+    """
+    tmp_path = f"{path}.tmp"
+    unlimited = ["time"] if "time" in ds.dims else None
+    ds.to_netcdf(
+        tmp_path,
+        format="NETCDF4",
+        engine="netcdf4",
+        encoding=store_encoding(ds),
+        unlimited_dims=unlimited,
+    )
+    os.replace(tmp_path, path)
+    return path
+
+
+def segment_path(path, month):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{month}{ext}"
+
+
+def store_segments(path):
+    """Paths of the store's segment files, earliest month first."""
+    stem, ext = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(stem)}.{SEGMENT_MONTH}{ext}"))
+
+
+def remove_segments(path):
+    """Drops the store's segments, e.g. once write_store has rebuilt it with their days."""
+    for segment in store_segments(path):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(segment)
+
+
+def append_store(ds, path):
+    """
+    Adds the days of `ds` to an existing store without rewriting it: they go
+    into the store's segment file for their month, merged with the days that
+    segment already has (a day stored before is replaced), and each segment
+    is written like write_store, renamed into place. An update therefore
+    rewrites at most a month of days, however large the store has grown, and
+    the store itself, which the service holds open, is never written to.
+    Readers combine the store with its segments (GridStore, open_store).
+    Raises ValueError when the grid or variables differ; the caller should
+    rebuild the store with write_store (and remove_segments) then. Returns
+    the number of days new to the store.
+    """
+    with xr.open_dataset(path) as base:
+        for axis in ("lat", "lon"):
+            if not np.array_equal(base[axis].values, ds[axis].values):
+                raise ValueError(f"{axis} grid of the new days differs from {path}")
+        if set(base.data_vars) != set(ds.data_vars):
+            raise ValueError(f"Variables of the new days differ from {path}")
+        stored = set(pd.DatetimeIndex(base["time"].values))
+    for segment in store_segments(path):
+        with xr.open_dataset(segment) as part:
+            stored.update(pd.DatetimeIndex(part["time"].values))
+
+    times = pd.DatetimeIndex(ds["time"].values)
+    months = times.strftime("%Y-%m").values
+    for month in sorted(set(months)):
+        days = ds.isel(time=np.flatnonzero(months == month))
+        target = segment_path(path, month)
+        if os.path.exists(target):
+            with xr.open_dataset(target) as part:
+                days = _merge_days(part.load(), days)
+        write_store(days, target)
+    return sum(1 for t in times if t not in stored)
+
+
+def _merge_days(old, new):
+    """old and new days together, sorted; a day in both is taken from new."""
+    merged = xr.concat([old, new], dim="time")
+    keep = ~merged.get_index("time").duplicated(keep="last")
+    return merged.isel(time=np.flatnonzero(keep)).sortby("time")
+
+
+def open_store(path, **kwargs):
+    """
+    The store and its segments as one lazily read Dataset; a day in a later
+    file replaces the same day in an earlier one.
+    """
+    segments = store_segments(path)
+    if not segments:
+        return xr.open_dataset(path, **kwargs)
+    parts = [xr.open_dataset(p, chunks={}, **kwargs) for p in [path] + segments]
+    combined = _merge_days(parts[0], xr.concat(parts[1:], dim="time"))
+    combined.set_close(lambda: [part.close() for part in parts])
+    return combined
@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+import xarray as xr
+
+import metrics
+
+
+class _Entry:
+    def __init__(self):
+        self.dataset = None
+        self.error = None
+        self.refs = 1
+        self.ready = threading.Event()
+
+
+class DatasetPool:
+    """
+    Open xarray datasets shared by every request in the process, keyed by
+    file. Requests for the same granule file (several points or days on the
+    same date) reuse one open, and for files of up to load_max_bytes (the
+    hyperslab subsets) one decode: they are read into memory and their file
+    is closed at once. Larger files (full granules) stay open so each point
+    reads only its own cells.
+
+    acquire() hands out a dataset and counts the reference; release() gives
+    it back. At most max_open datasets are kept; the least recently used
+    ones that no request holds are closed first, and one in use is never
+    closed under its reader.
+    """
+
+    def __init__(self, max_open=16, load_max_bytes=64 * 1024**2):
+        self.max_open = max_open
+        self.load_max_bytes = load_max_bytes
+        self.lock = threading.Lock()
+        # path -> _Entry, least recently used first
+        self.entries = OrderedDict()
+        # id(dataset) -> entry, for release()
+        self.held = {}
+
+    def _open(self, path):
+        with metrics.stage("open_dataset"):
+            ds = xr.open_dataset(path)
+            if ds.nbytes <= self.load_max_bytes:
+                try:
+                    ds.load()
+                finally:
+                    ds.close()
+        return ds
+
+    def acquire(self, path):
+        """The dataset of the file at path, opened only if no request has it open already."""
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                entry.refs += 1
+                self.entries.move_to_end(path)
+                opener = False
+            else:
+                entry = self.entries[path] = _Entry()
+                opener = True
+        metrics.record("live_dataset_pool_lookups_total", result="miss" if opener else "hit")
+
+        if not opener:
+            # Another request may still be opening it
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.dataset
+
+        try:
+            entry.dataset = self._open(path)
+        except BaseException as e:
+            with self.lock:
+                if self.entries.get(path) is entry:
+                    del self.entries[path]
+            entry.error = e
+            entry.ready.set()
+            raise
+        with self.lock:
+            self.held[id(entry.dataset)] = entry
+        entry.ready.set()
+        self._evict()
+        return entry.dataset
+
+    def release(self, ds):
+        """Gives back a dataset from acquire()."""
+        with self.lock:
+            entry = self.held.get(id(ds))
+            if entry is None:
+                return
+            entry.refs -= 1
+        self._evict()
+
+    def _evict(self):
+        closing = []
+        with self.lock:
+            excess = len(self.entries) - self.max_open
+            for path in list(self.entries):
+                if excess <= 0:
+                    break
+                entry = self.entries[path]
+                if entry.refs > 0 or not entry.ready.is_set():
+                    continue
+                del self.entries[path]
+                del self.held[id(entry.dataset)]
+                closing.append(entry.dataset)
+                excess -= 1
+        for ds in closing:
+            ds.close()
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,195 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:  # POSIX only; without it the index is still written atomically
+    import fcntl
+except ImportError:
+    fcntl = None
+
+INDEX_NAME = "index.json"
+# Seconds lookups keep their last-use updates in memory before writing them to
+# the index (stores and discards write them at once, along with their own change)
+RECENCY_FLUSH_SECONDS = 60
+
+
+def granule_key(granule_id, variables, subset=None):
+    """
+    Cache key for a downloaded file: which granule, which variables and which
+    (grid-snapped) spatial subset. Two requests in the same MERRA-2 cells hit
+    the same entry no matter how their coordinates were written.
+    """
+    subset_part = "global" if subset is None else subset
+    return f"{granule_id}|{','.join(sorted(variables))}|{subset_part}"
+
+
+class GranuleCache:
+    """
+    On-disk cache of downloaded NetCDF files with an LRU size cap.
+    A JSON index records each entry's file, size and last use, so lookups never
+    stat the data files. Files are written under a temporary name and renamed
+    into place, so an interrupted download can never be mistaken for a hit.
+    The index is guarded by a lock file, so several processes can share a cache.
+    Lookups only read it (reparsing it when another writer has replaced it);
+    the last uses they record are written with the next store or discard, or
+    after RECENCY_FLUSH_SECONDS.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_NAME)
+        self.lock = threading.Lock()
+        self.index = {}
+        self.loaded_version = None
+        # key -> last use not written to the index yet
+        self.recent = {}
+        self.flushed_at = time.monotonic()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked_index(self):
+        """Yields the index dict under an exclusive lock and saves it afterwards."""
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                with self.lock:
+                    recent, self.recent = self.recent, {}
+                    self.flushed_at = time.monotonic()
+                for key, last_used in recent.items():
+                    if key in index:
+                        index[key]["last_used"] = max(index[key]["last_used"], last_used)
+                yield index
+                self._write_index(index)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".index.tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def path_for(self, key):
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".nc"
+        )
+
+    def _current_index(self):
+        """The index on disk, reparsed only when a writer has replaced the file."""
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return {}
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self.lock:
+            if version != self.loaded_version:
+                self.index = self._read_index()
+                self.loaded_version = version
+            return self.index
+
+    def lookup(self, key):
+        """Path of the cached file for key, or None. Marks the entry as recently used."""
+        entry = self._current_index().get(key)
+        if entry is None:
+            return None
+        with self.lock:
+            self.recent[key] = time.time()
+            due = time.monotonic() - self.flushed_at >= RECENCY_FLUSH_SECONDS
+        if due:
+            self.flush()
+        return os.path.join(self.cache_dir, entry["file"])
+
+    def flush(self):
+        """Writes the last uses recorded by lookups to the index."""
+        with self._locked_index():
+            pass
+
+    def discard(self, key):
+        """Forgets an entry (e.g. its file turned out to be missing or unreadable)."""
+        with self._locked_index() as index:
+            entry = index.pop(key, None)
+        if entry is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+
+    def new_part(self):
+        """(fd, path) of a new temporary file in the cache directory, for store_file()."""
+        return tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+
+    def store(self, key, chunks):
+        """
+        Writes an iterable of byte chunks as the entry for key, atomically,
+        then evicts least recently used entries until the cache fits max_bytes.
+        """
+        fd, tmp_path = self.new_part()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+        return self.store_file(key, tmp_path)
+
+    def store_file(self, key, tmp_path):
+        """
+        Moves a complete file from new_part() into place as the entry for key,
+        like store() (for writers that stream it themselves, e.g. asynchronously).
+        """
+        path = self.path_for(key)
+        try:
+            num_bytes = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+
+        with self._locked_index() as index:
+            index[key] = {
+                "file": os.path.basename(path),
+                "bytes": num_bytes,
+                "last_used": time.time(),
+            }
+            evicted = self._evict(index, keep=key)
+        for name in evicted:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.cache_dir, name))
+        return path
+
+    def _evict(self, index, keep):
+        total = sum(entry["bytes"] for entry in index.values())
+        evicted = []
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = index.pop(key)
+            total -= entry["bytes"]
+            evicted.append(entry["file"])
+        return evicted
+
+    def usage(self):
+        index = self._current_index()
+        return {
+            "entries": len(index),
+            "bytes": sum(entry["bytes"] for entry in index.values()),
+            "max_bytes": self.max_bytes,
+        }
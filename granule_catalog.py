@@ -0,0 +1,173 @@
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import metrics
+
+try:  # POSIX only; without it the catalog is still written atomically
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Seconds a date CMR had no granule for is not searched again (recent days
+# appear a few weeks late; without this each request for them would search)
+MISS_TTL_SECONDS = 3600
+CATALOG_NAME = "granule_catalog.json"
+
+
+def date_range(start_date, end_date):
+    first, last = date.fromisoformat(str(start_date)[:10]), date.fromisoformat(str(end_date)[:10])
+    return [(first + timedelta(days=k)).isoformat() for k in range((last - first).days + 1)]
+
+
+class GranuleCatalog:
+    """
+    Persistent map of date -> OPeNDAP URL of that day's M2T1NXSLV granule.
+    The granule for a date is global, the same for every location, so one CMR
+    search answers all requests for it: the catalog is consulted first and
+    only dates it does not know are searched, a whole range in one call.
+    The JSON file is written atomically under a lock file, so the web process
+    and the pool workers share (and warm) one catalog.
+    """
+
+    def __init__(self, path, search):
+        # search(start_date, end_date) -> {date: OPeNDAP URL} of the granules found
+        self.path = path
+        self.search = search
+        self.lock = threading.Lock()
+        self.urls = {}
+        self.loaded_mtime = None
+        self.missed = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._refresh()
+
+    def _refresh(self):
+        """Rereads the file if another process has changed it since."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self.loaded_mtime:
+            return
+        try:
+            with open(self.path, "r") as f:
+                urls = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self.lock:
+            self.urls.update(urls)
+            self.loaded_mtime = mtime
+
+    @contextlib.contextmanager
+    def _locked_file(self):
+        """Yields the catalog on disk under an exclusive lock and saves it afterwards."""
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, "r") as f:
+                        urls = json.load(f)
+                except (OSError, ValueError):
+                    urls = {}
+                yield urls
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(self.path) or ".", suffix=".catalog.tmp"
+                )
+                with os.fdopen(fd, "w") as f:
+                    json.dump(urls, f, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def warm(self, start_date, end_date):
+        """Searches CMR once for every granule from start_date to end_date and records them."""
+        found = self.search(start_date, end_date)
+        if found:
+            with self._locked_file() as urls:
+                urls.update(found)
+                merged = dict(urls)
+            with self.lock:
+                self.urls.update(merged)
+        now = time.monotonic()
+        with self.lock:
+            for day in date_range(start_date, end_date):
+                if day not in found:
+                    self.missed[day] = now
+        return found
+
+    def lookup(self, start_date, end_date, search_range=None):
+        """
+        {date: URL} for the dates in the range that have a granule. Dates
+        missing from the catalog are searched in one call (over search_range,
+        if given, to fill in more at once), unless they were searched without
+        result in the last MISS_TTL_SECONDS.
+        """
+        days = date_range(start_date, end_date)
+        unknown = [day for day in days if day not in self.urls]
+        if unknown:
+            self._refresh()
+            now = time.monotonic()
+            with self.lock:
+                unknown = [
+                    day
+                    for day in days
+                    if day not in self.urls
+                    and now - self.missed.get(day, -MISS_TTL_SECONDS) >= MISS_TTL_SECONDS
+                ]
+        for day in days:
+            if day in self.urls:
+                result = "hit"
+            else:
+                result = "miss" if day in unknown else "recent_miss"
+            metrics.record("live_granule_catalog_lookups_total", result=result)
+        if unknown:
+            self.warm(*(search_range or (unknown[0], unknown[-1])))
+        with self.lock:
+            return {day: self.urls[day] for day in days if day in self.urls}
+
+    def url(self, day):
+        """OPeNDAP URL of the granule for one date, or None. A miss fills in its whole month."""
+        day = date.fromisoformat(str(day)[:10])
+        first = day.replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return self.lookup(day, day, (first.isoformat(), last.isoformat())).get(day.isoformat())
+
+    def __len__(self):
+        return len(self.urls)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fill the MERRA-2 granule catalog for a date range with one CMR search."
+    )
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", required=True)
+    parser.add_argument(
+        "--cache-dir",
+        help="live cache directory holding the catalog (default: live_nasa_processor's)",
+    )
+    args = parser.parse_args()
+
+    import live_nasa_processor as live
+
+    granule_catalog = live.granule_catalog
+    if args.cache_dir:
+        granule_catalog = GranuleCatalog(
+            os.path.join(args.cache_dir, CATALOG_NAME), live.search_granules
+        )
+    found = granule_catalog.warm(args.start, args.end)
+    print(
+        f"✅ {len(found)} granules found for {args.start} to {args.end}; "
+        f"the catalog at '{granule_catalog.path}' now has {len(granule_catalog)} dates"
+    )
+
+
+if __name__ == "__main__":
+    main()
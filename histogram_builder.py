@@ -0,0 +1,178 @@
+import argparse
+import glob
+import json
+
+import numpy as np
+import pandas as pd
+
+DAYS_IN_CLIMATOLOGY = 366
+# Resolution of the stored counts; any coarser binning is derived from them
+BASE_BIN_WIDTH = 0.1
+# Bins per day in the dashboard's graph_data_daily_histogram.json
+DEFAULT_BINS = 8
+# Fraction of a bin a value may fall short of an edge (float rounding) and still count above it
+BIN_EDGE_TOLERANCE = 1e-9
+
+
+class DoyHistogram:
+    """
+    Per-day-of-year counts of daily max temperatures at a fine base resolution,
+    stored as cumulative counts: cumulative[d, k] is the number of values for
+    day of year d+1 below base edge k. The count between any two base edges is
+    one subtraction, so rebinning a day into n bins costs O(n), not O(values).
+    """
+
+    def __init__(self, origin, bin_width, cumulative):
+        self.origin = float(origin)
+        self.bin_width = float(bin_width)
+        self.cumulative = cumulative
+        totals = cumulative[:, -1:]
+        # First and last occupied base bin of every day, for O(1) range lookups
+        self.first_bin = np.argmax(cumulative[:, 1:] > 0, axis=1)
+        self.last_bin = np.argmax(cumulative >= totals, axis=1)
+
+    @classmethod
+    def from_series(cls, day_of_year, values, window=7, bin_width=BASE_BIN_WIDTH):
+        """
+        Bins a daily series in one vectorized pass: every value is counted for
+        each day of year within +/- window days of its own (wrapping the year),
+        and a single bincount over (day of year, bin) fills the whole table.
+        """
+        values = np.asarray(values, dtype=float)
+        day_of_year = np.asarray(day_of_year, dtype=int)
+        valid = ~np.isnan(values)
+        values, day_of_year = values[valid], day_of_year[valid]
+        origin = np.floor(values.min() / bin_width) * bin_width if values.size else 0.0
+        # origin can round to just above the minimum (28.7 -> 28.700000000000003),
+        # and values on an edge to just below it: bin with a tolerance, never below 0
+        bins = np.floor((values - origin) / bin_width + BIN_EDGE_TOLERANCE).astype(int)
+        bins = np.maximum(bins, 0)
+        num_bins = int(bins.max()) + 1 if values.size else 1
+
+        offsets = np.arange(-window, window + 1)
+        rows = (day_of_year[None, :] - 1 + offsets[:, None]) % DAYS_IN_CLIMATOLOGY
+        flat = (rows * num_bins + bins[None, :]).ravel()
+        counts = np.bincount(flat, minlength=DAYS_IN_CLIMATOLOGY * num_bins)
+        counts = counts.reshape(DAYS_IN_CLIMATOLOGY, num_bins)
+
+        cumulative = np.zeros((DAYS_IN_CLIMATOLOGY, num_bins + 1), dtype=np.int64)
+        np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+        return cls(origin, bin_width, cumulative)
+
+    @classmethod
+    def from_payload(cls, payload, bin_width=BASE_BIN_WIDTH):
+        """
+        Counts from an already binned {doy: {"temps": [{temp, count}]}} payload
+        (a graph_data_daily_histogram.json), each bin's count placed at its
+        centre, so rebinning keeps every day's total.
+        """
+        rows, temps, counts = [], [], []
+        for key, day in payload.items():
+            for entry in day.get("temps", []):
+                rows.append(int(key) - 1)
+                temps.append(entry["temp"])
+                counts.append(entry["count"])
+        temps = np.asarray(temps, dtype=float)
+        origin = np.floor(temps.min() / bin_width) * bin_width if temps.size else 0.0
+        bins = np.rint((temps - origin) / bin_width).astype(int)
+        num_bins = int(bins.max()) + 1 if temps.size else 1
+
+        flat = np.asarray(rows, dtype=int) * num_bins + bins
+        table = np.bincount(flat, weights=counts, minlength=DAYS_IN_CLIMATOLOGY * num_bins)
+        table = table.astype(np.int64).reshape(DAYS_IN_CLIMATOLOGY, num_bins)
+        cumulative = np.zeros((DAYS_IN_CLIMATOLOGY, num_bins + 1), dtype=np.int64)
+        np.cumsum(table, axis=1, out=cumulative[:, 1:])
+        return cls(origin, bin_width, cumulative)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["origin"], data["bin_width"], data["cumulative"])
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            origin=self.origin,
+            bin_width=self.bin_width,
+            cumulative=self.cumulative,
+        )
+
+    def day(self, doy, bins=DEFAULT_BINS):
+        """One day's histogram in the dashboard's schema, `bins` equal bins over its range."""
+        row = doy - 1
+        first, last = int(self.first_bin[row]), int(self.last_bin[row])
+        if last <= first:
+            return {"dayOfYear": doy, "temps": []}
+        bins = min(bins, last - first)
+        edges = np.rint(np.linspace(first, last, bins + 1)).astype(int)
+        counts = np.diff(self.cumulative[row, edges])
+        centers = self.origin + self.bin_width * (edges[:-1] + edges[1:]) / 2
+        return {
+            "dayOfYear": doy,
+            "temps": [
+                {"temp": round(float(c), 1), "count": int(n)}
+                for c, n in zip(centers, counts)
+            ],
+        }
+
+    def payload(self, doys=None, bins=DEFAULT_BINS):
+        """{doy: day histogram} for the given days of year (all by default)."""
+        doys = doys or range(1, DAYS_IN_CLIMATOLOGY + 1)
+        return {str(doy): self.day(doy, bins) for doy in doys}
+
+
+def series_from_summary(path):
+    """Day of year and daily max temperature from a processed_data.json-style file."""
+    with open(path, "r") as f:
+        summary = json.load(f)["daily_summary"]
+    temps = [np.nan if t is None else t for t in summary["max_temp_celsius"]]
+    return pd.DatetimeIndex(summary["timestamps"]).dayofyear.values, np.array(temps)
+
+
+def series_from_archive(input_glob, lat, lon):
+    """Day of year and daily max temperature of one cell, straight from the granules."""
+    from nasa_climatology_builder import compute_daily_series, open_archive
+
+    nasa_files = sorted(glob.glob(input_glob))
+    if not nasa_files:
+        raise FileNotFoundError(f"No NASA data files match '{input_glob}'")
+    ds = open_archive(nasa_files).sel(lat=lat, lon=lon, method="nearest")
+    daily = compute_daily_series(ds)
+    return daily["time"].dt.dayofyear.values, daily["max_temp_celsius"].values
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the per-day-of-year temperature histograms for the dashboard."
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--input-glob", default="nasa_merra2_data/*.nc4")
+    source.add_argument("--summary", help="processed_data.json-style daily summary to bin instead")
+    parser.add_argument("--output", default="graph_data_daily_histogram.json")
+    parser.add_argument("--counts-output", default="graph_data_daily_histogram.npz")
+    parser.add_argument("--lat", type=float, default=17.6868)
+    parser.add_argument("--lon", type=float, default=83.2185)
+    parser.add_argument(
+        "--window", type=int, default=7, help="+/- days pooled around each day of year"
+    )
+    parser.add_argument("--bin-width", type=float, default=BASE_BIN_WIDTH)
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    args = parser.parse_args()
+
+    print("--- Building daily temperature histograms ---")
+    if args.summary:
+        day_of_year, temps = series_from_summary(args.summary)
+    else:
+        day_of_year, temps = series_from_archive(args.input_glob, args.lat, args.lon)
+
+    histogram = DoyHistogram.from_series(day_of_year, temps, args.window, args.bin_width)
+    histogram.save(args.counts_output)
+    print(f"✅ Saved cumulative counts to '{args.counts_output}'")
+
+    with open(args.output, "w") as f:
+        json.dump(histogram.payload(bins=args.bins), f, indent=4)
+    print(f"✅ Successfully created '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
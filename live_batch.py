@@ -0,0 +1,229 @@
+import asyncio
+import json
+import sys
+from datetime import date, datetime, timezone
+
+import aiohttp
+
+import live_nasa_processor as live
+from granule_cache import granule_key
+from live_window import WINDOW_CONCURRENCY, fetch_slab
+from merra2_grid import hyperslab, lat_index, lon_index, slab_label
+
+# Largest batch one request may send, in points and in distinct dates
+MAX_BATCH_POINTS = 1000
+MAX_BATCH_DATES = 31
+# Largest hyperslab, in grid cells, one date's points share; points spread
+# wider are fetched per TILE_CELLS x TILE_CELLS tile of the grid instead
+MAX_GROUP_SLAB_CELLS = 64 * 64
+TILE_CELLS = 32
+
+
+def parse_batch(payload):
+    """
+    Validates a batch body - a list of {lat, lon, date} points, bare or under
+    "points" - into (lat, lon, date) tuples; raises ValueError with a
+    client-facing message.
+    """
+    points = payload.get("points") if isinstance(payload, dict) else payload
+    if not isinstance(points, list) or not points:
+        raise ValueError("Body must be a non-empty list of {lat, lon, date} points")
+    if len(points) > MAX_BATCH_POINTS:
+        raise ValueError(f"Batches are limited to {MAX_BATCH_POINTS} points")
+
+    items = []
+    for k, point in enumerate(points):
+        try:
+            lat, lon = float(point["lat"]), float(point["lon"])
+            day = date.fromisoformat(str(point["date"])).isoformat()
+        except (TypeError, KeyError, ValueError):
+            raise ValueError(f"Point {k} needs numeric lat/lon and a YYYY-MM-DD date")
+        if not -90 <= lat <= 90:
+            raise ValueError(f"Point {k} has a latitude outside -90..90")
+        items.append((lat, lon, day))
+    if len({day for _, _, day in items}) > MAX_BATCH_DATES:
+        raise ValueError(f"Batches are limited to {MAX_BATCH_DATES} distinct dates")
+    return items
+
+
+def group_by_granule(items):
+    """{date: [positions in items]}; every point on a date reads the same daily granule."""
+    groups = {}
+    for position, (_, _, day) in enumerate(items):
+        groups.setdefault(day, []).append(position)
+    return groups
+
+
+def bounding_slab(slabs):
+    return (
+        min(s[0] for s in slabs),
+        max(s[1] for s in slabs),
+        min(s[2] for s in slabs),
+        max(s[3] for s in slabs),
+    )
+
+
+def slab_cells(slab):
+    lat0, lat1, lon0, lon1 = slab
+    return (lat1 - lat0 + 1) * (lon1 - lon0 + 1)
+
+
+def group_slabs(points):
+    """
+    [(slab, [indices into points])]: the smallest hyperslab holding every
+    point's cells (and halo), so one request serves all - unless the points
+    are so far apart that it would cover more than MAX_GROUP_SLAB_CELLS; then
+    one hyperslab per tile of the grid that has points.
+    """
+    slabs = [hyperslab(lat, lon, live.SUBSET_HALO) for lat, lon in points]
+    whole = bounding_slab(slabs)
+    if slab_cells(whole) <= MAX_GROUP_SLAB_CELLS:
+        return [(whole, list(range(len(points))))]
+    tiles = {}
+    for k, (lat, lon) in enumerate(points):
+        tile = (lat_index(lat) // TILE_CELLS, lon_index(lon) // TILE_CELLS)
+        tiles.setdefault(tile, []).append(k)
+    return [(bounding_slab([slabs[k] for k in members]), members) for members in tiles.values()]
+
+
+def group_cache_keys(day, slab):
+    granule_id = live.merra2_granule_id(day)
+    return (
+        granule_key(granule_id, live.REQUIRED_VARS, slab_label(slab)),
+        granule_key(granule_id, live.REQUIRED_VARS),
+    )
+
+
+def search_batch_granules(days):
+    """
+    {date: OPeNDAP URL} for just these dates (a batch's dates can be far
+    apart, so not the days between them), from the catalog; a date it does
+    not know costs one CMR search for its month.
+    """
+    if live.OPENDAP_URL_TEMPLATE:
+        return {day: live.templated_opendap_url(day) for day in days}
+    urls = {}
+    for day in days:
+        url = live.granule_catalog.url(day)
+        if url is not None:
+            urls[day] = url
+    return urls
+
+
+def point_result(lat, lon, day, metrics):
+    """One point's result, in the same shape as process_live_data()."""
+    return {
+        "location": f"Live Data for {lat}, {lon}",
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "daily_summary": {
+            "timestamps": [day],
+            **{name: [value] for name, value in metrics.items()},
+        },
+    }
+
+
+async def analyze_batch(items, on_result, progress=None):
+    """
+    Live analysis of many (lat, lon, date) points. Points are grouped by date,
+    since each date is one global granule, and far-apart points of a date by
+    region: every group is fetched once (one hyperslab covering all its
+    points), opened once and scored in one vectorized pass. on_result(position,
+    result) is called for every point as soon as its group is done, cached
+    groups first.
+    """
+
+    def report(message):
+        print(message, file=sys.stderr)
+        if progress is not None:
+            progress(message)
+
+    dates = group_by_granule(items)
+    # (date, slab) -> positions in items
+    groups = {}
+    for day, positions in dates.items():
+        for slab, members in group_slabs([items[p][:2] for p in positions]):
+            groups[day, slab] = [positions[k] for k in members]
+    report(f"--- Live NASA Batch Analysis Started: {len(items)} points, {len(dates)} dates ---")
+
+    def finish_group(group, ds=None, error=None):
+        day, _ = group
+        positions = groups[group]
+        if ds is not None:
+            try:
+                metrics = live.summarize_cells(
+                    ds, [items[p][0] for p in positions], [items[p][1] for p in positions]
+                )
+            finally:
+                live.dataset_pool.release(ds)
+        for k, position in enumerate(positions):
+            lat, lon, _ = items[position]
+            on_result(
+                position,
+                {"error": error} if ds is None else point_result(lat, lon, day, metrics[k]),
+            )
+
+    missing = []
+    for group in sorted(groups):
+        subset_key, full_key = group_cache_keys(*group)
+        ds = live.open_cached(full_key)
+        if ds is None:
+            ds = live.open_cached(subset_key)
+        if ds is None:
+            missing.append(group)
+        else:
+            finish_group(group, ds)
+    report(f"1. {len(groups) - len(missing)} of {len(groups)} granule subsets in local cache.")
+
+    if missing:
+        missing_dates = sorted({day for day, _ in missing})
+        report(f"2. Searching for {len(missing_dates)} MERRA-2 granules...")
+        urls = await asyncio.to_thread(search_batch_granules, missing_dates)
+        report(f"3. Downloading {len(missing)} granule subsets from NASA server...")
+        limit = asyncio.Semaphore(WINDOW_CONCURRENCY)
+        timeout = aiohttp.ClientTimeout(total=120)
+        # trust_env picks up proxy settings and ~/.netrc Earthdata credentials
+        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+
+            async def run(group):
+                day, slab = group
+                if day not in urls:
+                    return group, None, "No live data found for this date."
+                async with limit:
+                    try:
+                        path = await fetch_slab(
+                            session, urls[day], slab, *group_cache_keys(day, slab)
+                        )
+                        return group, path, None
+                    except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as e:
+                        print(f"Batch date {day} failed: {e}", file=sys.stderr)
+                        return group, None, "Download failed for this date."
+
+            tasks = [asyncio.ensure_future(run(group)) for group in missing]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    group, path, error = await next_done
+                    finish_group(group, None if path is None else live.open_granule(path), error)
+                    report(f"4. Scored {len(groups[group])} points for {group[0]}")
+            finally:
+                # Leaving early (a failed callback, a cancelled job): drop the other downloads
+                for task in tasks:
+                    task.cancel()
+
+    report("--- Live NASA Batch Analysis Finished ---")
+
+
+def process_live_batch(items, on_result, progress=None):
+    """Synchronous entry point (pool workers, CLI)."""
+    asyncio.run(analyze_batch(items, on_result, progress))
+
+
+if __name__ == "__main__":
+    # Reads a batch body on stdin and writes one JSON line per point to stdout
+    batch = parse_batch(json.load(sys.stdin))
+
+    def write_line(position, result):
+        lat, lon, day = batch[position]
+        print(json.dumps({"index": position, "lat": lat, "lon": lon, "date": day, **result}))
+        sys.stdout.flush()
+
+    process_live_batch(batch, write_line)
@@ -0,0 +1,200 @@
+import asyncio
+import contextlib
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+import aiohttp
+
+import live_nasa_processor as live
+import metrics
+from merra2_grid import opendap_constraint
+
+# Longest window one request may ask for
+MAX_WINDOW_DAYS = 31
+# Granule downloads in flight at once for one window
+WINDOW_CONCURRENCY = 4
+# Bytes read from a download at a time
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def window_dates(start_date, end_date):
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError("end must not be before start")
+    if (end - start).days + 1 > MAX_WINDOW_DAYS:
+        raise ValueError(f"Windows are limited to {MAX_WINDOW_DAYS} days")
+    return [(start + timedelta(days=k)).isoformat() for k in range((end - start).days + 1)]
+
+
+def search_window_granules(start_date, end_date):
+    """{date: OPeNDAP URL} for the window, from the catalog; at most one CMR search."""
+    if live.OPENDAP_URL_TEMPLATE:
+        first, last = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        days = [first + timedelta(days=k) for k in range((last - first).days + 1)]
+        return {day.isoformat(): live.templated_opendap_url(day) for day in days}
+    return live.granule_catalog.lookup(start_date, end_date)
+
+
+async def _download(session, url, cache_key):
+    # Streamed to a temp file in the cache, so a full granule (~57 MB) is never
+    # held in memory; file writes and the cache's rename + index lock are
+    # blocking, so they run off the loop
+    cache = live.granule_cache
+    fd, part_path = cache.new_part()
+    try:
+        with os.fdopen(fd, "wb") as f, metrics.stage("download"):
+            async with session.get(url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                    await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(part_path)
+        raise
+    metrics.record("live_download_bytes_total", os.path.getsize(part_path))
+    return await asyncio.to_thread(cache.store_file, cache_key, part_path)
+
+
+def _check_granule(path):
+    # Opened in the pool (and left there for the caller's open_granule), so a
+    # response that is not NetCDF fails here, while the fallback is still possible
+    live.dataset_pool.release(live.open_granule(path))
+    return path
+
+
+async def fetch_slab(session, opendap_url, slab, subset_key, full_key):
+    """
+    Downloads one hyperslab of a granule, falling back to the full granule,
+    and returns the cached file's path; open it with live.open_granule.
+    """
+    subset_url = f"{opendap_url}.nc?{opendap_constraint(live.REQUIRED_VARS, slab)}"
+    try:
+        path = await _download(session, subset_url, subset_key)
+        return await asyncio.to_thread(_check_granule, path)
+    except aiohttp.ClientResponseError as e:
+        if e.status not in live.CONSTRAINT_REJECTED:
+            raise
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        # Connection errors and timeouts are OSErrors too, but no reason to fall back
+        raise
+    except (OSError, ValueError):
+        # Server answered, but not with NetCDF for the constrained request
+        live.granule_cache.discard(subset_key)
+
+    full_url = f"{opendap_url}.nc?{','.join(live.REQUIRED_VARS)}"
+    path = await _download(session, full_url, full_key)
+    return await asyncio.to_thread(_check_granule, path)
+
+
+async def fetch_day(session, opendap_url, day, lat, lon):
+    """Downloads the slab around the point for one day."""
+    slab, subset_key, full_key = live.day_cache_keys(day, lat, lon)
+    return await fetch_slab(session, opendap_url, slab, subset_key, full_key)
+
+
+async def analyze_window(lat, lon, start_date, end_date, on_day=None, progress=None):
+    """
+    Live analysis of every day in [start_date, end_date] for one point.
+    Cached days are answered from disk; the rest are downloaded concurrently
+    and each day's metrics are passed to on_day(day_result) as soon as they are
+    ready, in completion order. Returns the window's full daily summary.
+    """
+
+    def report(message):
+        print(message, file=sys.stderr)
+        if progress is not None:
+            progress(message)
+
+    days = window_dates(start_date, end_date)
+    report(f"--- Live NASA Window Analysis Started: {days[0]} to {days[-1]} ---")
+    results = {}
+
+    def finish_day(day, ds=None, error=None):
+        if ds is not None:
+            try:
+                summary = live.summarize_cell(ds, lat, lon)
+            finally:
+                live.dataset_pool.release(ds)
+        else:
+            summary = {"error": error}
+        results[day] = summary
+        if on_day is not None:
+            on_day({"date": day, **summary})
+
+    missing = []
+    for day in days:
+        ds = live.open_cached_day(day, lat, lon)
+        if ds is None:
+            missing.append(day)
+        else:
+            finish_day(day, ds)
+    report(f"1. {len(days) - len(missing)} of {len(days)} days found in local cache.")
+
+    if missing:
+        report(f"2. Searching for {len(missing)} MERRA-2 granules...")
+        urls = await asyncio.to_thread(search_window_granules, missing[0], missing[-1])
+        report(f"3. Downloading {len(missing)} days from NASA server...")
+        limit = asyncio.Semaphore(WINDOW_CONCURRENCY)
+        timeout = aiohttp.ClientTimeout(total=120)
+        # trust_env picks up proxy settings and ~/.netrc Earthdata credentials
+        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+
+            async def run(day):
+                if day not in urls:
+                    return day, None, "No live data found for this date."
+                async with limit:
+                    try:
+                        return day, await fetch_day(session, urls[day], day, lat, lon), None
+                    except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as e:
+                        print(f"Window day {day} failed: {e}", file=sys.stderr)
+                        return day, None, "Download failed for this date."
+
+            tasks = [asyncio.ensure_future(run(day)) for day in missing]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    day, path, error = await next_done
+                    # Acquired only here, so a cancelled download holds no dataset
+                    finish_day(day, None if path is None else live.open_granule(path), error)
+                    report(f"4. Processed {day} ({len(results)}/{len(days)})")
+            finally:
+                # Leaving early (a failed callback, a cancelled job): drop the other downloads
+                for task in tasks:
+                    task.cancel()
+
+    report("--- Live NASA Window Analysis Finished ---")
+    columns = [
+        "max_temp_celsius",
+        "dewpoint_celsius",
+        "min_relative_humidity_percent",
+        "max_wind_speed_ms",
+        "todi_score",
+        "todi_mean",
+        "todi_p95",
+    ]
+    return {
+        "location": f"Live Data for {lat}, {lon}",
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "daily_summary": {
+            "timestamps": days,
+            **{name: [results[day].get(name) for day in days] for name in columns},
+        },
+        "errors": {day: results[day]["error"] for day in days if "error" in results[day]},
+    }
+
+
+def process_live_window(lat, lon, start_date, end_date, on_day=None, progress=None):
+    """Synchronous entry point (pool workers, CLI)."""
+    return asyncio.run(analyze_window(lat, lon, start_date, end_date, on_day, progress))
+
+
+if __name__ == "__main__":
+    print(
+        json.dumps(
+            process_live_window(
+                float(sys.argv[1]), float(sys.argv[2]), sys.argv[3], sys.argv[4]
+            )
+        )
+    )
@@ -0,0 +1,80 @@
+import math
+
+# MERRA-2 native grid: 361 latitudes x 576 longitudes
+LAT_STEP = 0.5
+LON_STEP = 0.625
+LAT_ORIGIN = -90.0
+LON_ORIGIN = -180.0
+N_LAT = 361
+N_LON = 576
+
+
+def lat_index(lat):
+    """Row of the MERRA-2 cell containing lat (cell centers are on the grid points)."""
+    index = math.floor((float(lat) - LAT_ORIGIN) / LAT_STEP + 0.5)
+    return min(max(index, 0), N_LAT - 1)
+
+
+def lon_index(lon):
+    """Column of the MERRA-2 cell containing lon, wrapping around the dateline."""
+    return math.floor((float(lon) - LON_ORIGIN) / LON_STEP + 0.5) % N_LON
+
+
+def snap(lat, lon):
+    """Center of the MERRA-2 cell containing (lat, lon)."""
+    return (
+        LAT_ORIGIN + lat_index(lat) * LAT_STEP,
+        LON_ORIGIN + lon_index(lon) * LON_STEP,
+    )
+
+
+def cell_key(lat, lon):
+    """Canonical 'lat_lon' string for a point: 17.7 and 17.70 give the same key."""
+    cell_lat, cell_lon = snap(lat, lon)
+    return f"{cell_lat:g}_{cell_lon:g}"
+
+
+def hyperslab(lat, lon, halo=1):
+    """
+    Inclusive (lat_start, lat_stop, lon_start, lon_stop) grid indices of the cell
+    containing (lat, lon) plus `halo` cells on every side, clipped to the grid.
+    Near the dateline the halo is cut rather than wrapped, so the slab stays contiguous.
+    """
+    i, j = lat_index(lat), lon_index(lon)
+    return (
+        max(i - halo, 0),
+        min(i + halo, N_LAT - 1),
+        max(j - halo, 0),
+        min(j + halo, N_LON - 1),
+    )
+
+
+def opendap_constraint(variables, slab, hours=24):
+    """DAP2 constraint expression selecting `slab` for every variable and coordinate."""
+    lat0, lat1, lon0, lon1 = slab
+    time_range = f"[0:{hours - 1}]"
+    space = f"[{lat0}:{lat1}][{lon0}:{lon1}]"
+    parts = [f"{name}{time_range}{space}" for name in variables]
+    parts += [f"time{time_range}", f"lat[{lat0}:{lat1}]", f"lon[{lon0}:{lon1}]"]
+    return ",".join(parts)
+
+
+def slab_label(slab):
+    lat0, lat1, lon0, lon1 = slab
+    return f"lat{lat0}-{lat1}_lon{lon0}-{lon1}"
+
+
+def stream_number(year):
+    """MERRA-2 production stream of a year, as it appears in granule file names."""
+    if year < 1992:
+        return 100
+    if year < 2001:
+        return 200
+    if year < 2011:
+        return 300
+    return 400
+
+
+def granule_filename(day):
+    """File name of the M2T1NXSLV granule for a date, e.g. MERRA2_400.tavg1_2d_slv_Nx.20230601.nc4."""
+    return f"MERRA2_{stream_number(day.year)}.tavg1_2d_slv_Nx.{day:%Y%m%d}.nc4"
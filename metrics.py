@@ -0,0 +1,212 @@
+import contextlib
+import math
+import threading
+import time
+
+# Seconds: from a cached decode (milliseconds) to a slow CMR search or download
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing total per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def record(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def lines(self):
+        with self.lock:
+            values = dict(self.values)
+        return [
+            f"{self.name}{_label_text(self.labels, key)} {_number(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [per-bucket counts, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def record(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            entry = self.values.setdefault(key, [[0] * len(self.buckets), 0.0])
+            for k, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][k] += 1
+                    break
+            entry[1] += value
+
+    def lines(self):
+        with self.lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+        out = []
+        for key, (counts, total) in sorted(values.items()):
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                le = f'le="{_number(bound)}"'
+                out.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {running}")
+            out.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(total)}")
+            out.append(f"{self.name}_count{_label_text(self.labels, key)} {running}")
+        return out
+
+
+class Gauge:
+    """
+    A value read when the metrics are scraped: callback() returns a number or
+    {label values: number}. kind="counter" for totals kept elsewhere.
+    """
+
+    def __init__(self, name, help_text, callback, labels=(), kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def lines(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f"{self.name}{_label_text(self.labels, key)} {_number(value)}"
+            for key, value in sorted(values.items())
+            if value is not None
+        ]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, callback, labels=(), kind="gauge"):
+        return self.add(Gauge(name, help_text, callback, labels, kind))
+
+    def render(self):
+        out = []
+        for metric in self.metrics.values():
+            try:
+                lines = metric.lines()
+            except Exception:
+                continue  # a gauge whose source is unavailable is left out
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.histogram(
+    "live_stage_seconds",
+    "Time spent in each live pipeline stage "
+    "(cmr_search, download, open_dataset, extract, todi_score, reduce).",
+    labels=("stage",),
+)
+REGISTRY.counter("live_download_bytes_total", "Bytes downloaded from the OPeNDAP server.")
+REGISTRY.counter(
+    "live_granule_cache_lookups_total",
+    "Lookups of downloaded granule data in the on-disk cache.",
+    labels=("result",),
+)
+REGISTRY.counter(
+    "live_granule_catalog_lookups_total",
+    "Dates looked up in the granule catalog: hit, miss (searched in CMR) or "
+    "recent_miss (no granule on the last search, not searched again yet).",
+    labels=("result",),
+)
+REGISTRY.counter(
+    "live_dataset_pool_lookups_total",
+    "Cached granule files requested from the open-dataset pool: hit (already open) or miss.",
+    labels=("result",),
+)
+REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time until the response is ready to send (its first chunk, for streams).",
+    labels=("method", "route", "status"),
+)
+
+# Where record() sends samples: None records them in REGISTRY, in this process
+_sink = None
+
+
+def record(name, value=1, **labels):
+    """Records a sample of the REGISTRY metric `name` (a counter increment or an observation)."""
+    if _sink is not None:
+        _sink((name, value, labels))
+    else:
+        apply((name, value, labels))
+
+
+def apply(sample):
+    name, value, labels = sample
+    REGISTRY.metrics[name].record(value, **labels)
+
+
+@contextlib.contextmanager
+def forwarding(sink):
+    """
+    Sends record()ed samples to sink(sample) instead, e.g. from a pool worker
+    to the web process, which apply()s them to its own REGISTRY.
+    """
+    global _sink
+    previous, _sink = _sink, sink
+    try:
+        yield
+    finally:
+        _sink = previous
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Times the block as one observation of live_stage_seconds{stage=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record("live_stage_seconds", time.perf_counter() - start, stage=name)
@@ -7,35 +7,29 @@ print("--- Generating FINAL SENSITIVE mock full-year DAILY SUMMARY data ---")
 
 # Generate a date range for the entire year 2023
 dates = pd.date_range(start="2023-01-01", end="2023-12-31", freq="D")
+n_days = len(dates)
 
-daily_summary = {
-    "timestamps": [],
-    "max_temp_celsius": [],
-    "max_wind_speed_ms": [],
-    "todi_score": [],
-}
-
-for date in dates:
-    day_of_year = date.dayofyear
-    seasonal_factor = -np.cos((day_of_year / 365.0) * 2 * np.pi)
+seasonal_factor = -np.cos((dates.dayofyear.values / 365.0) * 2 * np.pi)
 
-    # UPDATED: Generate a wider, more sensitive range of data
-    # Temp range is now wider (e.g., from ~11°C to ~45°C) to trigger "Very Cold" in winter
-    temp = 28 + (seasonal_factor * 17) + np.random.uniform(-4, 4)
-    wind = np.random.uniform(
-        2, 18
-    )  # Wider wind speed range to trigger "Very Windy" more often
+# UPDATED: Generate a wider, more sensitive range of data
+# Temp range is now wider (e.g., from ~11°C to ~45°C) to trigger "Very Cold" in winter
+temps = 28 + (seasonal_factor * 17) + np.random.uniform(-4, 4, n_days)
+winds = np.random.uniform(
+    2, 18, n_days
+)  # Wider wind speed range to trigger "Very Windy" more often
 
-    # Use a mock humidity that varies slightly with season
-    humidity = 60 - (seasonal_factor * 20) + np.random.uniform(-10, 10)
+# Use a mock humidity that varies slightly with season
+humidity = 60 - (seasonal_factor * 20) + np.random.uniform(-10, 10, n_days)
 
-    # Calculate a real TODI score using your engine!
-    todi = todi_engine.calculate_todi_score(temp, humidity, wind)
+# Calculate real TODI scores for the whole year in one call using your engine!
+todi_scores = todi_engine.calculate_todi_score_array(temps, humidity, winds)
 
-    daily_summary["timestamps"].append(date.isoformat())
-    daily_summary["max_temp_celsius"].append(temp)
-    daily_summary["max_wind_speed_ms"].append(wind)
-    daily_summary["todi_score"].append(todi)
+daily_summary = {
+    "timestamps": [date.isoformat() for date in dates],
+    "max_temp_celsius": temps.tolist(),
+    "max_wind_speed_ms": winds.tolist(),
+    "todi_score": todi_engine.todi_scores_to_list(todi_scores),
+}
 
 processed_data = {"location": "Global Test Location", "daily_summary": daily_summary}
 
@@ -0,0 +1,209 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from merra2_grid import (
+    LAT_ORIGIN,
+    LAT_STEP,
+    LON_ORIGIN,
+    LON_STEP,
+    N_LAT,
+    N_LON,
+    granule_filename,
+    lat_index,
+    lon_index,
+)
+
+# Whole MERRA-2 grid: (first lat row, first lon column), rows, columns
+GLOBAL_REGION = ((0, 0), N_LAT, N_LON)
+# Synoptic waves: (period in days, amplitude in K, wavelength in degrees lon, lat)
+WEATHER_WAVES = [(4.5, 2.5, 40, 60), (9, 3.0, 70, 90), (23, 2.0, 120, 150), (61, 1.5, 360, 180)]
+VARIABLE_ATTRS = {
+    "T2M": {"long_name": "2-meter_air_temperature", "units": "K"},
+    "T2MDEW": {"long_name": "dew_point_temperature_at_2_m", "units": "K"},
+    "U10M": {"long_name": "10-meter_eastward_wind", "units": "m s-1"},
+    "V10M": {"long_name": "10-meter_northward_wind", "units": "m s-1"},
+    "PRECTOT": {"long_name": "total_precipitation", "units": "kg m-2 s-1"},
+}
+ENCODING = {"dtype": "float32", "zlib": True, "complevel": 1, "shuffle": True}
+
+
+def region_from_bbox(west, south, east, north):
+    """The block of MERRA-2 cells covering a bounding box, as (first_cell, rows, columns)."""
+    i0, i1 = lat_index(south), lat_index(north)
+    j0, j1 = lon_index(west), lon_index(east)
+    if i1 < i0 or j1 < j0:
+        raise ValueError("Bounding box must be west,south,east,north and not cross the dateline")
+    return (i0, j0), i1 - i0 + 1, j1 - j0 + 1
+
+
+def synthetic_day(day, region=GLOBAL_REGION, seed=0, precipitation=False):
+    """
+    One day of hourly M2T1NXSLV-like data (T2M, T2MDEW, U10M, V10M, optionally
+    PRECTOT) on a block of the MERRA-2 grid, computed as whole arrays.
+    Temperature follows latitude, the hemisphere's season and the local solar
+    day; eastward-travelling waves add multi-day weather that is continuous
+    across days and cells. Each day depends only on its date and the seed, so
+    any date can be generated on its own and always comes out the same.
+    """
+    (row, column), lat_cells, lon_cells = region
+    day = pd.Timestamp(day)
+    times = pd.date_range(day + pd.Timedelta(minutes=30), periods=24, freq="h")
+    lats = LAT_ORIGIN + LAT_STEP * (row + np.arange(lat_cells))
+    lons = LON_ORIGIN + LON_STEP * (column + np.arange(lon_cells))
+    rng = np.random.default_rng([seed, day.year, day.dayofyear])
+    shape = (24, lat_cells, lon_cells)
+
+    lat = lats[None, :, None]
+    lon = lons[None, None, :]
+    abs_lat = np.abs(lat)
+    sin_lat = np.sin(np.deg2rad(lat))
+    # Fractional days since 1980, so waves run on continuously between files
+    t = (times.values - np.datetime64("1980-01-01")) / np.timedelta64(1, "D")
+    t = t[:, None, None]
+
+    season = np.cos(2 * np.pi * (day.dayofyear - 196) / 365.25) * np.sign(sin_lat)
+    local_hour = (times.hour.values[:, None, None] + 0.5 + lon / 15) % 24
+    daily_cycle = np.cos(2 * np.pi * (local_hour - 14) / 24)
+
+    # Travelling waves with a seeded phase per wave: smooth in space and time
+    phases = np.random.default_rng(seed).uniform(0, 2 * np.pi, len(WEATHER_WAVES))
+    weather = np.zeros(shape)
+    # Same waves a quarter period on, which drives the meridional wind
+    weather_quarter = np.zeros(shape)
+    for (period, amplitude, wave_lon, wave_lat), phase in zip(WEATHER_WAVES, phases):
+        angle = 2 * np.pi * (lon / wave_lon + lat / wave_lat - t / period) + phase
+        weather += amplitude * np.sin(angle)
+        weather_quarter += amplitude * np.cos(angle)
+
+    t2m = (
+        301.0
+        - 48 * sin_lat**2
+        + (2 + 16 * np.abs(sin_lat)) * season
+        + 4 * daily_cycle
+        + weather
+        + rng.normal(0, 0.5, shape)
+    )
+    # Driest (largest dew point depression) in the subtropics and in the afternoon
+    dryness = 0.4 + 0.6 * np.exp(-(((abs_lat - 25) / 10) ** 2))
+    depression = dryness * (3 + 5 * (1 + daily_cycle) / 2) + rng.gamma(2.0, 0.6, shape)
+    dew = t2m - depression
+
+    # Trade easterlies and mid-latitude westerlies, gustier in the afternoon
+    zonal = 8 * np.exp(-(((abs_lat - 45) / 12) ** 2)) - 6 * np.exp(-(((abs_lat - 15) / 10) ** 2))
+    gust = 1 + 0.2 * daily_cycle
+    u10m = gust * (zonal + 0.6 * weather) + rng.normal(0, 1.5, shape)
+    v10m = gust * 0.6 * weather_quarter + rng.normal(0, 1.5, shape)
+
+    dims = ("time", "lat", "lon")
+    variables = {"T2M": t2m, "T2MDEW": dew, "U10M": u10m, "V10M": v10m}
+    if precipitation:
+        # Rain in humid hours, more often when the weather wave is low
+        chance = 0.08 * (1 - dryness) + 0.05 * (weather < -2)
+        raining = rng.random(shape) < chance
+        variables["PRECTOT"] = raining * rng.gamma(0.8, 1.5, shape) / 3600
+    ds = xr.Dataset(
+        {
+            name: (dims, values.astype("float32"), VARIABLE_ATTRS[name])
+            for name, values in variables.items()
+        },
+        coords={
+            "time": times,
+            "lat": ("lat", lats, {"units": "degrees_north"}),
+            "lon": ("lon", lons, {"units": "degrees_east"}),
+        },
+    )
+    ds.attrs = {
+        "ShortName": "M2T1NXSLV",
+        "Title": "Synthetic MERRA-2 tavg1_2d_slv_Nx (mock_merra2_generator.py)",
+        "RangeBeginningDate": f"{day:%Y-%m-%d}",
+        "seed": seed,
+    }
+    return ds
+
+
+def granule_encoding(ds):
+    """Compressed float32 variables; time in minutes since the first half hour, as in the real granules."""
+    first = pd.Timestamp(ds["time"].values[0])
+    encoding = {name: dict(ENCODING) for name in ds.data_vars}
+    encoding["time"] = {"units": f"minutes since {first:%Y-%m-%d %H:%M:%S}", "dtype": "int32"}
+    return encoding
+
+
+def granule_bytes(day, region=GLOBAL_REGION, seed=0, variables=None, precipitation=False):
+    """One synthetic granule as NetCDF bytes, optionally reduced to some variables."""
+    ds = synthetic_day(day, region, seed, precipitation)
+    if variables:
+        ds = ds[variables]
+    return bytes(ds.to_netcdf(encoding=granule_encoding(ds)))
+
+
+def write_granule(output_dir, day, region=GLOBAL_REGION, seed=0, precipitation=False):
+    """
+    Writes one day under its MERRA-2 file name (temp file + rename) and returns
+    the path. Days already present are left alone, so a run can be resumed.
+    """
+    path = os.path.join(output_dir, granule_filename(pd.Timestamp(day)))
+    if os.path.exists(path):
+        return path
+    ds = synthetic_day(day, region, seed, precipitation)
+    tmp_path = f"{path}.part"
+    ds.to_netcdf(tmp_path, format="NETCDF4", encoding=granule_encoding(ds))
+    os.replace(tmp_path, path)
+    return path
+
+
+def generate_archive(output_dir, start, end, region=GLOBAL_REGION, seed=0,
+                     precipitation=False, workers=1):
+    """Writes a granule per day from start to end (inclusive); returns the paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    days = pd.date_range(start, end, freq="D")
+    args = [(output_dir, day, region, seed, precipitation) for day in days]
+    if workers <= 1:
+        return [write_granule(*a) for a in args]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(write_granule, *zip(*args)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic MERRA-2 (M2T1NXSLV) hourly archive for offline runs."
+    )
+    parser.add_argument("--start", default="2023-01-01")
+    parser.add_argument("--end", default="2023-12-31")
+    # West, South, East, North; the whole globe when omitted
+    parser.add_argument("--bbox", type=float, nargs=4)
+    parser.add_argument("--output-dir", default="nasa_merra2_data")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--precipitation",
+        action="store_true",
+        help="also write PRECTOT, for the climatology's rain probability",
+    )
+    args = parser.parse_args()
+
+    region = region_from_bbox(*args.bbox) if args.bbox else GLOBAL_REGION
+    (row, column), lat_cells, lon_cells = region
+    print(
+        f"--- Generating synthetic MERRA-2 granules {args.start} to {args.end}: "
+        f"{lat_cells}x{lon_cells} cells from row {row}, column {column} ---"
+    )
+    start = time.perf_counter()
+    paths = generate_archive(
+        args.output_dir, args.start, args.end, region, args.seed, args.precipitation, args.workers
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ Wrote {len(paths)} granules to '{args.output_dir}' "
+        f"in {elapsed:.1f}s ({len(paths) / elapsed:.1f} files/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
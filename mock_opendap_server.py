@@ -0,0 +1,191 @@
+import argparse
+import functools
+import glob
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import pandas as pd
+import xarray as xr
+
+from mock_merra2_generator import granule_encoding, synthetic_day
+
+# Date part of a MERRA-2 granule name: MERRA2_400.tavg1_2d_slv_Nx.20230601.nc4
+GRANULE_DATE = re.compile(r"\.(\d{8})\.nc4")
+# One projection of a DAP2 constraint: NAME[start:stop][start:stride:stop]...
+PROJECTION = re.compile(r"^(\w+)((?:\[[\d:]+\])*)$")
+# Path layout of the GES DISC server, for LIVE_OPENDAP_URL_TEMPLATE
+URL_LAYOUT = "/opendap/MERRA2/M2T1NXSLV.5.12.4/{year}/{month}/{granule}"
+
+
+class ConstraintError(ValueError):
+    """A constraint expression the server cannot answer (sent back as 400)."""
+
+
+def parse_constraint(constraint):
+    """
+    {variable: [slice per dimension]} from a DAP2 projection list such as
+    'T2M[0:23][214:216][420:422],lat[214:216]'. Index ranges are inclusive,
+    as in DAP2; a variable without brackets selects all of it.
+    """
+    projections = {}
+    for part in filter(None, unquote(constraint).split(",")):
+        match = PROJECTION.match(part.strip())
+        if match is None:
+            raise ConstraintError(f"Malformed projection '{part}'")
+        ranges = []
+        for text in re.findall(r"\[([\d:]+)\]", match.group(2)):
+            bounds = [int(b) for b in text.split(":")]
+            if len(bounds) > 3:
+                raise ConstraintError(f"Malformed index range '[{text}]'")
+            start, stride, stop = (
+                bounds if len(bounds) == 3 else (bounds[0], 1, bounds[-1])
+            )
+            if stop < start or stride < 1:
+                raise ConstraintError(f"Empty index range '[{text}]'")
+            ranges.append(slice(start, stop + 1, stride))
+        projections[match.group(1)] = ranges
+    return projections
+
+
+class MockOpendapServer:
+    """
+    A local stand-in for the GES DISC OPeNDAP server. It answers
+    '<granule>.nc?<constraint>' requests with NetCDF, cut to the requested
+    variables and index ranges. Granules come from a directory of files
+    (as written by mock_merra2_generator.py or downloaded), or are generated
+    on the fly for any date. With reject_subsets, index-constrained requests
+    get a 400, like servers that refuse them, to exercise the live path's
+    full-granule fallback.
+    """
+
+    def __init__(self, data_dir=None, seed=0, reject_subsets=False, cached_days=4):
+        self.data_dir = data_dir
+        self.seed = seed
+        self.reject_subsets = reject_subsets
+        self.files = {}
+        if data_dir:
+            for path in glob.glob(os.path.join(data_dir, "*.nc4")):
+                match = GRANULE_DATE.search(os.path.basename(path))
+                if match:
+                    self.files[match.group(1)] = path
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes": 0, "rejected": 0}
+        # Opened or generated granules, most recently used kept
+        self.granule = functools.lru_cache(maxsize=cached_days)(self._open_granule)
+
+    def _open_granule(self, yyyymmdd):
+        if self.data_dir:
+            if yyyymmdd not in self.files:
+                raise FileNotFoundError(f"No granule for {yyyymmdd} in {self.data_dir}")
+            return xr.open_dataset(self.files[yyyymmdd]).load()
+        return synthetic_day(pd.Timestamp(yyyymmdd), seed=self.seed)
+
+    def respond(self, path, query):
+        """(status, body) for one request path and query string."""
+        match = GRANULE_DATE.search(path)
+        if match is None:
+            return 404, b"Not a MERRA-2 granule path"
+        try:
+            ds = self.granule(match.group(1))
+        except FileNotFoundError as e:
+            return 404, str(e).encode()
+
+        try:
+            projections = parse_constraint(query)
+            subset = self.subset(ds, projections)
+        except ConstraintError as e:
+            with self.lock:
+                self.stats["rejected"] += 1
+            return 400, str(e).encode()
+        return 200, bytes(subset.to_netcdf(encoding=granule_encoding(subset)))
+
+    def subset(self, ds, projections):
+        """
+        The requested data variables, cut to the index ranges given for them.
+        Like the granules themselves, all variables share one (time, lat, lon)
+        grid, so the first data variable's ranges apply to the whole response;
+        coordinate projections (time, lat, lon) only echo those ranges.
+        """
+        names = [name for name in projections if name not in ds.coords]
+        unknown = [name for name in names if name not in ds.data_vars]
+        if unknown:
+            raise ConstraintError(f"Unknown variable(s): {', '.join(unknown)}")
+        ranges = next((projections[name] for name in names if projections[name]), [])
+        if ranges and self.reject_subsets:
+            raise ConstraintError("Index-constrained requests are not supported")
+
+        selected = ds[names] if names else ds
+        dims = selected[names[0]].dims if names else ("time", "lat", "lon")
+        if len(ranges) > len(dims):
+            raise ConstraintError("More index ranges than the variable has dimensions")
+        for dim, index in zip(dims, ranges):
+            if index.start >= selected.sizes[dim] or index.stop > selected.sizes[dim]:
+                raise ConstraintError(f"Index range outside '{dim}' (size {selected.sizes[dim]})")
+        return selected.isel(dict(zip(dims, ranges)))
+
+    def serve(self, host="127.0.0.1", port=0, quiet=True):
+        """Starts serving on a background thread; returns the HTTP server."""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, body = mock.respond(url.path, url.query)
+                with mock.lock:
+                    mock.stats["requests"] += 1
+                    mock.stats["bytes"] += len(body)
+                self.send_response(status)
+                content_type = "application/x-netcdf" if status == 200 else "text/plain"
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                if not quiet:
+                    super().log_message(format, *args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def url_template(server):
+    """LIVE_OPENDAP_URL_TEMPLATE pointing the live path at a running server."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{URL_LAYOUT}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve MERRA-2 granules over an OPeNDAP-like HTTP interface, offline."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--data-dir", help="serve these granules instead of generating them on the fly"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--reject-subsets",
+        action="store_true",
+        help="answer index-constrained requests with 400, like servers that refuse them",
+    )
+    args = parser.parse_args()
+
+    mock = MockOpendapServer(args.data_dir, args.seed, args.reject_subsets)
+    server = mock.serve(args.host, args.port, quiet=False)
+    source = f"'{args.data_dir}' ({len(mock.files)} granules)" if args.data_dir else "generator"
+    print(f"✅ Mock OPeNDAP server on port {args.port}, serving from {source}")
+    print(f"   export LIVE_OPENDAP_URL_TEMPLATE={url_template(server)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import glob
+import json
+import time
+
+import numpy as np
+import xarray as xr
+
+from columnar_store import write_store
+
+# Output key -> percentile, in the schema the dashboard already consumes
+TEMP_PERCENTILES = {
+    "p5_temp_celsius": 5,
+    "p75_temp_celsius": 75,
+    "p85_temp_celsius": 85,
+    "p95_temp_celsius": 95,
+    "p99_temp_celsius": 99,
+}
+WIND_PERCENTILES = {"p95_wind_speed_ms": 95}
+DAYS_IN_CLIMATOLOGY = 366
+# A day counts as rainy above this daily total (mm)
+RAIN_DAY_THRESHOLD_MM = 1.0
+
+
+def open_archive(nasa_files, hours_per_chunk=24):
+    """Opens the granule archive lazily, one dask chunk per daily file."""
+    return xr.open_mfdataset(
+        nasa_files, combine="by_coords", chunks={"time": hours_per_chunk}
+    )
+
+
+def compute_daily_series(ds):
+    """
+    Streams the hourly archive once, chunk by chunk, down to the per-cell daily
+    series the percentiles are taken from. Only daily values are held in memory.
+    """
+    wind_speed = (ds["U10M"] ** 2 + ds["V10M"] ** 2) ** 0.5
+    daily = xr.Dataset(
+        {
+            "max_temp_celsius": ds["T2M"].resample(time="1D").max() - 273.15,
+            "max_wind_speed_ms": wind_speed.resample(time="1D").max(),
+        }
+    )
+    if "PRECTOT" in ds:
+        # kg m-2 s-1 averaged over each hour -> mm per day
+        daily["precip_mm"] = (ds["PRECTOT"] * 3600).resample(time="1D").sum()
+    return daily.compute()
+
+
+def windowed_doy_groups(day_of_year, window):
+    """
+    For every day of year 1..366, returns the indices of all days in the
+    series within +/- window days of it (wrapping around the year end).
+    """
+    offsets = np.arange(-window, window + 1)
+    shifted_doy = (day_of_year[None, :] - 1 + offsets[:, None]) % DAYS_IN_CLIMATOLOGY + 1
+    day_index = np.broadcast_to(np.arange(day_of_year.size), shifted_doy.shape)
+
+    flat_doy = shifted_doy.ravel()
+    order = np.argsort(flat_doy, kind="stable")
+    sorted_doy = flat_doy[order]
+    sorted_index = day_index.ravel()[order]
+    bounds = np.searchsorted(sorted_doy, np.arange(1, DAYS_IN_CLIMATOLOGY + 2))
+    return [
+        sorted_index[bounds[d] : bounds[d + 1]] for d in range(DAYS_IN_CLIMATOLOGY)
+    ]
+
+
+def build_climatology(daily, window=7):
+    """
+    Computes the per-day-of-year percentile table from a daily series.
+    Every grid cell is handled in the same array operations, so the result is
+    a (doy x lat x lon) Dataset with one variable per output key.
+    """
+    temps = daily["max_temp_celsius"].values
+    winds = daily["max_wind_speed_ms"].values
+    precip = daily["precip_mm"].values if "precip_mm" in daily else None
+    groups = windowed_doy_groups(daily["time"].dt.dayofyear.values, window)
+
+    temp_q = list(TEMP_PERCENTILES.values())
+    wind_q = list(WIND_PERCENTILES.values())
+    cell_shape = temps.shape[1:]
+    out = {
+        key: np.full((DAYS_IN_CLIMATOLOGY,) + cell_shape, np.nan)
+        for key in [*TEMP_PERCENTILES, *WIND_PERCENTILES, "rain_probability_percent"]
+    }
+    for day, idx in enumerate(groups):
+        if not idx.size:
+            continue
+        temp_values = np.nanpercentile(temps[idx], temp_q, axis=0)
+        wind_values = np.nanpercentile(winds[idx], wind_q, axis=0)
+        for key, values in zip(TEMP_PERCENTILES, temp_values):
+            out[key][day] = values
+        for key, values in zip(WIND_PERCENTILES, wind_values):
+            out[key][day] = values
+        # M2T1NXSLV has no precipitation; only filled when PRECTOT is present
+        if precip is not None:
+            out["rain_probability_percent"][day] = (
+                np.mean(precip[idx] > RAIN_DAY_THRESHOLD_MM, axis=0) * 100
+            )
+
+    dims = ("doy",) + daily["max_temp_celsius"].dims[1:]
+    coords = {"doy": np.arange(1, DAYS_IN_CLIMATOLOGY + 1)}
+    coords.update({dim: daily[dim].values for dim in dims[1:]})
+    return xr.Dataset(
+        {key: (dims, values.round(2)) for key, values in out.items()}, coords=coords
+    )
+
+
+def _round_or_none(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def climatology_to_json(climatology, lat, lon):
+    """Climatology of the cell nearest to (lat, lon), in the dashboard's JSON schema."""
+    cell = climatology.sel(lat=lat, lon=lon, method="nearest")
+    columns = {key: cell[key].values for key in cell.data_vars}
+    return {
+        str(day): {key: _round_or_none(values[k]) for key, values in columns.items()}
+        for k, day in enumerate(cell["doy"].values.tolist())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the day-of-year climatology from the MERRA-2 archive."
+    )
+    parser.add_argument("--input-glob", default="nasa_merra2_data/*.nc4")
+    parser.add_argument("--output", default="climatology_full_1991-2020.json")
+    parser.add_argument("--grid-output", default="climatology_grid_1991-2020.nc")
+    # Point written to the single-location JSON; the grid output keeps every cell
+    parser.add_argument("--lat", type=float, default=17.6868)
+    parser.add_argument("--lon", type=float, default=83.2185)
+    parser.add_argument("--location", default="Visakhapatnam Area (NASA MERRA-2 Data)")
+    parser.add_argument(
+        "--window", type=int, default=7, help="+/- days pooled around each day of year"
+    )
+    args = parser.parse_args()
+
+    print("--- Building climatology from NASA MERRA-2 archive ---")
+    nasa_files = sorted(glob.glob(args.input_glob))
+    if not nasa_files:
+        print("❌ No NASA data files found.")
+        return
+
+    print(f"Found {len(nasa_files)} NASA MERRA-2 files to process.")
+    start = time.perf_counter()
+    ds = open_archive(nasa_files)
+    daily = compute_daily_series(ds)
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ Reduced {len(nasa_files)} files to {daily.sizes['time']} days "
+        f"in {elapsed:.1f}s ({len(nasa_files) / elapsed:.1f} files/sec)"
+    )
+
+    climatology = build_climatology(daily, args.window)
+    climatology.attrs["location"] = args.location
+    write_store(climatology, args.grid_output)
+    print(f"✅ Saved gridded climatology to '{args.grid_output}'")
+
+    climatology_output = {
+        "location": args.location,
+        "daily_climatology": climatology_to_json(climatology, args.lat, args.lon),
+    }
+    with open(args.output, "w") as f:
+        json.dump(climatology_output, f, indent=4)
+
+    print(f"✅ Successfully created '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
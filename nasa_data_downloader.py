@@ -1,61 +1,260 @@
-import earthaccess
-import requests
+import argparse
+import json
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# NOTE: MERRA-2 variable names are different from ERA5
+REQUIRED_VARS = "T2M,U10M,V10M,T2MDEW"
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 1024 * 1024
+# Status codes worth retrying; anything else (401, 404, ...) fails immediately
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# The manifest is saved every this many finished granules or seconds, and at the end
+MANIFEST_FLUSH_EVERY = 50
+MANIFEST_FLUSH_SECONDS = 30.0
+
 
 # --- 1. Search for the MERRA-2 data ---
-print("Searching for MERRA-2 data granules on Earthdata...")
-try:
+def search_opendap_urls(temporal, bounding_box):
+    """Returns the OPeNDAP URLs of all M2T1NXSLV granules matching the search."""
+    import earthaccess
+
     results = earthaccess.search_data(
         short_name="M2T1NXSLV",
         version="5.12.4",
-        temporal=("2023-06-01", "2023-06-30"),
-        # Bounding box for Visakhapatnam: West, South, East, North
-        bounding_box=(83, 17, 84, 18),
+        temporal=temporal,
+        bounding_box=bounding_box,
     )
-    if not results:
-        print(
-            "❌ No data found for the specified criteria. Please check the parameters."
+
+    # --- 2. Get the OPeNDAP URLs from the search results ---
+    opendap_urls = []
+    for item in results:
+        for url_info in item["umm"]["RelatedUrls"]:
+            if "OPENDAP" in url_info.get("Description", "").upper():
+                opendap_urls.append(url_info["URL"])
+    return opendap_urls
+
+
+def build_download_url(url, required_vars=REQUIRED_VARS):
+    """Full download URL with only the variables we need (Temp, Wind, Dewpoint)."""
+    return f"{url}.nc?{required_vars}"
+
+
+def make_session(workers):
+    """One keep-alive session shared by all workers, with a connection per worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class DownloadManifest:
+    """
+    Records finished granules in <output_dir>/manifest.json so an interrupted
+    bulk download resumes where it stopped instead of starting from scratch.
+    Saved in batches (see MANIFEST_FLUSH_EVERY); flush() saves the rest. A
+    granule finished after the last save is found on disk and adopted on resume.
+    """
+
+    def __init__(self, output_dir, flush_every=MANIFEST_FLUSH_EVERY,
+                 flush_seconds=MANIFEST_FLUSH_SECONDS):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.files = {}
+        self.unsaved = 0
+        self.saved_at = time.monotonic()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.files = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable manifest {self.path}: {e}")
+
+    def is_done(self, filename):
+        entry = self.files.get(os.path.basename(filename))
+        return (
+            entry is not None
+            and entry.get("status") == "done"
+            and os.path.exists(filename)
         )
-        exit()
-except Exception as e:
-    print(f"❌ An error occurred during search: {e}")
-    exit()
 
-# --- 2. Get the OPeNDAP URLs from the search results ---
-opendap_urls = []
-for item in results:
-    for url_info in item["umm"]["RelatedUrls"]:
-        if "OPENDAP" in url_info.get("Description", "").upper():
-            opendap_urls.append(url_info["URL"])
+    def mark_done(self, filename, url, num_bytes):
+        with self.lock:
+            self.files[os.path.basename(filename)] = {
+                "url": url,
+                "bytes": num_bytes,
+                "status": "done",
+            }
+            self.unsaved += 1
+            if (self.unsaved >= self.flush_every
+                    or time.monotonic() - self.saved_at >= self.flush_seconds):
+                self._save()
+
+    def flush(self):
+        """Saves the granules recorded since the last save."""
+        with self.lock:
+            if self.unsaved:
+                self._save()
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a truncated manifest behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.files}, f, indent=4)
+        os.replace(tmp_path, self.path)
+        self.unsaved = 0
+        self.saved_at = time.monotonic()
+
 
-print(f"✅ Found {len(opendap_urls)} data files to download.")
+def download_granule(session, download_url, filename, retries=4, backoff=2.0, timeout=120):
+    """
+    Streams one granule to disk in chunks. The data goes to '<filename>.part'
+    and is renamed into place only when complete, so a failed or interrupted
+    download never leaves a half-written file under the final name.
+    Retries connection errors and 429/5xx responses with exponential backoff.
+    Returns the number of bytes written.
+    """
+    part_path = f"{filename}.part"
+    for attempt in range(retries + 1):
+        try:
+            # The .netrc file is used automatically for authentication
+            with session.get(download_url, stream=True, timeout=timeout) as response:
+                if response.status_code in RETRYABLE_STATUS and attempt < retries:
+                    raise requests.exceptions.RetryError(
+                        f"HTTP {response.status_code} from server"
+                    )
+                response.raise_for_status()
 
-# --- 3. Download each file ---
-output_dir = "nasa_merra2_data"
-os.makedirs(output_dir, exist_ok=True)
+                num_bytes = 0
+                with open(part_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        num_bytes += len(chunk)
+            os.replace(part_path, filename)
+            return num_bytes
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.RetryError) as e:
+            if attempt >= retries:
+                raise
+            delay = backoff * (2**attempt) * (0.5 + random.random() / 2)
+            print(f"...Retrying {os.path.basename(filename)} in {delay:.1f}s ({e})")
+            time.sleep(delay)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
 
-for url in opendap_urls:
-    # Construct the full download URL with the variables we need (Temp, Wind, Dewpoint)
-    # NOTE: MERRA-2 variable names are different from ERA5
-    required_vars = "T2M,U10M,V10M,T2MDEW"
-    download_url = f"{url}.nc?{required_vars}"
 
-    filename = os.path.join(output_dir, os.path.basename(url))
+def bulk_download(opendap_urls, output_dir, workers=8, retries=4, backoff=2.0,
+                  required_vars=REQUIRED_VARS):
+    """
+    Downloads all granules with a bounded pool of worker threads sharing one
+    HTTP session. Granules already recorded in the manifest are skipped.
+    Returns a summary dict with the downloaded, skipped and failed counts.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = DownloadManifest(output_dir)
+    summary = {"downloaded": 0, "skipped": 0, "failed": 0, "bytes": 0}
 
-    if os.path.exists(filename):
-        print(f"File exists, skipping: {filename}")
-        continue
+    pending = []
+    for url in opendap_urls:
+        filename = os.path.join(output_dir, os.path.basename(url))
+        if manifest.is_done(filename):
+            summary["skipped"] += 1
+            continue
+        if os.path.exists(filename):
+            # Downloaded by an older, manifest-less run (or after its last save): adopt it
+            print(f"File exists, skipping: {filename}")
+            manifest.mark_done(filename, url, os.path.getsize(filename))
+            summary["skipped"] += 1
+            continue
+        pending.append((url, filename))
 
-    print(f"Downloading {filename}...")
+    print(f"Downloading {len(pending)} files with {workers} workers "
+          f"({summary['skipped']} already done)...")
+    start = time.perf_counter()
     try:
-        # The .netrc file is used automatically for authentication
-        response = requests.get(download_url, timeout=120)
-        response.raise_for_status()  # Raise an exception for bad status codes (like 401 or 404)
+        with make_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(
+                    download_granule, session, build_download_url(url, required_vars),
+                    filename, retries, backoff,
+                ): (url, filename)
+                for url, filename in pending
+            }
+            try:
+                for future in as_completed(futures):
+                    url, filename = futures[future]
+                    try:
+                        num_bytes = future.result()
+                    except (requests.exceptions.RequestException, OSError) as e:
+                        summary["failed"] += 1
+                        print(f"...Failed to download {filename}: {e}")
+                        continue
+                    manifest.mark_done(filename, url, num_bytes)
+                    summary["downloaded"] += 1
+                    summary["bytes"] += num_bytes
+                    print(f"...Success! {filename} ({num_bytes / 1e6:.1f} MB)")
+            except KeyboardInterrupt:
+                # Leaving the pool waits for its queue: drop the granules not
+                # yet started, so only the ones in flight are finished
+                print("Interrupted, cancelling the remaining downloads...")
+                manifest.flush()
+                pool.shutdown(cancel_futures=True)
+                raise
+    finally:
+        # Also when interrupted, so the finished granules are not fetched again
+        manifest.flush()
+
+    elapsed = time.perf_counter() - start
+    if elapsed > 0 and summary["bytes"]:
+        print(f"Throughput: {summary['bytes'] / 1e6 / elapsed:.1f} MB/s")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download MERRA-2 granules from Earthdata.")
+    parser.add_argument("--start", default="2023-06-01")
+    parser.add_argument("--end", default="2023-06-30")
+    # Bounding box for Visakhapatnam: West, South, East, North
+    parser.add_argument("--bbox", type=float, nargs=4, default=[83, 17, 84, 18])
+    parser.add_argument("--output-dir", default="nasa_merra2_data")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Parallel downloads (1 = one at a time)")
+    parser.add_argument("--retries", type=int, default=4)
+    args = parser.parse_args()
+
+    print("Searching for MERRA-2 data granules on Earthdata...")
+    try:
+        opendap_urls = search_opendap_urls((args.start, args.end), tuple(args.bbox))
+    except Exception as e:
+        print(f"❌ An error occurred during search: {e}")
+        return
+    if not opendap_urls:
+        print(
+            "❌ No data found for the specified criteria. Please check the parameters."
+        )
+        return
+
+    print(f"✅ Found {len(opendap_urls)} data files to download.")
+
+    # --- 3. Download all files ---
+    summary = bulk_download(opendap_urls, args.output_dir, args.workers, args.retries)
+    print(
+        f"\n--- NASA Data Download Complete: {summary['downloaded']} downloaded, "
+        f"{summary['skipped']} skipped, {summary['failed']} failed ---"
+    )
 
-        with open(filename, "wb") as f:
-            f.write(response.content)
-        print("...Success!")
-    except requests.exceptions.RequestException as e:
-        print(f"...Failed to download: {e}")
 
-print("\n--- NASA Data Download Complete ---")
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,214 @@
 import xarray as xr
 import numpy as np
+import argparse
+import hashlib
 import json
 import glob
+import math
+import os
+import time
 import todi_engine  # We will reuse our TODI engine!
+import todi_pipeline
+from columnar_store import append_store, open_store, remove_segments, write_store
 
-print("--- Starting FINAL NASA MERRA-2 Data Processing ---")
+LOCATION_NAME = "Visakhapatnam Area (NASA MERRA-2 Data)"
+# Point written to the single-location JSON; the gridded store keeps every cell
+DEFAULT_POINT = (17.6868, 83.2185)
+GRID_OUTPUT = "processed_grid.nc"
+JSON_OUTPUT = "processed_data_nasa.json"
+# Granules already in the gridded store, for --incremental runs
+MANIFEST_OUTPUT = "processed_grid.manifest.json"
 
-try:
-    # 1. Find and open all the downloaded NASA data files
-    nasa_files = sorted(glob.glob("nasa_merra2_data/*.nc4"))
-    if not nasa_files:
-        print("❌ No NASA data files found.")
-        exit()
 
-    print(f"Found {len(nasa_files)} NASA MERRA-2 files to process.")
-    ds = xr.open_mfdataset(nasa_files, combine="by_coords")
-    print("✅ Successfully opened all NASA data files.")
+def file_digest(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
 
-    # --- 2. Perform Calculations using MERRA-2 Variable Names ---
 
-    # Temperature (T2M is in Kelvin, convert to Celsius)
-    daily_max_temp_c = (
-        ds["T2M"].resample(time="1D").max().max(dim=["lat", "lon"]) - 273.15
-    )
+class ProcessedManifest:
+    """
+    Granules already folded into the gridded store, by file name with size,
+    mtime and SHA-1. Unchanged files are recognised from their size and mtime
+    alone; the hash is only computed for new files and ones whose stat changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.files = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable manifest {path}: {e}")
+
+    def pending(self, paths):
+        """Files that are new or whose content changed since they were processed."""
+        pending = []
+        for path in paths:
+            entry = self.files.get(os.path.basename(path))
+            stat = os.stat(path)
+            if entry is None:
+                pending.append(path)
+            elif (entry["bytes"], entry["mtime"]) != (stat.st_size, stat.st_mtime):
+                if file_digest(path) == entry["sha1"]:
+                    entry.update(bytes=stat.st_size, mtime=stat.st_mtime)  # touched only
+                else:
+                    pending.append(path)
+        return pending
+
+    def record(self, paths, reset=False):
+        if reset:
+            self.files = {}
+        for path in paths:
+            stat = os.stat(path)
+            self.files[os.path.basename(path)] = {
+                "bytes": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha1": file_digest(path),
+            }
+        self._save()
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a truncated manifest behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.files}, f, indent=4)
+        os.replace(tmp_path, self.path)
+
 
-    # Wind Speed (U10M and V10M are the components)
-    wind_speed = (ds["U10M"] ** 2 + ds["V10M"] ** 2) ** 0.5
-    daily_max_wind_ms = wind_speed.resample(time="1D").max().max(dim=["lat", "lon"])
-
-    # --- 3. Calculate TODI Score for each day ---
-    # We will need to calculate relative humidity from dewpoint (T2MDEW)
-    # This is a complex formula, so for now, we will continue using our reliable mock humidity
-    todi_scores = []
-    mock_humidity = 65.0
-    for i in range(len(daily_max_temp_c.time)):
-        temp = daily_max_temp_c.values[i]
-        wind = daily_max_wind_ms.values[i]
-        score = todi_engine.calculate_todi_score(temp, mock_humidity, wind)
-        todi_scores.append(score)
-
-    # --- 4. Prepare the final JSON output ---
-    processed_data = {
-        "location": "Visakhapatnam Area (NASA MERRA-2 Data)",
+def compute_daily_grid(ds):
+    """
+    Per-cell daily summaries (time x lat x lon). Nothing is collapsed over
+    lat/lon, so one pass over a region serves every location in it.
+    TODI is scored hour by hour and then aggregated to daily max/mean/p95.
+    """
+    daily = todi_pipeline.daily_todi(todi_pipeline.hourly_todi(ds))
+    daily.attrs["location"] = LOCATION_NAME
+    return daily.compute()
+
+
+def _to_json_list(values, digits=None):
+    """Floats for json.dump, with None for missing (non-finite) values."""
+    return [
+        (v if digits is None else round(v, digits)) if math.isfinite(v) else None
+        for v in np.ravel(values).astype(float).tolist()
+    ]
+
+
+def point_summary(daily, lat, lon):
+    """Daily summary of the cell nearest to (lat, lon), in the processed_data.json schema."""
+    cell = daily.sel(lat=lat, lon=lon, method="nearest")
+    return {
+        "location": f"{LOCATION_NAME} (cell {float(cell.lat)}, {float(cell.lon)})",
         "daily_summary": {
-            "timestamps": [str(t.values) for t in daily_max_temp_c.time],
-            "max_temp_celsius": daily_max_temp_c.values.tolist(),
-            "max_wind_speed_ms": daily_max_wind_ms.values.tolist(),
-            "todi_score": todi_scores,
+            "timestamps": [str(t) for t in cell["time"].values],
+            "max_temp_celsius": _to_json_list(cell["max_temp_celsius"].values),
+            "max_wind_speed_ms": _to_json_list(cell["max_wind_speed_ms"].values),
+            "min_relative_humidity_percent": _to_json_list(
+                cell["min_relative_humidity_percent"].values
+            ),
+            "todi_score": todi_engine.todi_scores_to_list(cell["todi_score"].values),
+            "todi_mean": _to_json_list(cell["todi_mean"].values, 2),
+            "todi_p95": _to_json_list(cell["todi_p95"].values, 2),
         },
     }
 
-    # Save to a new JSON file to keep it separate
-    with open("processed_data_nasa.json", "w") as f:
-        json.dump(processed_data, f, indent=4)
 
+def rebuild(nasa_files, grid_output):
+    """Processes the whole archive and rewrites the gridded store."""
+    print(f"Found {len(nasa_files)} NASA MERRA-2 files to process.")
+    ds = xr.open_mfdataset(nasa_files, combine="by_coords")
+    print("✅ Successfully opened all NASA data files.")
+
+    # Per-cell daily summaries and TODI scores, saved as a chunked, compressed store
+    daily = compute_daily_grid(ds)
+    write_store(daily, grid_output)
+    # Their days are in the rebuilt store now
+    remove_segments(grid_output)
     print(
-        "✅ Success! NASA data processed with TODI scores and saved to 'processed_data_nasa.json'"
+        f"✅ Saved {daily.sizes['lat']}x{daily.sizes['lon']} cell grid to '{grid_output}'"
     )
 
-except Exception as e:
-    print(f"❌ An error occurred: {e}")
+
+def update(new_files, grid_output):
+    """
+    Processes only new or changed granules and writes their days into the
+    existing store. Returns False when the store has to be rebuilt instead.
+    """
+    print(f"Found {len(new_files)} new or changed NASA MERRA-2 files to process.")
+    daily = compute_daily_grid(xr.open_mfdataset(new_files, combine="by_coords"))
+    try:
+        appended = append_store(daily, grid_output)
+    except (ValueError, OSError, RuntimeError) as e:
+        print(f"⚠️ Cannot update '{grid_output}' ({e}); rebuilding it.")
+        return False
+    print(
+        f"✅ Wrote {daily.sizes['time']} days to '{grid_output}' "
+        f"({appended} appended, {daily.sizes['time'] - appended} updated)"
+    )
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute per-cell daily summaries and TODI scores from the MERRA-2 archive."
+    )
+    parser.add_argument("--input-glob", default="nasa_merra2_data/*.nc4")
+    parser.add_argument("--grid-output", default=GRID_OUTPUT)
+    parser.add_argument("--output", default=JSON_OUTPUT)
+    parser.add_argument("--manifest", default=MANIFEST_OUTPUT)
+    parser.add_argument("--lat", type=float, default=DEFAULT_POINT[0])
+    parser.add_argument("--lon", type=float, default=DEFAULT_POINT[1])
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only process granules not yet in the gridded store and append their days",
+    )
+    args = parser.parse_args()
+
+    print("--- Starting FINAL NASA MERRA-2 Data Processing ---")
+
+    try:
+        # 1. Find all the downloaded NASA data files
+        nasa_files = sorted(glob.glob(args.input_glob))
+        if not nasa_files:
+            print("❌ No NASA data files found.")
+            return
+
+        # 2. Update or rebuild the gridded store, then record what it contains
+        start = time.perf_counter()
+        manifest = ProcessedManifest(args.manifest)
+        can_update = args.incremental and os.path.exists(args.grid_output)
+        new_files = manifest.pending(nasa_files) if can_update else nasa_files
+        if can_update and not new_files:
+            print("✅ Gridded store is already up to date.")
+            manifest.record([])
+        elif can_update and update(new_files, args.grid_output):
+            manifest.record(new_files)
+        else:
+            rebuild(nasa_files, args.grid_output)
+            manifest.record(nasa_files, reset=True)
+        print(f"Processing took {time.perf_counter() - start:.1f}s")
+
+        # 3. Prepare the single-location JSON output from the store
+        with open_store(args.grid_output) as daily:
+            processed_data = point_summary(daily, args.lat, args.lon)
+
+        # Save to a new JSON file to keep it separate
+        with open(args.output, "w") as f:
+            json.dump(processed_data, f, indent=4)
+
+        print(
+            f"✅ Success! NASA data processed with TODI scores and saved to '{args.output}'"
+        )
+
+    except Exception as e:
+        print(f"❌ An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
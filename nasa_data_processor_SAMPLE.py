@@ -3,6 +3,7 @@ import numpy as np
 import json
 import glob
 import todi_engine
+import todi_pipeline
 
 print("--- Starting NASA MERRA-2 SAMPLE Data Processing (First 7 Days) ---")
 
@@ -17,20 +18,12 @@ try:
     ds = xr.open_mfdataset(nasa_files, combine="by_coords")
     print("✅ Successfully opened NASA data files.")
 
-    # Perform the same calculations as before
-    daily_max_temp_c = (
-        ds["T2M"].resample(time="1D").max().max(dim=["lat", "lon"]) - 273.15
-    )
-    wind_speed = (ds["U10M"] ** 2 + ds["V10M"] ** 2) ** 0.5
-    daily_max_wind_ms = wind_speed.resample(time="1D").max().max(dim=["lat", "lon"])
-
-    todi_scores = []
-    mock_humidity = 65.0
-    for i in range(len(daily_max_temp_c.time)):
-        temp = daily_max_temp_c.values[i]
-        wind = daily_max_wind_ms.values[i]
-        score = todi_engine.calculate_todi_score(temp, mock_humidity, wind)
-        todi_scores.append(score)
+    # Same hourly TODI pipeline as the full processor, then the worst cell per day
+    daily = todi_pipeline.daily_todi(todi_pipeline.hourly_todi(ds)).compute()
+    daily_max_temp_c = daily["max_temp_celsius"].max(dim=["lat", "lon"])
+    daily_max_wind_ms = daily["max_wind_speed_ms"].max(dim=["lat", "lon"])
+    daily_min_rh = daily["min_relative_humidity_percent"].min(dim=["lat", "lon"])
+    todi_scores = daily["todi_score"].max(dim=["lat", "lon"]).values
 
     # Prepare the final JSON output
     processed_data = {
@@ -39,7 +32,8 @@ try:
             "timestamps": [str(t.values) for t in daily_max_temp_c.time],
             "max_temp_celsius": daily_max_temp_c.values.tolist(),
             "max_wind_speed_ms": daily_max_wind_ms.values.tolist(),
-            "todi_score": todi_scores,
+            "min_relative_humidity_percent": daily_min_rh.values.tolist(),
+            "todi_score": todi_engine.todi_scores_to_list(todi_scores),
         },
     }
 
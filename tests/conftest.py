@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The pipeline modules live at the repository root and the Flask service's in
+# backend-service/, each imported by bare module name as the scripts do
+for path in (os.path.join(ROOT, "backend-service"), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from columnar_store import append_store, open_store, remove_segments, store_segments, write_store
+from grid_store import GridStore
+
+LATS = np.array([17.0, 17.5])
+LONS = np.array([83.125, 83.75])
+
+
+def daily(start, days, value=None, variables=("todi_score", "max_temp_celsius")):
+    times = pd.date_range(start, periods=days, freq="D")
+    base = np.arange(days, dtype=float) if value is None else np.full(days, float(value))
+    cube = np.broadcast_to(base[:, None, None], (days, LATS.size, LONS.size)).copy()
+    return xr.Dataset(
+        {name: (("time", "lat", "lon"), cube) for name in variables},
+        coords={"time": times, "lat": LATS, "lon": LONS},
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    # 2023-01-27 .. 2023-01-31, scored 0..4
+    path = str(tmp_path / "processed_grid.nc")
+    write_store(daily("2023-01-27", 5), path)
+    return path
+
+
+def read(path):
+    with open_store(path) as ds:
+        return ds.load()
+
+
+def scores(ds):
+    return ds["todi_score"].values[:, 0, 0].tolist()
+
+
+def test_new_days_are_appended(store):
+    appended = append_store(daily("2023-02-01", 3, value=50), store)
+
+    ds = read(store)
+    assert appended == 3
+    assert scores(ds) == [0, 1, 2, 3, 4, 50, 50, 50]
+    assert str(ds["time"].values[-1])[:10] == "2023-02-03"
+
+
+def test_days_already_stored_are_replaced(store):
+    appended = append_store(daily("2023-01-30", 4, value=99), store)
+
+    assert appended == 2
+    assert scores(read(store)) == [0, 1, 2, 99, 99, 99, 99]
+
+    append_store(daily("2023-02-01", 1, value=7), store)
+    assert scores(read(store)) == [0, 1, 2, 99, 99, 7, 99]
+
+
+def test_days_go_to_one_segment_per_month_and_the_store_is_not_rewritten(store):
+    before = os.stat(store)
+    append_store(daily("2023-01-31", 40), store)
+
+    assert [os.path.basename(p) for p in store_segments(store)] == [
+        "processed_grid.2023-01.nc",
+        "processed_grid.2023-02.nc",
+        "processed_grid.2023-03.nc",
+    ]
+    after = os.stat(store)
+    assert (after.st_ino, after.st_mtime_ns, after.st_size) == (
+        before.st_ino,
+        before.st_mtime_ns,
+        before.st_size,
+    )
+
+
+def test_days_before_the_last_one_can_be_added(store):
+    append_store(daily("2023-02-10", 1, value=10), store)
+    append_store(daily("2023-02-05", 1, value=5), store)
+
+    ds = read(store)
+    assert scores(ds)[-2:] == [5, 10]
+    assert ds.get_index("time").is_monotonic_increasing
+
+
+def test_a_different_grid_or_variables_need_a_rebuild(store):
+    moved = daily("2023-02-01", 1).assign_coords(lat=LATS + 0.5)
+    with pytest.raises(ValueError):
+        append_store(moved, store)
+    with pytest.raises(ValueError):
+        append_store(daily("2023-02-01", 1, variables=("todi_score",)), store)
+    assert store_segments(store) == []
+
+
+def test_a_rebuild_drops_the_segments(store):
+    append_store(daily("2023-02-01", 2, value=50), store)
+    write_store(daily("2023-01-27", 7, value=1), store)
+    remove_segments(store)
+
+    assert store_segments(store) == []
+    assert scores(read(store)) == [1] * 7
+
+
+def test_grid_store_reads_the_store_with_its_segments(store):
+    append_store(daily("2023-01-30", 4, value=99), store)
+    grid = GridStore(store)
+
+    assert grid.timestamps[0].startswith("2023-01-27")
+    assert grid.timestamps[-1].startswith("2023-02-02")
+    assert grid.point(17.0, 83.125)["todi_score"].tolist() == [0, 1, 2, 99, 99, 99, 99]
+    assert grid.point(17.0, 83.125, rows=slice(2, 4))["todi_score"].tolist() == [2, 99]
+    assert grid.point(17.0, 83.125, rows=[0, 6])["todi_score"].tolist() == [0, 99]
+    assert grid.point(17.0, 83.125, rows=[])["todi_score"].tolist() == []
+    bilinear = grid.point(17.25, 83.4375, method="bilinear", rows=[1, 5])
+    assert bilinear["todi_score"].tolist() == pytest.approx([1, 99])
+    grid.close()
+
+
+def test_an_open_grid_store_keeps_its_version_while_days_are_added(store):
+    grid = GridStore(store)
+    append_store(daily("2023-01-31", 2, value=70), store)
+
+    assert grid.point(17.0, 83.125)["todi_score"].tolist() == [0, 1, 2, 3, 4]
+    grid.close()
@@ -0,0 +1,63 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from columnar_store import append_store, write_store
+from data_registry import DataRegistry
+
+
+def risk(days):
+    timestamps = [f"2023-01-{day:02d}T00:00:00" for day in range(1, days + 1)]
+    return {"daily_summary": {"timestamps": timestamps, "todi_score": list(range(days))}}
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    # A new mtime even when the previous write was in the same clock tick
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def grid(start, days):
+    times = pd.date_range(start, periods=days, freq="D")
+    return xr.Dataset(
+        {"todi_score": (("time", "lat", "lon"), np.zeros((days, 2, 2)))},
+        coords={"time": times, "lat": [17.0, 17.5], "lon": [83.125, 83.75]},
+    )
+
+
+def test_status_lists_a_grid_with_segments(tmp_path):
+    path = str(tmp_path / "processed_grid.nc")
+    write_store(grid("2023-01-30", 2), path)
+    append_store(grid("2023-02-01", 1), path)
+
+    registry = DataRegistry(str(tmp_path))
+    status = registry.status()
+
+    assert status["files"]["risk_grid"]["size"] == os.path.getsize(path)
+    assert len(registry.current.risk_grid.timestamps) == 3
+    registry.current.risk_grid.close()
+
+
+def test_a_file_that_fails_to_load_keeps_its_previous_version(tmp_path):
+    path = str(tmp_path / "processed_data.json")
+    write(path, json.dumps(risk(3)))
+    registry = DataRegistry(str(tmp_path))
+    assert registry.current.version == 1
+
+    for broken in ("{ half-written", json.dumps({"daily_summary": {"timestamps": "x"}})):
+        write(path, broken)
+        assert registry.reload() is False
+        assert registry.current.version == 1
+        assert len(registry.current.risk_data["daily_summary"]["timestamps"]) == 3
+        assert "processed_data.json" in registry.status()["errors"]["risk"]
+
+    write(path, json.dumps(risk(5)))
+    assert registry.reload() is True
+    assert registry.current.version == 2
+    assert len(registry.current.risk_data["daily_summary"]["timestamps"]) == 5
+    assert registry.status()["errors"] == {}
@@ -0,0 +1,52 @@
+import granule_catalog
+from granule_catalog import GranuleCatalog
+
+URL = "https://example.invalid/opendap/MERRA2_400.tavg1_2d_slv_Nx.{}.nc4"
+
+
+class FakeSearch:
+    """CMR stand-in that finds granules up to `published` and records its calls."""
+
+    def __init__(self, published):
+        self.published = published
+        self.calls = []
+
+    def __call__(self, start_date, end_date):
+        self.calls.append((str(start_date), str(end_date)))
+        return {
+            day: URL.format(day.replace("-", ""))
+            for day in granule_catalog.date_range(start_date, end_date)
+            if day <= self.published
+        }
+
+
+def test_found_granules_are_not_searched_again(tmp_path):
+    search = FakeSearch("2023-06-30")
+    catalog = GranuleCatalog(str(tmp_path / "catalog.json"), search)
+
+    assert catalog.url("2023-06-10") == URL.format("20230610")
+    # The miss filled in the whole month, for this and every later process
+    assert catalog.lookup("2023-06-01", "2023-06-30").keys() == set(
+        granule_catalog.date_range("2023-06-01", "2023-06-30")
+    )
+    reopened = GranuleCatalog(str(tmp_path / "catalog.json"), search)
+    assert reopened.url("2023-06-20") == URL.format("20230620")
+    assert search.calls == [("2023-06-01", "2023-06-30")]
+
+
+def test_a_missing_date_is_searched_again_after_the_ttl(tmp_path, monkeypatch):
+    search = FakeSearch("2023-06-05")
+    catalog = GranuleCatalog(str(tmp_path / "catalog.json"), search)
+
+    assert catalog.lookup("2023-06-04", "2023-06-06") == {
+        "2023-06-04": URL.format("20230604"),
+        "2023-06-05": URL.format("20230605"),
+    }
+    assert catalog.lookup("2023-06-06", "2023-06-06") == {}
+    assert len(search.calls) == 1
+
+    # Published since, and the miss has expired
+    search.published = "2023-06-06"
+    monkeypatch.setattr(granule_catalog, "MISS_TTL_SECONDS", 0)
+    assert catalog.lookup("2023-06-06", "2023-06-06") == {"2023-06-06": URL.format("20230606")}
+    assert search.calls[1:] == [("2023-06-06", "2023-06-06")]
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from columnar_store import write_store
+from grid_store import GridStore
+from merra2_grid import LON_STEP
+
+# Every MERRA-2 longitude, -180 .. 179.375, scored by its index
+LONS = -180.0 + LON_STEP * np.arange(int(360 / LON_STEP))
+LATS = np.array([0.0, 0.5])
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "processed_grid.nc")
+    cube = np.broadcast_to(np.arange(LONS.size, dtype=float), (2, LATS.size, LONS.size))
+    write_store(
+        xr.Dataset(
+            {"todi_score": (("time", "lat", "lon"), cube.copy())},
+            coords={"time": pd.date_range("2023-01-01", periods=2), "lat": LATS, "lon": LONS},
+        ),
+        path,
+    )
+    store = GridStore(path)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize(
+    "lon, cell",
+    [(179.9, -180.0), (180.0, -180.0), (-180.2, -180.0), (179.5, 179.375), (-180.5, 179.375), (539.5, 179.375)],
+)
+def test_longitudes_wrap_around_the_dateline(store, lon, cell):
+    assert store.contains(0.0, lon)
+    assert store.cell_center(0.0, lon) == (0.0, cell)
+    expected = float(np.flatnonzero(LONS == cell)[0])
+    assert store.point(0.0, lon)["todi_score"].tolist() == [expected, expected]
+
+
+def test_a_regional_store_maps_wrapped_longitudes_to_its_cells(tmp_path):
+    path = str(tmp_path / "processed_grid.nc")
+    write_store(
+        xr.Dataset(
+            {"todi_score": (("time", "lat", "lon"), np.zeros((1, 2, 2)))},
+            coords={
+                "time": pd.date_range("2023-01-01", periods=1),
+                "lat": LATS,
+                "lon": [83.125, 83.75],
+            },
+        ),
+        path,
+    )
+    store = GridStore(path)
+    try:
+        assert store.cell_center(0.0, 83.3 - 360) == (0.0, 83.125)
+        assert store.contains(0.0, 83.7 + 360)
+        assert not store.contains(0.0, -96.7)
+        with pytest.raises(KeyError):
+            store.point(0.0, 84.5)
+    finally:
+        store.close()
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from histogram_builder import DAYS_IN_CLIMATOLOGY, DoyHistogram
+
+
+def day_counts(histogram, doy, bins):
+    return [entry["count"] for entry in histogram.day(doy, bins)["temps"]]
+
+
+def test_from_series_bins_every_value_of_its_day():
+    histogram = DoyHistogram.from_series([10, 10, 10, 10], [20.0, 20.05, 21.0, 25.0], window=0)
+
+    assert histogram.origin == pytest.approx(20.0)
+    assert histogram.cumulative.shape[0] == DAYS_IN_CLIMATOLOGY
+    assert sum(day_counts(histogram, 10, 8)) == 4
+    assert histogram.day(11)["temps"] == []
+
+
+def test_from_series_pools_the_window_and_wraps_the_year():
+    histogram = DoyHistogram.from_series([1], [30.0], window=2)
+
+    for doy in (365, 366, 1, 2, 3):
+        assert sum(day_counts(histogram, doy, 4)) == 1
+    assert histogram.day(4)["temps"] == []
+
+
+def test_from_series_ignores_missing_values():
+    histogram = DoyHistogram.from_series([1, 1, 1], [30.0, np.nan, 31.0], window=0)
+
+    assert sum(day_counts(histogram, 1, 4)) == 2
+
+
+def test_from_series_keeps_the_minimum_when_the_origin_rounds_above_it():
+    # floor(28.7 / 0.1) * 0.1 == 28.700000000000003
+    histogram = DoyHistogram.from_series([1, 2, 3], [28.7, 30.0, 31.2], window=0)
+
+    assert [sum(day_counts(histogram, doy, 4)) for doy in (1, 2, 3)] == [1, 1, 1]
+
+
+def test_from_series_files_the_minimum_under_its_own_day():
+    histogram = DoyHistogram.from_series([5, 2, 3], [28.7, 30.0, 31.2], window=0)
+
+    assert sum(day_counts(histogram, 5, 4)) == 1
+    assert histogram.day(4)["temps"] == []
+
+
+def test_rebinning_keeps_the_day_total():
+    values = np.linspace(20.0, 35.0, 151)
+    histogram = DoyHistogram.from_series(np.full(values.size, 100), values, window=0)
+
+    for bins in (1, 3, 8, 50):
+        counts = day_counts(histogram, 100, bins)
+        assert len(counts) == bins
+        assert sum(counts) == values.size
+
+
+def test_rebinned_centres_span_the_day_range():
+    histogram = DoyHistogram.from_series([7] * 3, [10.0, 15.0, 20.0], window=0)
+
+    temps = [entry["temp"] for entry in histogram.day(7, 2)["temps"]]
+    # Edges fall on base bins (0.1 wide), the last one just past the maximum
+    assert temps == pytest.approx([12.5, 17.5], abs=0.11)
+
+
+def test_from_payload_round_trips_the_counts():
+    values = np.random.default_rng(0).uniform(25.0, 40.0, 500)
+    doys = np.random.default_rng(1).integers(1, DAYS_IN_CLIMATOLOGY + 1, 500)
+    source = DoyHistogram.from_series(doys, values, window=3)
+
+    rebuilt = DoyHistogram.from_payload(source.payload())
+    for doy in (1, 100, 366):
+        assert sum(day_counts(rebuilt, doy, 8)) == sum(day_counts(source, doy, 8))
+        assert sum(day_counts(rebuilt, doy, 3)) == sum(day_counts(source, doy, 3))
+
+
+def test_save_and_load(tmp_path):
+    histogram = DoyHistogram.from_series([1, 1, 2], [20.0, 22.0, 24.0], window=0)
+    path = tmp_path / "counts.npz"
+    histogram.save(path)
+
+    loaded = DoyHistogram.load(path)
+    assert loaded.payload() == histogram.payload()
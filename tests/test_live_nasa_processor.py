@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+import live_nasa_processor as live
+from merra2_grid import hyperslab
+from mock_merra2_generator import synthetic_day
+
+
+@pytest.fixture(scope="module")
+def granule():
+    return synthetic_day(pd.Timestamp("2023-06-01"), seed=0)
+
+
+def slab_of(granule, lat, lon):
+    lat0, lat1, lon0, lon1 = hyperslab(lat, lon, live.SUBSET_HALO)
+    return granule.isel(lat=slice(lat0, lat1 + 1), lon=slice(lon0, lon1 + 1))
+
+
+@pytest.mark.parametrize("lon", [179.9, 180.0, -180.2])
+def test_points_past_the_last_column_are_read_from_the_dateline_cell(granule, lon):
+    subset = slab_of(granule, 10.0, lon)
+    dateline_cell = subset.isel(lon=[0])
+
+    assert live.summarize_cell(subset, 10.0, lon) == live.summarize_cell(
+        dateline_cell, 10.0, -180.0
+    )
+
+
+def test_summarize_cells_scores_each_point_from_its_own_cell(granule):
+    points = [(17.7, 83.3), (-33.9, 151.2), (64.1, -21.9)]
+    summaries = live.summarize_cells(granule, *zip(*points))
+
+    for (lat, lon), summary in zip(points, summaries):
+        assert summary == live.summarize_cell(slab_of(granule, lat, lon), lat, lon)
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import socket
+from datetime import date
+
+import aiohttp
+import pytest
+
+import live_nasa_processor as live
+import live_window
+from dataset_pool import DatasetPool
+from granule_cache import GranuleCache
+from mock_opendap_server import MockOpendapServer, url_template
+
+DAY = "2023-06-01"
+GRANULE = live.granule_filename(date.fromisoformat(DAY))
+POINT = (17.7, 83.3)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    granule_cache = GranuleCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(live, "granule_cache", granule_cache)
+    monkeypatch.setattr(live, "dataset_pool", DatasetPool())
+    return granule_cache
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    urls = []
+    download = live_window._download
+
+    async def recording(session, url, cache_key):
+        urls.append(url)
+        return await download(session, url, cache_key)
+
+    monkeypatch.setattr(live_window, "_download", recording)
+    return urls
+
+
+def serve(mock):
+    server = mock.serve()
+    template = url_template(server)
+    return server, template.format(year="2023", month="06", granule=GRANULE)
+
+
+def fetch(opendap_url):
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            return await live_window.fetch_day(session, opendap_url, DAY, *POINT)
+
+    return asyncio.run(run())
+
+
+def test_fetch_day_downloads_the_subset(cache, downloads):
+    server, opendap_url = serve(MockOpendapServer())
+    try:
+        path = fetch(opendap_url)
+    finally:
+        server.shutdown()
+
+    slab, subset_key, _ = live.day_cache_keys(DAY, *POINT)
+    assert cache.lookup(subset_key) == path
+    assert len(downloads) == 1
+    ds = live.open_granule(path)
+    assert ds.sizes["lat"] == slab[1] - slab[0] + 1
+    live.dataset_pool.release(ds)
+
+
+def test_fetch_day_falls_back_to_the_full_granule_when_subsets_are_rejected(cache, downloads):
+    server, opendap_url = serve(MockOpendapServer(reject_subsets=True))
+    try:
+        path = fetch(opendap_url)
+    finally:
+        server.shutdown()
+
+    _, subset_key, full_key = live.day_cache_keys(DAY, *POINT)
+    assert cache.lookup(full_key) == path
+    assert cache.lookup(subset_key) is None
+    assert len(downloads) == 2
+
+
+def test_fetch_day_raises_connection_errors_instead_of_falling_back(cache, downloads):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # Nothing listens on the port any more: the subset request cannot connect
+    with pytest.raises(aiohttp.ClientConnectionError):
+        fetch(f"http://127.0.0.1:{port}/opendap/{GRANULE}")
+    assert len(downloads) == 1
+
+
+def test_failed_downloads_leave_no_partial_files(cache):
+    server, opendap_url = serve(MockOpendapServer())
+    try:
+        with pytest.raises(aiohttp.ClientResponseError):
+            fetch(opendap_url.replace(".20230601.", ".missing."))
+    finally:
+        server.shutdown()
+
+    assert not [name for name in os.listdir(cache.cache_dir) if name.endswith(".part")]
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+import pytest
+import xarray as xr
+
+import nasa_data_downloader as downloader
+from mock_opendap_server import MockOpendapServer, url_template
+
+URLS = [
+    f"http://example.invalid/MERRA2_400.tavg1_2d_slv_Nx.202306{day:02d}.nc4"
+    for day in range(1, 21)
+]
+# A few cells of each variable keep the granules small
+SUBSET = ",".join(f"{name}[0:23][214:216][420:422]" for name in downloader.REQUIRED_VARS.split(","))
+
+
+def test_interrupt_cancels_queued_granules(tmp_path, monkeypatch):
+    started = []
+
+    def fake_download(session, download_url, filename, retries, backoff):
+        started.append(filename)
+        if len(started) == 1:
+            raise KeyboardInterrupt
+        time.sleep(0.05)
+        with open(filename, "wb") as f:
+            f.write(b"x")
+        return 1
+
+    monkeypatch.setattr(downloader, "download_granule", fake_download)
+    with pytest.raises(KeyboardInterrupt):
+        downloader.bulk_download(URLS, str(tmp_path), workers=2)
+
+    # Only the granule already in flight on the other worker was downloaded
+    assert len(started) <= 3
+    assert len(list(tmp_path.glob("*.nc4"))) <= 2
+
+
+def granule_urls(template, days):
+    return [
+        template.format(
+            year="2023", month="06", granule=f"MERRA2_400.tavg1_2d_slv_Nx.202306{day:02d}.nc4"
+        )
+        for day in days
+    ]
+
+
+@pytest.fixture
+def server():
+    mock = MockOpendapServer()
+    http_server = mock.serve()
+    yield mock, url_template(http_server)
+    http_server.shutdown()
+
+
+def test_granules_are_downloaded_and_recorded(tmp_path, server):
+    mock, template = server
+    urls = granule_urls(template, [1, 2, 3])
+    summary = downloader.bulk_download(urls, str(tmp_path), workers=2, required_vars=SUBSET)
+
+    assert summary["downloaded"] == 3 and summary["failed"] == 0
+    assert mock.stats["requests"] == 3
+    with open(tmp_path / downloader.MANIFEST_NAME) as f:
+        files = json.load(f)["files"]
+    assert sorted(files) == sorted(os.path.basename(url) for url in urls)
+    assert all(entry["status"] == "done" for entry in files.values())
+    with xr.open_dataset(tmp_path / "MERRA2_400.tavg1_2d_slv_Nx.20230601.nc4") as ds:
+        assert set(ds.data_vars) == set(downloader.REQUIRED_VARS.split(","))
+        assert ds["T2M"].shape == (24, 3, 3)
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_a_rerun_resumes_where_the_last_one_stopped(tmp_path, server):
+    mock, template = server
+    downloader.bulk_download(granule_urls(template, [1, 2]), str(tmp_path), required_vars=SUBSET)
+    # A granule finished after the last manifest save is found on disk
+    (tmp_path / "MERRA2_400.tavg1_2d_slv_Nx.20230603.nc4").write_bytes(b"done")
+
+    summary = downloader.bulk_download(
+        granule_urls(template, range(1, 6)), str(tmp_path), required_vars=SUBSET
+    )
+
+    assert summary == {**summary, "downloaded": 2, "skipped": 3, "failed": 0}
+    assert mock.stats["requests"] == 4
+
+
+def test_failed_granules_are_not_recorded(tmp_path, server):
+    mock, template = server
+    # The server answers 404 for a path without a granule date
+    missing = template.format(year="2023", month="06", granule="MERRA2_400.undated.nc4")
+    urls = granule_urls(template, [1]) + [missing]
+    summary = downloader.bulk_download(urls, str(tmp_path), required_vars=SUBSET)
+
+    assert summary["downloaded"] == 1 and summary["failed"] == 1
+    with open(tmp_path / downloader.MANIFEST_NAME) as f:
+        assert list(json.load(f)["files"]) == [os.path.basename(urls[0])]
+    assert not (tmp_path / "MERRA2_400.undated.nc4").exists()
+    assert not list(tmp_path.glob("*.part"))
@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 
 # --- Helper Functions (unchanged) ---
 def calculate_heat_index(temp_celsius, relative_humidity):
@@ -59,3 +61,112 @@ def calculate_todi_score(temp_celsius, relative_humidity, wind_speed_ms):
     score = max(0, min(100, score))
 
     return int(score)
+
+
+# --- Vectorized (array) API ---
+# Same formulas as the scalar functions above, written with np.where instead of
+# per-value branches so a whole (time x lat x lon) cube is scored in a few passes.
+# NaN inputs produce NaN outputs instead of raising on int(nan).
+
+
+def _is_xarray(*values):
+    return any(hasattr(v, "dims") for v in values)
+
+
+def _apply(func, *values):
+    """Runs a NumPy kernel directly, or through xarray so coords/dask chunks survive."""
+    if _is_xarray(*values):
+        import xarray as xr
+
+        return xr.apply_ufunc(
+            func, *values, dask="parallelized", output_dtypes=[float]
+        )
+    return func(*(np.asarray(v, dtype=float) for v in values))
+
+
+def _heat_index_kernel(temp_celsius, relative_humidity):
+    temp_fahrenheit = (temp_celsius * 9 / 5) + 32
+    heat_index_f = 0.5 * (
+        temp_fahrenheit
+        + 61.0
+        + ((temp_fahrenheit - 68.0) * 1.2)
+        + (relative_humidity * 0.094)
+    )
+    heat_index_f = np.where(heat_index_f < temp_fahrenheit, temp_fahrenheit, heat_index_f)
+    return (heat_index_f - 32) * 5 / 9
+
+
+def _wind_chill_kernel(temp_celsius, wind_speed_ms):
+    temp_f = (temp_celsius * 9 / 5) + 32
+    wind_mph = wind_speed_ms * 2.23694
+    with np.errstate(invalid="ignore"):
+        wind_factor = wind_mph**0.16
+    wind_chill_f = (
+        35.74
+        + (0.6215 * temp_f)
+        - (35.75 * wind_factor)
+        + (0.4275 * temp_f * wind_factor)
+    )
+    wind_chill_c = (wind_chill_f - 32) * 5 / 9
+    passthrough = (temp_celsius > 10) | (wind_speed_ms < 1.3)
+    return np.where(passthrough, temp_celsius, wind_chill_c)
+
+
+def _todi_score_kernel(temp_celsius, relative_humidity, wind_speed_ms):
+    heat_index_c = _heat_index_kernel(temp_celsius, relative_humidity)
+    wind_chill_c = _wind_chill_kernel(temp_celsius, wind_speed_ms)
+    feels_like_c = np.where(
+        temp_celsius > 27,
+        heat_index_c,
+        np.where(temp_celsius < 10, wind_chill_c, temp_celsius),
+    )
+
+    ideal_temp = 22.0
+    max_delta = 20.0
+    score = (np.abs(feels_like_c - ideal_temp) / max_delta) * 100
+
+    # np.clip/np.trunc keep NaN, matching int() truncation for valid values
+    return np.trunc(np.clip(score, 0, 100))
+
+
+# Magnus coefficients (Alduchov & Eskridge, 1996), accurate from -40 to 50 °C
+MAGNUS_B = 17.625
+MAGNUS_C = 243.04
+
+
+def _relative_humidity_kernel(temp_celsius, dewpoint_celsius):
+    gamma_dew = MAGNUS_B * dewpoint_celsius / (MAGNUS_C + dewpoint_celsius)
+    gamma_air = MAGNUS_B * temp_celsius / (MAGNUS_C + temp_celsius)
+    return np.clip(100.0 * np.exp(gamma_dew - gamma_air), 0, 100)
+
+
+def calculate_relative_humidity_array(temp_celsius, dewpoint_celsius):
+    """
+    Relative humidity (%) from air and dewpoint temperature (°C) with the
+    Magnus formula, e.g. hourly T2M and T2MDEW cubes from MERRA-2.
+    """
+    return _apply(_relative_humidity_kernel, temp_celsius, dewpoint_celsius)
+
+
+def calculate_heat_index_array(temp_celsius, relative_humidity):
+    """Array version of calculate_heat_index (NumPy arrays or xarray objects)."""
+    return _apply(_heat_index_kernel, temp_celsius, relative_humidity)
+
+
+def calculate_wind_chill_array(temp_celsius, wind_speed_ms):
+    """Array version of calculate_wind_chill (NumPy arrays or xarray objects)."""
+    return _apply(_wind_chill_kernel, temp_celsius, wind_speed_ms)
+
+
+def calculate_todi_score_array(temp_celsius, relative_humidity, wind_speed_ms):
+    """
+    Array version of calculate_todi_score.
+    Inputs broadcast against each other; returns float scores in 0-100 with NaN
+    wherever an input was missing.
+    """
+    return _apply(_todi_score_kernel, temp_celsius, relative_humidity, wind_speed_ms)
+
+
+def todi_scores_to_list(scores):
+    """Converts an array of scores to JSON-ready ints, with None for missing values."""
+    return [None if math.isnan(s) else int(s) for s in np.ravel(scores).tolist()]